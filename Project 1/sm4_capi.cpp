@@ -0,0 +1,256 @@
+#include "sm4_capi.h"
+#include "sm4.h"
+#include "sm4_ttable.h"
+#include <cstring>
+
+// Defined in sm4_aesni.cpp (not declared in sm4_aesni.h)
+void expandKey(const uint8_t k[16], uint32_t rk[32]);
+void process(const uint8_t in[16], uint8_t out[16], const uint32_t rk[32], bool dec);
+
+static constexpr int CAPI_VERSION = 1;
+
+namespace {
+
+// One keyed block cipher over any of the backends
+class BlockCipher {
+public:
+    BlockCipher(int backend, const uint8_t key[16]) : backend_(backend) {
+        switch (backend_) {
+        case SM4_BACKEND_REFERENCE: ref_.set_key(key); break;
+        case SM4_BACKEND_TTABLE:    ttable_.set_key(key); break;
+        case SM4_BACKEND_AESNI:     expandKey(key, rk_); break;
+        default:                    backend_ = -1;
+        }
+    }
+
+    bool ok() const { return backend_ >= 0; }
+
+    void encrypt(const uint8_t in[16], uint8_t out[16]) {
+        switch (backend_) {
+        case SM4_BACKEND_REFERENCE: ref_.encrypt(in, out); break;
+        case SM4_BACKEND_TTABLE:    ttable_.encrypt(in, out); break;
+        case SM4_BACKEND_AESNI:     process(in, out, rk_, false); break;
+        }
+    }
+
+    void decrypt(const uint8_t in[16], uint8_t out[16]) {
+        switch (backend_) {
+        case SM4_BACKEND_REFERENCE: ref_.decrypt(in, out); break;
+        case SM4_BACKEND_TTABLE:    ttable_.decrypt(in, out); break;
+        case SM4_BACKEND_AESNI:     process(in, out, rk_, true); break;
+        }
+    }
+
+private:
+    int backend_;
+    SM4_Context ref_;
+    SM4_TTable_Context ttable_;
+    uint32_t rk_[32];
+};
+
+void increment(uint8_t ctr[16]) {
+    for (int i = 15; i >= 0; --i) {
+        if (++ctr[i]) break;
+    }
+}
+
+void increment32(uint8_t ctr[16]) {
+    for (int i = 15; i >= 12; --i) {
+        if (++ctr[i]) break;
+    }
+}
+
+void ctr_xor(BlockCipher& cipher, uint8_t ctr[16], const uint8_t* in, uint8_t* out, size_t len,
+             void (*inc)(uint8_t*)) {
+    uint8_t ks[16];
+    for (size_t off = 0; off < len; off += 16) {
+        cipher.encrypt(ctr, ks);
+        inc(ctr);
+        size_t n = len - off < 16 ? len - off : 16;
+        for (size_t j = 0; j < n; ++j) out[off + j] = in[off + j] ^ ks[j];
+    }
+}
+
+uint64_t load64(const uint8_t* p) {
+    uint64_t v = 0;
+    for (int i = 0; i < 8; ++i) v = (v << 8) | p[i];
+    return v;
+}
+
+void store64(uint8_t* p, uint64_t v) {
+    for (int i = 7; i >= 0; --i) { p[i] = uint8_t(v); v >>= 8; }
+}
+
+// GHASH state with a 4-bit (Shoup) multiplication table for H
+class GHash {
+public:
+    explicit GHash(const uint8_t h[16], const uint8_t* y = nullptr) {
+        if (y) std::memcpy(y_, y, 16);
+        uint64_t vh = load64(h), vl = load64(h + 8);
+        hh_[8] = vh; hl_[8] = vl;
+        for (int i = 4; i > 0; i >>= 1) {
+            uint64_t t = (vl & 1) * 0xe100000000000000ULL;
+            vl = (vh << 63) | (vl >> 1);
+            vh = (vh >> 1) ^ t;
+            hh_[i] = vh; hl_[i] = vl;
+        }
+        hh_[0] = hl_[0] = 0;
+        for (int i = 2; i <= 8; i <<= 1) {
+            for (int j = 1; j < i; ++j) {
+                hh_[i + j] = hh_[i] ^ hh_[j];
+                hl_[i + j] = hl_[i] ^ hl_[j];
+            }
+        }
+    }
+
+    void update(const uint8_t* data, size_t len) {
+        uint8_t block[16];
+        for (size_t off = 0; off < len; off += 16) {
+            size_t n = len - off < 16 ? len - off : 16;
+            std::memset(block, 0, 16);
+            std::memcpy(block, data + off, n);
+            for (int i = 0; i < 16; ++i) y_[i] ^= block[i];
+            multiply();
+        }
+    }
+
+    void lengths(uint64_t aad_len, uint64_t len) {
+        uint8_t block[16];
+        store64(block, aad_len * 8);
+        store64(block + 8, len * 8);
+        update(block, 16);
+    }
+
+    const uint8_t* digest() const { return y_; }
+
+private:
+    uint8_t y_[16] = {0};
+    uint64_t hh_[16], hl_[16];
+
+    void multiply() {
+        static const uint64_t last4[16] = {
+            0x0000, 0x1c20, 0x3840, 0x2460, 0x7080, 0x6ca0, 0x48c0, 0x54e0,
+            0xe100, 0xfd20, 0xd940, 0xc560, 0x9180, 0x8da0, 0xa9c0, 0xb5e0,
+        };
+        uint8_t lo = y_[15] & 0xf;
+        uint64_t zh = hh_[lo], zl = hl_[lo];
+        for (int i = 15; i >= 0; --i) {
+            lo = y_[i] & 0xf;
+            uint8_t hi = y_[i] >> 4;
+            if (i != 15) {
+                uint8_t rem = uint8_t(zl & 0xf);
+                zl = (zh << 60) | (zl >> 4);
+                zh = (zh >> 4) ^ (last4[rem] << 48);
+                zh ^= hh_[lo];
+                zl ^= hl_[lo];
+            }
+            uint8_t rem = uint8_t(zl & 0xf);
+            zl = (zh << 60) | (zl >> 4);
+            zh = (zh >> 4) ^ (last4[rem] << 48);
+            zh ^= hh_[hi];
+            zl ^= hl_[hi];
+        }
+        store64(y_, zh);
+        store64(y_ + 8, zl);
+    }
+};
+
+// Derive H, J0 and the tag mask E(K, J0); leaves ctr at inc32(J0)
+void gcm_setup(BlockCipher& cipher, const uint8_t* iv, size_t iv_len,
+               uint8_t h[16], uint8_t ctr[16], uint8_t mask[16]) {
+    uint8_t zero[16] = {0};
+    cipher.encrypt(zero, h);
+
+    uint8_t j0[16] = {0};
+    if (iv_len == 12) {
+        std::memcpy(j0, iv, 12);
+        j0[15] = 1;
+    } else {
+        GHash g(h);
+        g.update(iv, iv_len);
+        g.lengths(0, iv_len);
+        std::memcpy(j0, g.digest(), 16);
+    }
+    cipher.encrypt(j0, mask);
+    std::memcpy(ctr, j0, 16);
+    increment32(ctr);
+}
+
+}  // namespace
+
+extern "C" {
+
+int sm4_capi_version() { return CAPI_VERSION; }
+
+int sm4_capi_backends() {
+    return (1 << SM4_BACKEND_REFERENCE) | (1 << SM4_BACKEND_TTABLE) | (1 << SM4_BACKEND_AESNI);
+}
+
+int sm4_capi_ecb(int backend, const uint8_t key[16], const uint8_t* in, uint8_t* out,
+                 size_t len, int decrypt) {
+    BlockCipher cipher(backend, key);
+    if (!cipher.ok() || len % 16) return -1;
+    for (size_t off = 0; off < len; off += 16) {
+        if (decrypt) cipher.decrypt(in + off, out + off);
+        else         cipher.encrypt(in + off, out + off);
+    }
+    return 0;
+}
+
+int sm4_capi_ctr(int backend, const uint8_t key[16], const uint8_t counter[16],
+                 const uint8_t* in, uint8_t* out, size_t len) {
+    BlockCipher cipher(backend, key);
+    if (!cipher.ok()) return -1;
+    uint8_t ctr[16];
+    std::memcpy(ctr, counter, 16);
+    ctr_xor(cipher, ctr, in, out, len, increment);
+    return 0;
+}
+
+int sm4_capi_ghash(const uint8_t h[16], uint8_t y[16], const uint8_t* data, size_t len) {
+    if (!h || !y || (len && !data)) return -1;
+    GHash g(h, y);
+    g.update(data, len);
+    std::memcpy(y, g.digest(), 16);
+    return 0;
+}
+
+int sm4_capi_gcm_encrypt(int backend, const uint8_t key[16], const uint8_t* iv, size_t iv_len,
+                         const uint8_t* aad, size_t aad_len, const uint8_t* in, uint8_t* out,
+                         size_t len, uint8_t* tag, size_t tag_len) {
+    BlockCipher cipher(backend, key);
+    if (!cipher.ok() || iv_len == 0 || tag_len > 16) return -1;
+    uint8_t h[16], ctr[16], mask[16];
+    gcm_setup(cipher, iv, iv_len, h, ctr, mask);
+
+    ctr_xor(cipher, ctr, in, out, len, increment32);
+    GHash g(h);
+    g.update(aad, aad_len);
+    g.update(out, len);
+    g.lengths(aad_len, len);
+    for (size_t i = 0; i < tag_len; ++i) tag[i] = g.digest()[i] ^ mask[i];
+    return 0;
+}
+
+int sm4_capi_gcm_decrypt(int backend, const uint8_t key[16], const uint8_t* iv, size_t iv_len,
+                         const uint8_t* aad, size_t aad_len, const uint8_t* in, uint8_t* out,
+                         size_t len, const uint8_t* tag, size_t tag_len) {
+    BlockCipher cipher(backend, key);
+    if (!cipher.ok() || iv_len == 0 || tag_len > 16) return -1;
+    uint8_t h[16], ctr[16], mask[16];
+    gcm_setup(cipher, iv, iv_len, h, ctr, mask);
+
+    // Authenticate before decrypting so out is untouched on failure
+    GHash g(h);
+    g.update(aad, aad_len);
+    g.update(in, len);
+    g.lengths(aad_len, len);
+    uint8_t diff = 0;
+    for (size_t i = 0; i < tag_len; ++i) diff |= uint8_t(g.digest()[i] ^ mask[i] ^ tag[i]);
+    if (diff) return 1;
+
+    ctr_xor(cipher, ctr, in, out, len, increment32);
+    return 0;
+}
+
+}
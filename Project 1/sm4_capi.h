@@ -0,0 +1,43 @@
+#ifndef SM4_CAPI_H
+#define SM4_CAPI_H
+
+#include <cstddef>
+#include <cstdint>
+
+// Backend identifiers accepted by every sm4_capi_* call
+enum {
+    SM4_BACKEND_REFERENCE = 0,  // SM4_Context (sm4.cpp)
+    SM4_BACKEND_TTABLE    = 1,  // SM4_TTable_Context (sm4_ttable.cpp)
+    SM4_BACKEND_AESNI     = 2,  // AES-NI kernel (sm4_aesni.cpp)
+};
+
+extern "C" {
+
+int sm4_capi_version();
+
+// Bitmask of backends compiled into the library (1 << SM4_BACKEND_*)
+int sm4_capi_backends();
+
+// ECB over len bytes (a multiple of 16); in and out may alias
+int sm4_capi_ecb(int backend, const uint8_t key[16], const uint8_t* in, uint8_t* out,
+                 size_t len, int decrypt);
+
+// CTR with a 128-bit big-endian counter starting at counter[16]
+int sm4_capi_ctr(int backend, const uint8_t key[16], const uint8_t counter[16],
+                 const uint8_t* in, uint8_t* out, size_t len);
+
+// GHASH update: y = (...((y ^ X1)*H) ^ X2)*H ...) over len bytes, the last
+// block zero-padded; lets callers hash segments independently and combine
+int sm4_capi_ghash(const uint8_t h[16], uint8_t y[16], const uint8_t* data, size_t len);
+
+// GCM (NIST SP 800-38D); decrypt returns 1 on tag mismatch
+int sm4_capi_gcm_encrypt(int backend, const uint8_t key[16], const uint8_t* iv, size_t iv_len,
+                         const uint8_t* aad, size_t aad_len, const uint8_t* in, uint8_t* out,
+                         size_t len, uint8_t* tag, size_t tag_len);
+int sm4_capi_gcm_decrypt(int backend, const uint8_t key[16], const uint8_t* iv, size_t iv_len,
+                         const uint8_t* aad, size_t aad_len, const uint8_t* in, uint8_t* out,
+                         size_t len, const uint8_t* tag, size_t tag_len);
+
+}
+
+#endif
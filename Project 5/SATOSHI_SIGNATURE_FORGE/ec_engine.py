@@ -0,0 +1,395 @@
+"""
+Shared Elliptic Curve Engine for Bulk ECDSA Analysis.
+
+satoshi_forge.py uses affine arithmetic with one modular inversion per
+point operation, which is fine for a single demonstration but not for
+processing millions of signatures. This module provides a curve engine
+with Jacobian coordinates, a fixed-base comb table for the generator,
+joint u1*G + u2*Q multiplication, batched normalization (one inversion
+for many points) and SEC1 point encoding, shared by the bulk analysis
+tools in this directory. Engines are provided for secp256k1 and for the
+SM2 curve used by the rest of the project.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+from satoshi_forge import P, A, B, N, GX, GY
+
+Point = Tuple[int, int]
+JacobianPoint = Tuple[int, int, int]  # (X, Y, Z) with x = X/Z^2, y = Y/Z^3
+
+G_WNAF_WINDOW = 8  # wNAF width for G in joint multiplication (64 cached odd multiples)
+
+def batch_invert(values: Sequence[int], modulus: int) -> List[int]:
+    """
+    Invert many non-zero values with a single modular inversion.
+
+    Montgomery's trick: accumulate prefix products, invert the total once,
+    then unwind the prefix products to recover each individual inverse.
+    """
+    if not values:
+        return []
+
+    prefix = [0] * len(values)
+    acc = 1
+    for i, v in enumerate(values):
+        prefix[i] = acc
+        acc = acc * v % modulus
+
+    inv = pow(acc, -1, modulus)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = inv * prefix[i] % modulus
+        inv = inv * values[i] % modulus
+
+    return result
+
+def wnaf_digits(k: int, window_size: int) -> List[int]:
+    """Width-w non-adjacent form of k, least significant digit first."""
+    digits = []
+    width = 1 << window_size
+    half = width >> 1
+    while k:
+        if k & 1:
+            d = k & (width - 1)
+            if d >= half:
+                d -= width
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+class CurveEngine:
+    """Short Weierstrass curve y^2 = x^3 + ax + b over F_p with generator G of order n."""
+
+    def __init__(self, name: str, p: int, a: int, b: int, n: int, gx: int, gy: int,
+                 comb_window: int = 4):
+        if p % 4 != 3:
+            raise ValueError("Square roots are only implemented for p = 3 (mod 4)")
+        self.name = name
+        self.p = p
+        self.a = a
+        self.b = b
+        self.n = n
+        self.g = (gx, gy)
+        self.comb_window = comb_window
+        self._comb_table: Optional[List[List[Optional[Point]]]] = None
+        self._g_wnaf_table: Optional[List[Point]] = None
+
+    # --- Point arithmetic ---
+
+    def jacobian_double(self, point: Optional[JacobianPoint]) -> Optional[JacobianPoint]:
+        """Point doubling in Jacobian coordinates (no modular inversion)."""
+        if point is None:
+            return None
+
+        p = self.p
+        x, y, z = point
+        if y == 0:
+            return None
+
+        xx = x * x % p
+        yy = y * y % p
+        yyyy = yy * yy % p
+        s = 4 * x * yy % p
+        if self.a:
+            zz = z * z % p
+            m = (3 * xx + self.a * zz * zz) % p
+        else:
+            m = 3 * xx % p
+        x3 = (m * m - 2 * s) % p
+        y3 = (m * (s - x3) - 8 * yyyy) % p
+        z3 = 2 * y * z % p
+        return (x3, y3, z3)
+
+    def jacobian_add_affine(self, p1: Optional[JacobianPoint], p2: Optional[Point]) -> Optional[JacobianPoint]:
+        """Mixed addition of a Jacobian point and an affine point (no inversion)."""
+        if p2 is None:
+            return p1
+        if p1 is None:
+            return (p2[0], p2[1], 1)
+
+        p = self.p
+        x1, y1, z1 = p1
+        x2, y2 = p2
+
+        z1z1 = z1 * z1 % p
+        u2 = x2 * z1z1 % p
+        s2 = y2 * z1 * z1z1 % p
+        h = (u2 - x1) % p
+        r = (s2 - y1) % p
+
+        if h == 0:
+            if r == 0:
+                return self.jacobian_double(p1)
+            return None  # Point at infinity
+
+        hh = h * h % p
+        hhh = h * hh % p
+        v = x1 * hh % p
+        x3 = (r * r - hhh - 2 * v) % p
+        y3 = (r * (v - x3) - y1 * hhh) % p
+        z3 = z1 * h % p
+        return (x3, y3, z3)
+
+    def jacobian_add(self, p1: Optional[JacobianPoint], p2: Optional[JacobianPoint]) -> Optional[JacobianPoint]:
+        """General addition of two Jacobian points."""
+        if p1 is None:
+            return p2
+        if p2 is None:
+            return p1
+
+        p = self.p
+        x1, y1, z1 = p1
+        x2, y2, z2 = p2
+
+        z1z1 = z1 * z1 % p
+        z2z2 = z2 * z2 % p
+        u1 = x1 * z2z2 % p
+        u2 = x2 * z1z1 % p
+        s1 = y1 * z2 * z2z2 % p
+        s2 = y2 * z1 * z1z1 % p
+        h = (u2 - u1) % p
+        r = (s2 - s1) % p
+
+        if h == 0:
+            if r == 0:
+                return self.jacobian_double(p1)
+            return None
+
+        hh = h * h % p
+        hhh = h * hh % p
+        v = u1 * hh % p
+        x3 = (r * r - hhh - 2 * v) % p
+        y3 = (r * (v - x3) - s1 * hhh) % p
+        z3 = z1 * z2 * h % p
+        return (x3, y3, z3)
+
+    def to_affine(self, point: Optional[JacobianPoint]) -> Optional[Point]:
+        """Convert a single Jacobian point to affine coordinates."""
+        if point is None:
+            return None
+
+        p = self.p
+        x, y, z = point
+        z_inv = pow(z, -1, p)
+        z_inv2 = z_inv * z_inv % p
+        return (x * z_inv2 % p, y * z_inv2 * z_inv % p)
+
+    def batch_to_affine(self, points: Sequence[Optional[JacobianPoint]]) -> List[Optional[Point]]:
+        """Normalize a batch of Jacobian points with one shared inversion."""
+        p = self.p
+        finite = [i for i, pt in enumerate(points) if pt is not None]
+        z_invs = batch_invert([points[i][2] for i in finite], p)
+
+        result: List[Optional[Point]] = [None] * len(points)
+        for i, z_inv in zip(finite, z_invs):
+            x, y, _ = points[i]
+            z_inv2 = z_inv * z_inv % p
+            result[i] = (x * z_inv2 % p, y * z_inv2 * z_inv % p)
+
+        return result
+
+    def negate(self, point: Optional[Point]) -> Optional[Point]:
+        """Return -P."""
+        if point is None:
+            return None
+        return (point[0], (-point[1]) % self.p)
+
+    def is_on_curve(self, point: Point) -> bool:
+        """Check y^2 = x^3 + ax + b."""
+        x, y = point
+        p = self.p
+        return (y * y - (x * x * x + self.a * x + self.b)) % p == 0
+
+    # --- Scalar multiplication ---
+
+    def _build_comb_table(self) -> List[List[Optional[Point]]]:
+        """table[i][j] = j * 2^(w*i) * G, normalized with two inversions."""
+        w = self.comb_window
+        rows = (self.n.bit_length() + w - 1) // w
+        width = 1 << w
+
+        bases = [(self.g[0], self.g[1], 1)]
+        for _ in range(1, rows):
+            base = bases[-1]
+            for _ in range(w):
+                base = self.jacobian_double(base)
+            bases.append(base)
+        affine_bases = self.batch_to_affine(bases)
+
+        flat = []
+        for base in affine_bases:
+            acc = None
+            for _ in range(1, width):
+                acc = self.jacobian_add_affine(acc, base)
+                flat.append(acc)
+        flat_affine = self.batch_to_affine(flat)
+
+        return [[None] + flat_affine[i * (width - 1):(i + 1) * (width - 1)] for i in range(rows)]
+
+    def fixed_base_mult_jacobian(self, k: int) -> Optional[JacobianPoint]:
+        """k*G in Jacobian coordinates: one mixed addition per comb window."""
+        if self._comb_table is None:
+            self._comb_table = self._build_comb_table()
+
+        table = self._comb_table
+        w = self.comb_window
+        mask = (1 << w) - 1
+        add = self.jacobian_add_affine
+
+        k %= self.n
+        result = None
+        i = 0
+        while k:
+            digit = k & mask
+            if digit:
+                result = add(result, table[i][digit])
+            k >>= w
+            i += 1
+
+        return result
+
+    def fixed_base_mult(self, k: int) -> Optional[Point]:
+        """k*G in affine coordinates."""
+        return self.to_affine(self.fixed_base_mult_jacobian(k))
+
+    def batch_fixed_base_mult(self, scalars: Sequence[int]) -> List[Optional[Point]]:
+        """k_i*G for many scalars, normalized together with one inversion."""
+        return self.batch_to_affine([self.fixed_base_mult_jacobian(k) for k in scalars])
+
+    def scalar_mult_jacobian(self, k: int, point: Point) -> Optional[JacobianPoint]:
+        """Variable-base k*P by left-to-right double-and-add in Jacobian coordinates."""
+        k %= self.n
+        if k == 0 or point is None:
+            return None
+
+        result = None
+        for bit in bin(k)[2:]:
+            result = self.jacobian_double(result)
+            if bit == '1':
+                result = self.jacobian_add_affine(result, point)
+        return result
+
+    def scalar_mult(self, k: int, point: Point) -> Optional[Point]:
+        """Variable-base k*P in affine coordinates."""
+        return self.to_affine(self.scalar_mult_jacobian(k, point))
+
+    def odd_multiples(self, point: Point, window_size: int) -> List[Point]:
+        """Affine P, 3P, ..., (2^(w-1) - 1)P for wNAF, normalized with one inversion."""
+        start = (point[0], point[1], 1)
+        double_p = self.jacobian_double(start)
+        odd = [start]
+        for _ in range((1 << (window_size - 2)) - 1):
+            odd.append(self.jacobian_add(odd[-1], double_p))
+        return self.batch_to_affine(odd)
+
+    def joint_mult_jacobian(self, u1: int, u2: int, q: Point,
+                            window_size: int = 5) -> Optional[JacobianPoint]:
+        """
+        u1*G + u2*Q by interleaved wNAF (Straus/Shamir's trick).
+
+        Both scalars share one chain of doublings. G's odd multiples use the
+        wider, cached G_WNAF_WINDOW table; Q's are built per call.
+        """
+        if self._g_wnaf_table is None:
+            self._g_wnaf_table = self.odd_multiples(self.g, G_WNAF_WINDOW)
+
+        p = self.p
+        g_table = self._g_wnaf_table
+        q_table = self.odd_multiples(q, window_size)
+        g_digits = wnaf_digits(u1 % self.n, G_WNAF_WINDOW)
+        q_digits = wnaf_digits(u2 % self.n, window_size)
+        g_len, q_len = len(g_digits), len(q_digits)
+
+        double = self.jacobian_double
+        add = self.jacobian_add_affine
+        result = None
+        for i in range(max(g_len, q_len) - 1, -1, -1):
+            result = double(result)
+            if i < g_len and g_digits[i]:
+                d = g_digits[i]
+                x, y = g_table[abs(d) >> 1]
+                result = add(result, (x, y) if d > 0 else (x, p - y))
+            if i < q_len and q_digits[i]:
+                d = q_digits[i]
+                x, y = q_table[abs(d) >> 1]
+                result = add(result, (x, y) if d > 0 else (x, p - y))
+
+        return result
+
+    def x_equals_mod_n(self, point: Optional[JacobianPoint], r: int) -> bool:
+        """
+        Check x(point) mod n == r without converting to affine.
+
+        x = X/Z^2, so compare X with r*Z^2 (and (r+n)*Z^2 when r + n < p).
+        """
+        if point is None:
+            return False
+
+        p = self.p
+        x, _, z = point
+        zz = z * z % p
+        candidate = r
+        while candidate < p:
+            if (candidate * zz - x) % p == 0:
+                return True
+            candidate += self.n
+        return False
+
+    # --- SEC1 encoding ---
+
+    def decode_point(self, data: bytes) -> Point:
+        """
+        Decode a public key: SEC1 compressed (33 bytes), SEC1 uncompressed
+        (65 bytes) or raw x || y (64 bytes).
+        """
+        p = self.p
+        if len(data) == 33 and data[0] in (2, 3):
+            x = int.from_bytes(data[1:], 'big')
+            y = self.lift_x(x)
+            if y is None:
+                raise ValueError("Compressed point is not on the curve")
+            if (y & 1) != (data[0] & 1):
+                y = p - y
+            return (x, y)
+
+        if len(data) == 65 and data[0] == 4:
+            data = data[1:]
+        if len(data) != 64:
+            raise ValueError(f"Unsupported public key encoding ({len(data)} bytes)")
+
+        point = (int.from_bytes(data[:32], 'big'), int.from_bytes(data[32:], 'big'))
+        if not self.is_on_curve(point):
+            raise ValueError("Public key is not on the curve")
+        return point
+
+    def lift_x(self, x: int) -> Optional[int]:
+        """An even-or-odd y with (x, y) on the curve, or None."""
+        p = self.p
+        rhs = (x * x * x + self.a * x + self.b) % p
+        y = pow(rhs, (p + 1) // 4, p)  # p = 3 (mod 4), checked in __init__
+        return y if y * y % p == rhs else None
+
+    def encode_point(self, point: Point, compressed: bool = True) -> bytes:
+        """SEC1 encoding of an affine point."""
+        x, y = point
+        if compressed:
+            return bytes([2 | (y & 1)]) + x.to_bytes(32, 'big')
+        return b'\x04' + x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+
+SECP256K1 = CurveEngine('secp256k1', P, A, B, N, GX, GY)
+
+# The SM2 curve parameters used throughout this project (see sm2_utils.py)
+SM2 = CurveEngine(
+    'sm2',
+    0x8542D69E4C044F18E8B92435BF6FF7DE457283915C45517D722EDB8B08F1DFC3,
+    0x787968B4FA32C3FD2417842E73BBFEFF2F3C848B6831D7E0EC65228B3937E498,
+    0x63E4C6D3B23B0C849CF84241484BFE48F61D59A5B16BA06E6E12D1DA27C5249A,
+    0x8542D69E4C044F18E8B92435BF6FF7DD297720630485628D5AE74EE7C32E79B7,
+    0x421DEBD61B62EAB6746434EBC3CC315E32220B3BADD50BDC4C4E6C147FEDD43D,
+    0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2,
+)
+
+CURVES = {curve.name: curve for curve in (SECP256K1, SM2)}
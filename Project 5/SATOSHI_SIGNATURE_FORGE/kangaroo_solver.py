@@ -0,0 +1,278 @@
+"""
+Parallel Pollard Kangaroo Solver for Interval-Bounded Private Keys.
+
+recover_private_key and k_reuse_attack need full knowledge of a nonce.
+When a private key is only known to lie in an interval [a, a + W), e.g.
+after a partial leak or from weak key generation, Pollard's kangaroo
+(lambda) method finds it in about 2*sqrt(W) group operations instead of W.
+
+This is the parallel van Oorschot-Wiener variant:
+
+  * tame kangaroos start at known multiples of G near the middle of the
+    interval, wild kangaroos start at Q plus small known offsets
+  * every kangaroo jumps by a pseudo-random, x-dependent multiple of G,
+    so two kangaroos that land on the same point follow the same path
+  * only distinguished points (x with dp_bits low zero bits) are sent to
+    a shared SQLite store; a tame/wild match there reveals the key
+  * herds of kangaroos run in separate processes and advance in lockstep
+    with one batched inversion per step, so throughput scales with cores
+
+Kangaroo states, distinguished points and work counters are committed
+after every round, so an interrupted search resumes where it stopped.
+"""
+
+import hashlib
+import math
+import os
+import secrets
+import sqlite3
+import time
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+from ec_engine import SECP256K1, CurveEngine, Point
+
+NUM_JUMPS = 32
+DEFAULT_HERD_SIZE = 32          # kangaroos per worker task (half tame, half wild)
+DEFAULT_ROUND_STEPS = 2048      # jumps per kangaroo between checkpoints
+
+Kangaroo = Tuple[int, int, Point]  # (kind, distance, current point)
+TAME, WILD = 0, 1
+
+def jump_distances(mean_jump: int) -> List[int]:
+    """Deterministic jump sizes in [1, 2 * mean_jump], averaging about mean_jump."""
+    return [1 + int.from_bytes(hashlib.sha256(f'kangaroo jump {i}'.encode()).digest(), 'big') % (2 * mean_jump)
+            for i in range(NUM_JUMPS)]
+
+_worker = {}
+
+def _init_worker(curve: CurveEngine, jump_points: List[Point], jumps: List[int], dp_bits: int) -> None:
+    _worker['curve'] = curve
+    _worker['jump_points'] = jump_points
+    _worker['jumps'] = jumps
+    _worker['dp_mask'] = (1 << dp_bits) - 1
+
+def _run_herd(task: Tuple[int, List[Kangaroo], int]):
+    """
+    Advance a herd by `steps` jumps each.
+
+    Returns (herd start index, new states, distinguished points) where each
+    distinguished point is (x, kind, distance, kangaroo index).
+    """
+    start, herd, steps = task
+    curve = _worker['curve']
+    jump_points = _worker['jump_points']
+    jumps = _worker['jumps']
+    dp_mask = _worker['dp_mask']
+    add = curve.jacobian_add_affine
+
+    kinds = [kind for kind, _, _ in herd]
+    dists = [dist for _, dist, _ in herd]
+    points = [point for _, _, point in herd]
+    dps = []
+
+    for _ in range(steps):
+        walks = []
+        for i, (x, y) in enumerate(points):
+            j = x % NUM_JUMPS
+            dists[i] += jumps[j]
+            walks.append(add((x, y, 1), jump_points[j]))
+        points = curve.batch_to_affine(walks)
+        for i, (x, _) in enumerate(points):
+            if not x & dp_mask:
+                dps.append((x, kinds[i], dists[i], start + i))
+
+    return start, list(zip(kinds, dists, points)), dps
+
+class KangarooSolver:
+    """Resumable parallel kangaroo search for d in [lower, lower + width) with Q = dG."""
+
+    def __init__(self, db_path: str, public_key: Point, lower: int, width: int,
+                 curve: CurveEngine = SECP256K1, processes: Optional[int] = None,
+                 herds: Optional[int] = None, herd_size: int = DEFAULT_HERD_SIZE,
+                 dp_bits: Optional[int] = None):
+        self.curve = curve
+        self.public_key = public_key
+        self.lower = lower
+        self.width = width
+        self.processes = processes
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS kangaroos (id INTEGER PRIMARY KEY, kind INTEGER, dist TEXT);
+            CREATE TABLE IF NOT EXISTS dps (x BLOB PRIMARY KEY, kind INTEGER, dist TEXT, kangaroo INTEGER);
+        ''')
+
+        meta = dict(self.db.execute('SELECT key, value FROM meta'))
+        problem = {'curve': curve.name, 'public_key': curve.encode_point(public_key).hex(),
+                   'lower': str(lower), 'width': str(width)}
+        if meta:
+            if any(meta[k] != v for k, v in problem.items()):
+                raise ValueError(f"{db_path}: store belongs to a different kangaroo search")
+            self.num_kangaroos = int(meta['kangaroos'])
+            self.herd_size = int(meta['herd_size'])
+            self.dp_bits = int(meta['dp_bits'])
+            self.mean_jump = int(meta['mean_jump'])
+            self.steps_done = int(meta['steps_done'])
+            self.kangaroos = self._load_kangaroos()
+        else:
+            herds = herds or processes or os.cpu_count() or 1
+            self.num_kangaroos = herds * herd_size
+            self.herd_size = herd_size
+            sqrt_w = math.isqrt(width)
+            # vOW: mean jump ~ (number of kangaroos) * sqrt(W) / 4
+            self.mean_jump = max(1, self.num_kangaroos * sqrt_w // 4)
+            if dp_bits is None:
+                # Aim for ~16 distinguished points per kangaroo before the expected collision
+                per_kangaroo = 2 * sqrt_w // self.num_kangaroos
+                dp_bits = max(0, (per_kangaroo // 16).bit_length() - 1)
+            self.dp_bits = dp_bits
+            self.steps_done = 0
+            self.kangaroos = self._start_kangaroos()
+            with self.db:
+                self.db.executemany('INSERT INTO meta VALUES (?, ?)', list(problem.items()) + [
+                    ('kangaroos', str(self.num_kangaroos)), ('herd_size', str(herd_size)),
+                    ('dp_bits', str(self.dp_bits)),
+                    ('mean_jump', str(self.mean_jump)), ('steps_done', '0')])
+                self._save_kangaroos()
+
+        self.jumps = jump_distances(self.mean_jump)
+        self.jump_points = curve.batch_fixed_base_mult(self.jumps)
+
+    def expected_steps(self) -> int:
+        """Expected total jumps: 2*sqrt(W) plus the distinguished-point tail of every kangaroo."""
+        return 2 * math.isqrt(self.width) + self.num_kangaroos * (1 << self.dp_bits)
+
+    def _point_for(self, kind: int, dist: int) -> Point:
+        """Tame kangaroos sit at dist*G, wild ones at Q + dist*G."""
+        jac = self.curve.fixed_base_mult_jacobian(dist)
+        if kind == WILD:
+            jac = self.curve.jacobian_add_affine(jac, self.public_key)
+        return jac
+
+    def _start_kangaroos(self) -> List[Kangaroo]:
+        """Tame around the middle of the interval, wild at Q plus small offsets."""
+        half = self.num_kangaroos // 2
+        spread = max(1, self.mean_jump)
+        starts = [(TAME, self.lower + self.width // 2 + secrets.randbelow(spread)) for _ in range(half)]
+        starts += [(WILD, secrets.randbelow(spread)) for _ in range(self.num_kangaroos - half)]
+        points = self.curve.batch_to_affine([self._point_for(kind, dist) for kind, dist in starts])
+        return [(kind, dist, point) for (kind, dist), point in zip(starts, points)]
+
+    def _load_kangaroos(self) -> List[Kangaroo]:
+        rows = list(self.db.execute('SELECT kind, dist FROM kangaroos ORDER BY id'))
+        starts = [(kind, int(dist, 16)) for kind, dist in rows]
+        points = self.curve.batch_to_affine([self._point_for(kind, dist) for kind, dist in starts])
+        return [(kind, dist, point) for (kind, dist), point in zip(starts, points)]
+
+    def _save_kangaroos(self) -> None:
+        self.db.executemany('INSERT OR REPLACE INTO kangaroos VALUES (?, ?, ?)',
+                            [(i, kind, f'{dist:x}') for i, (kind, dist, _) in enumerate(self.kangaroos)])
+
+    def _record_dp(self, x: int, kind: int, dist: int, kangaroo: int) -> Optional[int]:
+        """
+        Store a distinguished point; returns the key on a tame/wild collision.
+
+        A same-kind collision means two kangaroos now share a path, so the
+        newcomer is moved to a fresh random position.
+        """
+        key = x.to_bytes(32, 'big')
+        row = self.db.execute('SELECT kind, dist FROM dps WHERE x = ?', (key,)).fetchone()
+        if row is None:
+            self.db.execute('INSERT INTO dps VALUES (?, ?, ?, ?)', (key, kind, f'{dist:x}', kangaroo))
+            return None
+
+        other_kind, other_dist = row[0], int(row[1], 16)
+        if other_kind == kind:
+            if other_dist != dist:
+                new_dist = dist + 1 + secrets.randbelow(self.mean_jump)
+                self.kangaroos[kangaroo] = (kind, new_dist, self.curve.to_affine(self._point_for(kind, new_dist)))
+            return None
+
+        tame, wild = (dist, other_dist) if kind == TAME else (other_dist, dist)
+        n = self.curve.n
+        # Same x: either d + wild = tame or d + wild = -tame
+        for d in ((tame - wild) % n, (-tame - wild) % n):
+            if self.curve.fixed_base_mult(d) == self.public_key:
+                return d
+        return None
+
+    def solve(self, max_rounds: Optional[int] = None, round_steps: int = DEFAULT_ROUND_STEPS,
+              progress: bool = True) -> Optional[int]:
+        """
+        Run rounds until the key is found (or max_rounds is reached).
+
+        Returns the private key, or None if the search was stopped early.
+        """
+        solved = self.db.execute("SELECT value FROM meta WHERE key = 'solution'").fetchone()
+        if solved:
+            return int(solved[0], 16)
+
+        herds = [(i, i + self.herd_size) for i in range(0, self.num_kangaroos, self.herd_size)]
+        start_time = time.time()
+        steps_at_start = self.steps_done
+        rounds = 0
+        key = None
+
+        with Pool(self.processes, initializer=_init_worker,
+                  initargs=(self.curve, self.jump_points, self.jumps, self.dp_bits)) as pool:
+            while key is None and (max_rounds is None or rounds < max_rounds):
+                tasks = [(lo, self.kangaroos[lo:hi], round_steps) for lo, hi in herds]
+                with self.db:
+                    for lo, states, dps in pool.imap_unordered(_run_herd, tasks):
+                        self.kangaroos[lo:lo + len(states)] = states
+                        for dp in dps:
+                            key = self._record_dp(*dp) if key is None else key
+                    self.steps_done += round_steps * self.num_kangaroos
+                    self._save_kangaroos()
+                    self.db.execute("UPDATE meta SET value = ? WHERE key = 'steps_done'", (str(self.steps_done),))
+                    if key is not None:
+                        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('solution', ?)", (f'{key:x}',))
+                rounds += 1
+
+                if progress:
+                    elapsed = time.time() - start_time
+                    rate = (self.steps_done - steps_at_start) / elapsed if elapsed else 0.0
+                    print(f"  round {rounds}: {self.steps_done:,} jumps "
+                          f"({self.steps_done / self.expected_steps():.2f}x expected), {rate:,.0f} jumps/s")
+
+        return key
+
+    def close(self) -> None:
+        self.db.close()
+
+def main():
+    """Solve 36-bit and 32-bit interval keys on secp256k1 and SM2, with a resume."""
+    import tempfile
+    from ec_engine import SM2
+
+    print("--- Parallel Pollard Kangaroo Solver ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        for curve, bits, interrupt in ((SECP256K1, 36, 2), (SM2, 32, None)):
+            # A key whose top bits leaked: d = known_high || unknown low `bits` bits
+            known_high = secrets.randbits(64) << bits
+            d = known_high | secrets.randbits(bits)
+            public_key = curve.fixed_base_mult(d)
+            db_path = os.path.join(tmp, f'{curve.name}.sqlite')
+            print(f"\n[{curve.name}] searching {bits}-bit interval above {known_high:#x}")
+
+            start_time = time.time()
+            solver = KangarooSolver(db_path, public_key, known_high, 1 << bits, curve, processes=2)
+            print(f"  {solver.num_kangaroos} kangaroos, dp_bits={solver.dp_bits}, "
+                  f"expected ~{solver.expected_steps():,} jumps")
+            key = solver.solve(max_rounds=interrupt)
+            solver.close()
+            if key is None:
+                print("  -- interrupted, resuming from the store --")
+                solver = KangarooSolver(db_path, public_key, known_high, 1 << bits, curve, processes=2)
+                key = solver.solve()
+                solver.close()
+
+            ratio = solver.steps_done / solver.expected_steps()
+            print(f"  found d = {key:#x} in {time.time() - start_time:.2f}s, "
+                  f"{solver.steps_done:,} jumps ({ratio:.2f}x expected)")
+            assert key == d
+
+    print("\n✅ Kangaroo search successful!")
+
+if __name__ == "__main__":
+    main()
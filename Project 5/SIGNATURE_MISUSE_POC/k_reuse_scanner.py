@@ -0,0 +1,340 @@
+"""
+Streaming k-Reuse Detector for Large SM2 Signature Corpora.
+
+In SM2, r = (e + x1) mod n where (x1, y1) = kG, so every logged signature
+reveals x(kG) = (r - e) mod n. Two signatures by the same key with the same
+x(kG) reused k, and the private key follows from k_reuse_attack's formula.
+
+The scanner reads (public key, e, r, s) records in chunks and indexes
+x(kG) per key. While the index fits in the memory budget it stays in a
+dict; beyond that, records are hash-partitioned into spill files on disk
+and each partition is grouped independently, so corpora larger than RAM
+can be scanned. Key recoveries share one batched modular inversion.
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import time
+from itertools import islice
+from random import randint
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from sm2_utils import P, A, B, N, G, scalar_mult
+from k_reuse_attack import faulty_sign, hash_sm3
+
+# Spill record: public key (64) | x(kG) (32) | r (32) | s (32)
+SPILL_RECORD = struct.Struct('>64s32s32s32s')
+DEFAULT_MEMORY_LIMIT = 1_000_000  # records held in memory before spilling
+DEFAULT_PARTITIONS = 64
+DEFAULT_CHUNK_SIZE = 100_000  # lines read per chunk
+
+Record = Tuple[str, int, int, int]  # (public key hex, e, r, s)
+
+def normalize_public_key(pub_hex: str) -> bytes:
+    """
+    Public key as the 64-byte raw x || y the spill records hold.
+
+    Accepts raw x || y, SEC1 uncompressed (04 || x || y) and SEC1
+    compressed (02/03 || x) keys, so one key logged in different encodings
+    is indexed once. Anything else raises ValueError rather than being
+    padded or truncated into a different key.
+    """
+    data = bytes.fromhex(pub_hex)
+    if len(data) == 64:
+        return data
+    if len(data) == 65 and data[0] == 4:
+        return data[1:]
+    if len(data) == 33 and data[0] in (2, 3):
+        x = int.from_bytes(data[1:], 'big')
+        rhs = (x * x * x + A * x + B) % P
+        y = pow(rhs, (P + 1) // 4, P)  # P = 3 (mod 4)
+        if x >= P or y * y % P != rhs:
+            raise ValueError(f"Compressed public key is not on the curve: {pub_hex}")
+        if y & 1 != data[0] & 1:
+            y = P - y
+        return data[1:] + y.to_bytes(32, 'big')
+    raise ValueError(f"Unsupported public key encoding ({len(data)} bytes): {pub_hex}")
+
+def batch_invert(values: List[int], modulus: int = N) -> List[int]:
+    """Invert many non-zero values mod n with a single modular inversion."""
+    if not values:
+        return []
+
+    prefix = [0] * len(values)
+    acc = 1
+    for i, v in enumerate(values):
+        prefix[i] = acc
+        acc = acc * v % modulus
+
+    inv = pow(acc, -1, modulus)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = inv * prefix[i] % modulus
+        inv = inv * values[i] % modulus
+
+    return result
+
+def batch_k_reuse_attack(pairs: List[Tuple[Tuple[int, int], Tuple[int, int]]]) -> List[Optional[int]]:
+    """
+    Apply k_reuse_attack's formula to many signature pairs at once.
+
+    d = (s1 - s2) * (s2 + r2 - s1 - r1)^-1 mod n, with all denominators
+    inverted together. Pairs with a zero denominator yield None.
+    """
+    numerators = []
+    denominators = []
+    for (r1, s1), (r2, s2) in pairs:
+        numerators.append((s1 - s2) % N)
+        denominators.append((s2 + r2 - s1 - r1) % N)
+
+    usable = [i for i, den in enumerate(denominators) if den]
+    inverses = batch_invert([denominators[i] for i in usable])
+
+    recovered: List[Optional[int]] = [None] * len(pairs)
+    for i, inv in zip(usable, inverses):
+        recovered[i] = numerators[i] * inv % N
+    return recovered
+
+def read_records(fileobj: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[List[Record], int]]:
+    """
+    Read 'pubkey,e,r,s' hex CSV lines in chunks.
+
+    Blank lines and lines starting with '#' are skipped. Lines with the
+    wrong field count, non-hex fields, an unsupported public key, r or s
+    outside [1, n) or e wider than 256 bits are counted, not fatal.
+
+    Yields:
+        (records, bad_lines) per chunk
+    """
+    while True:
+        lines = list(islice(fileobj, chunk_size))
+        if not lines:
+            break
+        chunk = []
+        bad = 0
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                pub, e, r, s = line.split(',')
+                e, r, s = int(e, 16), int(r, 16), int(s, 16)
+                if not (0 < r < N and 0 < s < N and 0 <= e < 1 << 256):
+                    raise ValueError("field out of range")
+                chunk.append((normalize_public_key(pub).hex(), e, r, s))
+            except ValueError:
+                bad += 1
+        yield chunk, bad
+
+class KReuseScanner:
+    """Index x(kG) per public key and report signatures that reused k."""
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                 num_partitions: int = DEFAULT_PARTITIONS,
+                 spill_dir: Optional[str] = None):
+        self.memory_limit = memory_limit
+        self.num_partitions = num_partitions
+        self.spill_dir = spill_dir
+        self.records_seen = 0
+        self.bad_lines = 0
+        self.spilled = False
+        self._buffer: List[bytes] = []
+        self._partition_dir: Optional[str] = None
+        self._partitions: List[BinaryIO] = []
+
+    def add_records(self, records: Iterable[Record]) -> None:
+        """Index a batch of (public key hex, e, r, s) records."""
+        buffer = self._buffer
+        pack = SPILL_RECORD.pack
+        for pub, e, r, s in records:
+            x = (r - e) % N
+            buffer.append(pack(normalize_public_key(pub), x.to_bytes(32, 'big'),
+                               r.to_bytes(32, 'big'), s.to_bytes(32, 'big')))
+            self.records_seen += 1
+        if len(buffer) >= self.memory_limit:
+            self._spill()
+
+    def scan(self, fileobj: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[dict]:
+        """
+        Stream a CSV corpus through the index and return all findings.
+
+        Malformed lines are skipped; their number is left in `bad_lines`.
+        """
+        for chunk, bad in read_records(fileobj, chunk_size):
+            self.add_records(chunk)
+            self.bad_lines += bad
+        return self.findings()
+
+    def _spill(self) -> None:
+        """Hash-partition buffered records into on-disk spill files."""
+        if not self._partitions:
+            self._partition_dir = tempfile.mkdtemp(prefix='k_reuse_', dir=self.spill_dir)
+            self._partitions = [
+                open(os.path.join(self._partition_dir, f'part_{i:04d}.bin'), 'wb')
+                for i in range(self.num_partitions)
+            ]
+            self.spilled = True
+
+        partitions = self._partitions
+        for packed in self._buffer:
+            # Partition on (public key, x) so colliding records land together
+            partitions[hash(packed[:96]) % self.num_partitions].write(packed)
+        self._buffer = []
+
+    def _iter_groups(self) -> Iterator[List[bytes]]:
+        """Yield groups of records sharing (public key, x(kG))."""
+        if not self.spilled:
+            sources = [self._buffer]
+        else:
+            self._spill()
+            for f in self._partitions:
+                f.close()
+            sources = (self._read_partition(f.name) for f in self._partitions)
+
+        for records in sources:
+            index: Dict[bytes, List[bytes]] = {}
+            for packed in records:
+                index.setdefault(packed[:96], []).append(packed)
+            for group in index.values():
+                if len(group) > 1:
+                    yield group
+
+    @staticmethod
+    def _read_partition(path: str) -> List[bytes]:
+        with open(path, 'rb') as f:
+            data = f.read()
+        size = SPILL_RECORD.size
+        return [data[i:i + size] for i in range(0, len(data), size)]
+
+    def findings(self) -> List[dict]:
+        """
+        Report every colliding pair and the private key it reveals.
+
+        Each finding has 'public_key', 'x', 'sig1', 'sig2' and
+        'private_key' (None when the pair is degenerate).
+        """
+        findings = []
+        for group in self._iter_groups():
+            sigs = []
+            for packed in dict.fromkeys(group):  # drop exact duplicates, keep order
+                pub, x, r, s = SPILL_RECORD.unpack(packed)
+                sigs.append((pub.hex(), int.from_bytes(x, 'big'),
+                             (int.from_bytes(r, 'big'), int.from_bytes(s, 'big'))))
+            for pub, x, sig in sigs[1:]:
+                findings.append({'public_key': pub, 'x': x, 'sig1': sigs[0][2], 'sig2': sig})
+
+        keys = batch_k_reuse_attack([(f['sig1'], f['sig2']) for f in findings])
+        for finding, d in zip(findings, keys):
+            finding['private_key'] = d
+
+        self.close()
+        return findings
+
+    def close(self) -> None:
+        """Remove spill files."""
+        for f in self._partitions:
+            f.close()
+        if self._partition_dir:
+            shutil.rmtree(self._partition_dir, ignore_errors=True)
+        self._partitions = []
+        self._partition_dir = None
+
+def verify_finding(finding: dict) -> bool:
+    """Check that the recovered private key matches the logged public key."""
+    d = finding['private_key']
+    if d is None:
+        return False
+    point = scalar_mult(d, G)
+    return f'{point[0]:064x}{point[1]:064x}' == finding['public_key']
+
+def build_demo_corpus(path: str, noise_records: int, victims: int) -> Dict[str, int]:
+    """
+    Write a CSV corpus of unrelated records plus k-reusing signature pairs.
+
+    Noise records only need distinct x(kG) values for the scanner, so they
+    are random; the victims' records are real faulty SM2 signatures. Four
+    malformed lines check that bad lines are counted, not fatal.
+    """
+    secrets_by_pub = {}
+    with open(path, 'w') as f:
+        f.write('# pubkey,e,r,s\n')
+        for _ in range(noise_records):
+            pub = f'{randint(1, N - 1):064x}{randint(1, N - 1):064x}'
+            f.write(f'{pub},{randint(1, N - 1):x},{randint(1, N - 1):x},{randint(1, N - 1):x}\n')
+
+        # Wrong field count, non-hex e, a 257-bit r and a 63-byte public key
+        pub = 'ab' * 64
+        f.write(f'{pub},1,2\n')
+        f.write(f'{pub},xyz,1,1\n')
+        f.write(f'{pub},1,{1 << 256:x},1\n')
+        f.write(f'{pub[:-2]},1,1,1\n')
+
+        for v in range(victims):
+            d = randint(1, N - 1)
+            pub_point = scalar_mult(d, G)
+            pub = f'{pub_point[0]:064x}{pub_point[1]:064x}'
+            k = randint(1, N - 1)
+            for i in range(2):
+                msg_hex = f'victim {v} message {i}'.encode().hex()
+                r, s = faulty_sign(msg_hex, d, k)
+                e = int(hash_sm3(msg_hex), 16)
+                f.write(f'{pub},{e:x},{r:x},{s:x}\n')
+            secrets_by_pub[pub] = d
+
+    return secrets_by_pub
+
+def main():
+    """Scan a synthetic corpus both in memory and with disk spilling."""
+    print("--- Streaming SM2 k-Reuse Scanner ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, 'signatures.csv')
+        noise, victims = 20000, 3
+        secrets_by_pub = build_demo_corpus(corpus, noise, victims)
+        print(f"Corpus: {noise + 2 * victims} records, {victims} keys reused k")
+
+        for label, memory_limit in (('in-memory', DEFAULT_MEMORY_LIMIT), ('spill-to-disk', 2000)):
+            scanner = KReuseScanner(memory_limit=memory_limit, num_partitions=16, spill_dir=tmp)
+            start_time = time.time()
+            with open(corpus) as f:
+                findings = scanner.scan(f, chunk_size=5000)
+            elapsed = time.time() - start_time
+
+            recovered = {f['public_key']: f['private_key'] for f in findings}
+            all_found = recovered == secrets_by_pub
+            print(f"\n[{label}] spilled={scanner.spilled}, {scanner.records_seen} records "
+                  f"in {elapsed:.3f}s ({scanner.records_seen / elapsed:,.0f} records/s), "
+                  f"{scanner.bad_lines} bad lines skipped")
+            print(f"[{label}] findings: {len(findings)}, all keys recovered: {all_found}")
+            assert all_found and scanner.bad_lines == 4
+
+        verified = all(verify_finding(f) for f in findings)
+
+        # The same victim logged once raw and once SEC1-compressed is still one key
+        pub, d = next(iter(secrets_by_pub.items()))
+        x_hex, y = pub[:64], int(pub[64:], 16)
+        k = randint(1, N - 1)
+        pair = []
+        for i, encoding in enumerate((pub, f'{2 + (y & 1):02x}{x_hex}')):
+            msg_hex = f'mixed encoding message {i}'.encode().hex()
+            r, s = faulty_sign(msg_hex, d, k)
+            pair.append((encoding, int(hash_sm3(msg_hex), 16), r, s))
+        scanner = KReuseScanner()
+        scanner.add_records(pair)
+        mixed = [f['private_key'] for f in scanner.findings()] == [d]
+        try:
+            normalize_public_key(pub[:-2])
+            bad_length_rejected = False
+        except ValueError:
+            bad_length_rejected = True
+        print(f"Raw and compressed encodings of one key collide: {mixed}, "
+              f"63-byte key rejected: {bad_length_rejected}")
+        for f in findings:
+            print(f"Recovered key for {f['public_key'][:16]}...: {f['private_key']:x}")
+        print(f"Recovered keys match public keys: {verified}")
+
+    assert verified and mixed and bad_length_rejected
+    print("\n✅ k-reuse scan successful!")
+
+if __name__ == "__main__":
+    main()
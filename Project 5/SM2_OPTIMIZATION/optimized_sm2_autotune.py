@@ -0,0 +1,154 @@
+"""
+Window-Size Autotuner for SM2 Scalar Multiplication.
+
+The best scalar multiplication algorithm and window width depend on the
+interpreter, the machine, whether the point is fixed (G, with a table that
+is reused) or variable (a fresh table per call), and how often a table is
+reused. This module benchmarks the candidates on the running machine and
+persists the winners to a small JSON profile that SM2Optimizer loads
+automatically on construction.
+"""
+
+import json
+import os
+import secrets
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+from optimized_sm2_utils import (SM2Optimizer, N, G, TUNING_PROFILE_VERSION,
+                                 default_profile_path, machine_fingerprint, load_tuning_profile)
+
+VARIABLE_BASE_CANDIDATES = [('windowed', w) for w in (3, 4, 5, 6)] + [('wnaf', w) for w in (3, 4, 5, 6)]
+# fixed_base_mult() only runs the comb table, so that is the only method worth timing for G
+FIXED_BASE_CANDIDATES = [('comb', w) for w in (4, 5, 6, 8)]
+
+def _time_per_call(func: Callable[[int], object], scalars: List[int]) -> float:
+    """Average wall time of func over the given scalars."""
+    start = time.perf_counter()
+    for k in scalars:
+        func(k)
+    return (time.perf_counter() - start) / len(scalars)
+
+def _bench_variable_base(method: str, window: int, point, scalars: List[int]) -> float:
+    """Per-call cost when the table is rebuilt for every point."""
+    optimizer = SM2Optimizer(profile_path=os.devnull)
+    if method == 'wnaf':
+        return _time_per_call(lambda k: optimizer.scalar_mult_wnaf(k, point, window), scalars)
+    return _time_per_call(lambda k: optimizer.scalar_mult_windowed(k, point, window), scalars)
+
+def _bench_fixed_base(method: str, window: int, scalars: List[int], reuse: int) -> float:
+    """Per-call cost for G with the table build amortized over `reuse` calls."""
+    optimizer = SM2Optimizer(profile_path=os.devnull)
+    if method != 'comb':
+        raise ValueError(f"Unsupported fixed-base method: {method}")
+    start = time.perf_counter()
+    optimizer.set_fixed_base_table(optimizer.build_fixed_base_table(G, window), window)
+    build_time = time.perf_counter() - start
+    return build_time / reuse + _time_per_call(optimizer.fixed_base_mult, scalars)
+
+def autotune(iterations: int = 10, reuse: int = 1000, path: Optional[str] = None,
+             save: bool = True, verbose: bool = True) -> dict:
+    """
+    Benchmark candidate algorithms/window sizes and persist the best ones.
+
+    Args:
+        iterations: Random scalars timed per candidate
+        reuse: Expected number of k*G calls per fixed-base table build
+        path: Profile location (defaults to default_profile_path())
+        save: Write the profile so later SM2Optimizer instances use it
+        verbose: Print the timing of every candidate
+
+    Returns:
+        The profile dictionary
+    """
+    scalars = [secrets.randbelow(N - 1) + 1 for _ in range(iterations)]
+    reference = SM2Optimizer(profile_path=os.devnull)
+    point = reference.scalar_mult_binary(secrets.randbelow(N - 1) + 1, G)
+
+    # Every candidate must agree with the reference implementation
+    check = scalars[0]
+    expected_var = reference.scalar_mult_binary(check, point)
+    expected_fixed = reference.scalar_mult_binary(check, G)
+    for method, window in VARIABLE_BASE_CANDIDATES:
+        probe = SM2Optimizer(profile_path=os.devnull)
+        probe.variable_base_method, probe.window_size = method, window
+        assert probe.scalar_mult(check, point) == expected_var, (method, window)
+    assert reference.fixed_base_mult(check) == expected_fixed
+
+    timings: Dict[str, Dict[str, float]] = {'variable_base': {}, 'fixed_base': {}}
+    for method, window in VARIABLE_BASE_CANDIDATES:
+        timings['variable_base'][f'{method}:{window}'] = _bench_variable_base(method, window, point, scalars)
+    for method, window in FIXED_BASE_CANDIDATES:
+        timings['fixed_base'][f'{method}:{window}'] = _bench_fixed_base(method, window, scalars, reuse)
+
+    choices = {}
+    for use_case, results in timings.items():
+        best = min(results, key=results.get)
+        method, window = best.split(':')
+        choices[use_case] = {'method': method, 'window': int(window), 'time': results[best]}
+
+        if verbose:
+            print(f"{use_case}:")
+            for name, t in sorted(results.items(), key=lambda item: item[1]):
+                marker = '  <- chosen' if name == best else ''
+                print(f"  {name:12} {t * 1000:8.3f} ms{marker}")
+
+    profile = {
+        'version': TUNING_PROFILE_VERSION,
+        'fingerprint': machine_fingerprint(),
+        'reuse': reuse,
+        'iterations': iterations,
+        'choices': choices,
+    }
+
+    if save:
+        save_profile(profile, path)
+    return profile
+
+def save_profile(profile: dict, path: Optional[str] = None) -> str:
+    """Atomically write a tuning profile and return its path."""
+    path = path or default_profile_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def main():
+    """
+    Tune this machine and show that new optimizers pick the profile up.
+
+    The demo writes its (quick, noisy) profile to a temporary directory;
+    run with --save to tune properly and install the profile at
+    default_profile_path(), where every later SM2Optimizer finds it.
+    """
+    print("=== SM2 Scalar Multiplication Autotuner ===")
+    if '--save' in sys.argv[1:]:
+        path = default_profile_path()
+        autotune(iterations=100, path=path)
+        print(f"\nProfile installed at {path}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tuning.json')
+        profile = autotune(iterations=10, path=path)
+        print(f"\nProfile written to {path}")
+
+        optimizer = SM2Optimizer(profile_path=path)
+        print(f"SM2Optimizer variable base: {optimizer.variable_base_method}, w={optimizer.window_size}")
+        print(f"SM2Optimizer fixed base:    comb, w={optimizer.fixed_base_window}")
+
+        k = 0x128B2FA8BD433C6C068C8D803DFF79792A519A55171B1B650C23661D15897263
+        correct = (optimizer.scalar_mult(k, G) == optimizer.scalar_mult_binary(k, G)
+                   and optimizer.fixed_base_mult(k) == optimizer.scalar_mult_binary(k, G))
+        print(f"Tuned scalar multiplication correct: {correct}")
+
+        assert optimizer.tuning_profile == load_tuning_profile(path) == profile
+        assert correct
+
+    print("\n✅ Autotuning complete!")
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,14 @@ class OptimizedSM2Encryptor:
     def __init__(self):
         self.optimizer = SM2Optimizer()
         self.kdf_cache = {}  # Cache for KDF results
+    
+    def stats(self):
+        """Snapshot of the optimizer's operation counters and stage timings."""
+        return self.optimizer.stats()
+    
+    def collect_stats(self):
+        """Context manager collecting statistics for the enclosed operations."""
+        return self.optimizer.collect_stats()
         
     def hash_sm3(self, data_hex: str) -> str:
         """Optimized SM3 hash function wrapper."""
@@ -33,6 +41,7 @@ class OptimizedSM2Encryptor:
         """
         cache_key = (z, klen)
         if cache_key in self.kdf_cache:
+            self.optimizer.count('kdf_cache_hits')
             return self.kdf_cache[cache_key]
         
         v = 256  # Hash output length for SM3
@@ -78,27 +87,31 @@ class OptimizedSM2Encryptor:
         msg_hex = msg_bytes.hex()
         klen = len(msg_hex) * 4
         
+        stage = self.optimizer.stage
         while True:
-            if use_deterministic_k:
-                # Deterministic k based on message hash
-                msg_hash = self.hash_sm3(msg_hex)
-                k = int(msg_hash, 16) % (N - 1) + 1
-            else:
-                k = randint(1, N - 1)
+            with stage('nonce'):
+                if use_deterministic_k:
+                    # Deterministic k based on message hash
+                    msg_hash = self.hash_sm3(msg_hex)
+                    k = int(msg_hash, 16) % (N - 1) + 1
+                else:
+                    k = randint(1, N - 1)
             
-            # C1 = k * G using optimized scalar multiplication
-            c1_point = self.optimizer.scalar_mult_windowed(k, G)
-            c1_hex = f'{c1_point[0]:064x}{c1_point[1]:064x}'
-            
-            # S = k * PB using optimized scalar multiplication
-            s_point = self.optimizer.scalar_mult_windowed(k, public_key)
+            with stage('scalar_mult'):
+                # C1 = k * G using optimized scalar multiplication
+                c1_point = self.optimizer.fixed_base_mult(k)
+                c1_hex = f'{c1_point[0]:064x}{c1_point[1]:064x}'
+                
+                # S = k * PB using optimized scalar multiplication
+                s_point = self.optimizer.scalar_mult(k, public_key)
             if s_point is None:
                 continue
             
             # Optimized KDF
             x2_hex = f'{s_point[0]:064x}'
             y2_hex = f'{s_point[1]:064x}'
-            t_bin = self.kdf_optimized(x2_hex + y2_hex, klen)
+            with stage('kdf'):
+                t_bin = self.kdf_optimized(x2_hex + y2_hex, klen)
             
             # Check if t is all zeros
             if int(t_bin, 2) == 0:
@@ -110,7 +123,8 @@ class OptimizedSM2Encryptor:
             
             # C3 = Hash(x2 || M || y2)
             c3_input = x2_hex + msg_hex + y2_hex
-            c3_hex = self.hash_sm3(c3_input)
+            with stage('hash'):
+                c3_hex = self.hash_sm3(c3_input)
             
             return c1_hex, c2_hex, c3_hex
     
@@ -128,8 +142,11 @@ class OptimizedSM2Encryptor:
         if not self._is_on_curve(c1_point):
             return None
         
+        stage = self.optimizer.stage
+        
         # S = dB * C1 using optimized scalar multiplication
-        s_point = self.optimizer.scalar_mult_windowed(private_key, c1_point)
+        with stage('scalar_mult'):
+            s_point = self.optimizer.scalar_mult(private_key, c1_point)
         if s_point is None:
             return None
         
@@ -137,7 +154,8 @@ class OptimizedSM2Encryptor:
         klen = len(c2_hex) * 4
         x2_hex = f'{s_point[0]:064x}'
         y2_hex = f'{s_point[1]:064x}'
-        t_bin = self.kdf_optimized(x2_hex + y2_hex, klen)
+        with stage('kdf'):
+            t_bin = self.kdf_optimized(x2_hex + y2_hex, klen)
         
         # M' = C2 XOR t
         m_prime_int = int(c2_hex, 16) ^ int(t_bin, 2)
@@ -145,7 +163,8 @@ class OptimizedSM2Encryptor:
         
         # Verify MAC: C3' = Hash(x2 || M' || y2)
         c3_prime_input = x2_hex + m_prime_hex + y2_hex
-        c3_prime_hex = self.hash_sm3(c3_prime_input)
+        with stage('hash'):
+            c3_prime_hex = self.hash_sm3(c3_prime_input)
         
         if c3_prime_hex.lower() != c3_hex.lower():
             return None
@@ -279,6 +298,17 @@ def demonstration():
     decrypted_det = encryptor.decrypt_optimized(c1_det, c2_det, c3_det, private_key_db)
     print(f"Deterministic encryption successful: {message == decrypted_det}")
     
+    # Scoped instrumentation of an encrypt/decrypt round trip
+    print("\n--- Operation Profile (encrypt + decrypt) ---")
+    with encryptor.collect_stats() as stats:
+        c1_p, c2_p, c3_p = encryptor.encrypt_optimized(message, public_key_pb)
+        encryptor.decrypt_optimized(c1_p, c2_p, c3_p, private_key_db)
+    profile = stats.snapshot()
+    for name, value in profile['counters'].items():
+        print(f"{name:18}: {value}")
+    for name, data in profile['stages'].items():
+        print(f"stage {name:12}: {data['calls']} call(s), {data['time']:.6f}s")
+    
     # Performance benchmark
     print("\n--- Performance Benchmark ---")
     encryptor.benchmark_encryption(message, public_key_pb, private_key_db, 30)
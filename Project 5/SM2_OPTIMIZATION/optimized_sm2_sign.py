@@ -7,12 +7,15 @@ batch verification, and side-channel resistance techniques.
 """
 
 import binascii
+import io
 import time
 from random import randint
-from typing import List, Tuple
+from typing import BinaryIO, List, Tuple
 from gmpy2 import invert
 from gmssl import sm3, func
 from optimized_sm2_utils import SM2Optimizer, P, N, G, A, B, Point
+from optimized_sm3 import DEFAULT_CHUNK_SIZE, sm3_hash_fileobj
+from optimized_sm2_tables import DEFAULT_TABLE_WINDOW, open_fixed_base_table
 
 class OptimizedSM2Signer:
     """Optimized SM2 signature implementation with performance enhancements."""
@@ -24,8 +27,24 @@ class OptimizedSM2Signer:
     
     def _init_precomputed_tables(self):
         """Initialize precomputed tables for faster operations."""
-        # Precompute multiples of base point G
-        self.precomputed_base = self.optimizer.precompute_table(G, window_size=6)
+        # Map the on-disk fixed-base table for G (generated once, shared between processes)
+        window_size = DEFAULT_TABLE_WINDOW
+        if self.optimizer.tuning_profile is not None:
+            window_size = self.optimizer.fixed_base_window
+        try:
+            self.precomputed_base = open_fixed_base_table(window_size=window_size)
+        except OSError:
+            # No writable cache directory: build the table in memory as before
+            self.precomputed_base = self.optimizer.build_fixed_base_table(G, window_size)
+        self.optimizer.set_fixed_base_table(self.precomputed_base, window_size)
+    
+    def stats(self):
+        """Snapshot of the optimizer's operation counters and stage timings."""
+        return self.optimizer.stats()
+    
+    def collect_stats(self):
+        """Context manager collecting statistics for the enclosed operations."""
+        return self.optimizer.collect_stats()
         
     def hash_sm3(self, data_hex: str) -> str:
         """Optimized SM3 hash function wrapper."""
@@ -68,25 +87,57 @@ class OptimizedSM2Signer:
             Tuple of (r, s) signature components
         """
         m_prime = za + message
-        e = self.hash_sm3(m_prime)
+        with self.optimizer.stage('hash'):
+            e = self.hash_sm3(m_prime)
         e_int = int(e, 16)
+        return self._sign_digest(e_int, private_key, use_rfc6979)
+    
+    def sign_stream(self, fileobj: BinaryIO, za: str, private_key: int,
+                    use_rfc6979: bool = False,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[str, str]:
+        """
+        SM2 signature over the raw bytes of a binary stream.
         
+        Z_A and the stream are fed into an incremental SM3 in fixed-size
+        chunks, so memory use does not depend on the stream length. The
+        result equals sign_optimized(fileobj.read().hex(), za, ...).
+        
+        Args:
+            fileobj: Binary file-like object opened for reading
+            za: Pre-calculated Z_A value
+            private_key: Signer's private key
+            use_rfc6979: Use deterministic nonce generation (RFC 6979)
+            chunk_size: Read buffer size in bytes
+            
+        Returns:
+            Tuple of (r, s) signature components
+        """
+        with self.optimizer.stage('hash'):
+            e = sm3_hash_fileobj(fileobj, bytes.fromhex(za), chunk_size).hexdigest()
+        return self._sign_digest(int(e, 16), private_key, use_rfc6979)
+    
+    def _sign_digest(self, e_int: int, private_key: int, use_rfc6979: bool) -> Tuple[str, str]:
+        """Sign a precomputed digest e = SM3(Z_A || M)."""
+        stage = self.optimizer.stage
         while True:
-            if use_rfc6979:
-                # Deterministic nonce generation (simplified RFC 6979)
-                k = self._generate_deterministic_k(e_int, private_key)
-            else:
-                k = randint(1, N - 1)
+            with stage('nonce'):
+                if use_rfc6979:
+                    # Deterministic nonce generation (simplified RFC 6979)
+                    k = self._generate_deterministic_k(e_int, private_key)
+                else:
+                    k = randint(1, N - 1)
             
             # Use optimized scalar multiplication
-            k_g = self.optimizer.scalar_mult_windowed(k, G)
+            with stage('scalar_mult'):
+                k_g = self.optimizer.fixed_base_mult(k)
             
             r = (e_int + k_g[0]) % N
             if r == 0 or r + k == N:
                 continue
             
             # Optimized signature calculation
-            s = (invert(1 + private_key, N) * (k - r * private_key)) % N
+            with stage('signature'):
+                s = (invert(1 + private_key, N) * (k - r * private_key)) % N
             if s != 0:
                 break
                 
@@ -112,17 +163,36 @@ class OptimizedSM2Signer:
             return False
         
         m_prime = za + message
-        e = self.hash_sm3(m_prime)
-        e_int = int(e, 16)
+        with self.optimizer.stage('hash'):
+            e = self.hash_sm3(m_prime)
+        return self._verify_digest(int(e, 16), public_key, r, s)
+    
+    def verify_stream(self, fileobj: BinaryIO, za: str, public_key: Point,
+                      r_hex: str, s_hex: str,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> bool:
+        """SM2 verification over a binary stream hashed incrementally."""
+        r = int(r_hex, 16)
+        s = int(s_hex, 16)
+        
+        # Early validation before reading the whole stream
+        if not (1 <= r < N and 1 <= s < N):
+            return False
         
+        with self.optimizer.stage('hash'):
+            e = sm3_hash_fileobj(fileobj, bytes.fromhex(za), chunk_size).hexdigest()
+        return self._verify_digest(int(e, 16), public_key, r, s)
+    
+    def _verify_digest(self, e_int: int, public_key: Point, r: int, s: int) -> bool:
+        """Verify (r, s) against a precomputed digest e = SM3(Z_A || M)."""
         t = (r + s) % N
         if t == 0:
             return False
         
         # Use optimized scalar multiplication
-        p1 = self.optimizer.scalar_mult_windowed(s, G)
-        p2 = self.optimizer.scalar_mult_windowed(t, public_key)
-        x1, y1 = self.optimizer.point_add(p1, p2)
+        with self.optimizer.stage('scalar_mult'):
+            p1 = self.optimizer.fixed_base_mult(s)
+            p2 = self.optimizer.scalar_mult(t, public_key)
+            x1, y1 = self.optimizer.point_add(p1, p2)
         
         r_prime = (e_int + x1) % N
         return r == r_prime
@@ -233,11 +303,37 @@ def demonstration():
     is_det_valid = signer.verify_optimized(message_hex, za_hex, public_key_pa, r_det, s_det)
     print(f"Deterministic verification: {'Success' if is_det_valid else 'Failure'}")
     
+    # Streaming signature over a file-like object
+    print("\n--- Streaming Signature (incremental SM3) ---")
+    payload = message_text.encode() * 256
+    start_time = time.time()
+    r_str, s_str = signer.sign_stream(io.BytesIO(payload), za_hex, private_key_da,
+                                      chunk_size=1024)
+    stream_sign_time = time.time() - start_time
+    is_stream_valid = signer.verify_stream(io.BytesIO(payload), za_hex, public_key_pa,
+                                           r_str, s_str, chunk_size=1024)
+    is_compatible = signer.verify_optimized(payload.hex(), za_hex, public_key_pa, r_str, s_str)
+    print(f"Streamed {len(payload)} bytes, signing time: {stream_sign_time:.6f}s")
+    print(f"Stream verification: {'Success' if is_stream_valid else 'Failure'}")
+    print(f"Matches in-memory verification: {is_compatible}")
+    
+    # Scoped instrumentation of a single sign + verify
+    print("\n--- Operation Profile (sign + verify) ---")
+    with signer.collect_stats() as stats:
+        r_p, s_p = signer.sign_optimized(message_hex, za_hex, private_key_da)
+        signer.verify_optimized(message_hex, za_hex, public_key_pa, r_p, s_p)
+    profile = stats.snapshot()
+    for name, value in profile['counters'].items():
+        print(f"{name:18}: {value}")
+    for name, data in profile['stages'].items():
+        print(f"stage {name:12}: {data['calls']} call(s), {data['time']:.6f}s")
+    
     # Performance benchmark
     print("\n--- Performance Benchmark ---")
     signer.benchmark_signature_operations(message_hex, private_key_da, public_key_pa, 50)
     
     assert is_valid and is_det_valid
+    assert is_stream_valid and is_compatible
     print("\n✅ All optimized signature operations successful!")
 
 if __name__ == "__main__":
@@ -0,0 +1,251 @@
+"""
+On-Disk Fixed-Base Tables for the SM2 Base Point.
+
+Building a large comb table for G in Python takes a noticeable fraction of
+a second, and every signer used to rebuild its tables on construction. This
+module serializes the table once into a versioned binary file and maps it
+read-only with mmap: entries are parsed on first use, and all processes
+mapping the same file share its pages through the OS page cache.
+
+File layout (big-endian):
+    header  magic 'SM2T' | version u16 | window u8 | pad u8 | rows u16 |
+            entries-per-row u16 | curve digest (32) | payload digest (32)
+    payload rows * entries-per-row records of x || y (32 bytes each),
+            row i holding j * 2^(window*i) * G for j = 1 .. 2^window - 1
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import time
+from typing import List, Optional
+from optimized_sm2_utils import SM2Optimizer, P, A, B, N, G, Point
+
+TABLE_MAGIC = b'SM2T'
+TABLE_VERSION = 1
+TABLE_HEADER = struct.Struct('>4sHBxHH32s32s')
+ENTRY_SIZE = 64
+DEFAULT_TABLE_WINDOW = 8
+TABLE_DIR_ENV = 'SM2_TABLE_DIR'
+
+def curve_digest() -> bytes:
+    """Digest of the curve constants a table was generated for."""
+    params = b''.join(v.to_bytes(32, 'big') for v in (P, A, B, N, G[0], G[1]))
+    return hashlib.sha256(params).digest()
+
+def default_table_path(window_size: int = DEFAULT_TABLE_WINDOW) -> str:
+    """Table location: $SM2_TABLE_DIR or ~/.cache/sm2_optimization."""
+    directory = os.environ.get(TABLE_DIR_ENV) or os.path.join(
+        os.path.expanduser('~'), '.cache', 'sm2_optimization')
+    return os.path.join(directory, f'sm2_g_w{window_size}_v{TABLE_VERSION}.tbl')
+
+def write_table_file(path: str, window_size: int = DEFAULT_TABLE_WINDOW,
+                     optimizer: Optional[SM2Optimizer] = None) -> None:
+    """
+    Build the fixed-base table for G and write it atomically to `path`.
+
+    The file is written to a temporary name and renamed into place, so
+    concurrent readers never observe a partially written table.
+    """
+    optimizer = optimizer or SM2Optimizer()
+    table = optimizer.build_fixed_base_table(G, window_size)
+    entries = (1 << window_size) - 1
+
+    payload = bytearray()
+    for row in table:
+        for x, y in row[1:]:
+            payload += x.to_bytes(32, 'big')
+            payload += y.to_bytes(32, 'big')
+
+    header = TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, window_size, len(table),
+                               entries, curve_digest(), hashlib.sha256(payload).digest())
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+class _MappedRow:
+    """One table row; entries are parsed from the mapping on first access."""
+
+    __slots__ = ('_buf', '_base', '_cache')
+
+    def __init__(self, buf, base: int, entries: int):
+        self._buf = buf
+        self._base = base
+        self._cache: List[Optional[Point]] = [None] * (entries + 1)
+
+    def __getitem__(self, j: int) -> Optional[Point]:
+        point = self._cache[j]
+        if point is None and j:
+            off = self._base + (j - 1) * ENTRY_SIZE
+            buf = self._buf
+            point = (int.from_bytes(buf[off:off + 32], 'big'),
+                     int.from_bytes(buf[off + 32:off + 64], 'big'))
+            self._cache[j] = point
+        return point
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+class MappedFixedBaseTable:
+    """Read-only, lazily parsed view of a fixed-base table file."""
+
+    def __init__(self, path: str, verify_checksum: bool = True):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._validate(verify_checksum)
+        except ValueError:
+            self._mmap.close()
+            raise
+
+        self._rows = [
+            _MappedRow(self._mmap, TABLE_HEADER.size + i * self.entries * ENTRY_SIZE, self.entries)
+            for i in range(self.rows)
+        ]
+
+    def _validate(self, verify_checksum: bool) -> None:
+        """Check format version, curve parameters, size and payload digest."""
+        if len(self._mmap) < TABLE_HEADER.size:
+            raise ValueError(f"{self.path}: truncated table header")
+
+        (magic, version, self.window_size, self.rows, self.entries,
+         curve, checksum) = TABLE_HEADER.unpack_from(self._mmap, 0)
+
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            raise ValueError(f"{self.path}: unsupported table format")
+        if curve != curve_digest():
+            raise ValueError(f"{self.path}: table was built for different curve parameters")
+        if self.entries != (1 << self.window_size) - 1:
+            raise ValueError(f"{self.path}: inconsistent window size")
+        if len(self._mmap) != TABLE_HEADER.size + self.rows * self.entries * ENTRY_SIZE:
+            raise ValueError(f"{self.path}: table size does not match header")
+        if verify_checksum:
+            payload = memoryview(self._mmap)[TABLE_HEADER.size:]
+            try:
+                if hashlib.sha256(payload).digest() != checksum:
+                    raise ValueError(f"{self.path}: table checksum mismatch")
+            finally:
+                payload.release()
+
+    def __getitem__(self, i: int) -> _MappedRow:
+        return self._rows[i]
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        """Drop parsed rows and unmap the file."""
+        self._rows = []
+        self._mmap.close()
+
+_open_tables = {}
+
+def open_fixed_base_table(path: Optional[str] = None, window_size: int = DEFAULT_TABLE_WINDOW,
+                          verify_checksum: bool = True) -> MappedFixedBaseTable:
+    """
+    Map the fixed-base table for G, generating the file on first use.
+
+    Tables are cached per path within a process, so every signer in the
+    process shares one mapping. A corrupt or stale file is regenerated.
+    """
+    path = path or default_table_path(window_size)
+    table = _open_tables.get(path)
+    if table is not None:
+        return table
+
+    if not os.path.exists(path):
+        write_table_file(path, window_size)
+    try:
+        table = MappedFixedBaseTable(path, verify_checksum)
+    except ValueError:
+        write_table_file(path, window_size)
+        table = MappedFixedBaseTable(path, verify_checksum)
+
+    _open_tables[path] = table
+    return table
+
+def _cold_start_probe(path: str) -> float:
+    """Time mapping and first use of the table inside a fresh worker process."""
+    start = time.perf_counter()
+    optimizer = SM2Optimizer()
+    table = open_fixed_base_table(path)
+    optimizer.set_fixed_base_table(table, table.window_size)
+    optimizer.fixed_base_mult(0x1234567890ABCDEF)
+    return time.perf_counter() - start
+
+def demonstration():
+    """Compare in-Python table construction with mapping the table file."""
+    import tempfile
+    from multiprocessing import Pool
+
+    print("=== On-Disk Fixed-Base Tables ===")
+    window_size = DEFAULT_TABLE_WINDOW
+
+    optimizer = SM2Optimizer()
+    start_time = time.perf_counter()
+    built = optimizer.build_fixed_base_table(G, window_size)
+    build_time = time.perf_counter() - start_time
+    print(f"Build w={window_size} table in Python: {build_time * 1000:.2f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, os.path.basename(default_table_path(window_size)))
+        write_table_file(path, window_size, optimizer)
+        print(f"Table file: {os.path.getsize(path)} bytes")
+
+        start_time = time.perf_counter()
+        mapped = MappedFixedBaseTable(path)
+        map_time = time.perf_counter() - start_time
+        print(f"Map + verify table file:         {map_time * 1000:.2f} ms")
+
+        same = all(mapped[i][j] == built[i][j] for i in (0, 1, len(built) - 1) for j in (1, 7, 255))
+        print(f"Mapped entries match built table: {same}")
+
+        mapped_opt = SM2Optimizer()
+        mapped_opt.set_fixed_base_table(mapped, mapped.window_size)
+        k = 0x128B2FA8BD433C6C068C8D803DFF79792A519A55171B1B650C23661D15897263
+        mult_ok = mapped_opt.fixed_base_mult(k) == optimizer.scalar_mult_windowed(k, G)
+        print(f"k*G through mapped table correct: {mult_ok}")
+
+        with Pool(2) as pool:
+            probes = pool.map(_cold_start_probe, [path, path])
+        print(f"Worker cold start (map + first k*G): "
+              f"{', '.join(f'{t * 1000:.2f} ms' for t in probes)}")
+
+        # A corrupted payload fails the checksum
+        with open(path, 'r+b') as f:
+            f.seek(TABLE_HEADER.size + 5)
+            f.write(b'\xff')
+        try:
+            MappedFixedBaseTable(path)
+            corrupt_rejected = False
+        except ValueError as e:
+            corrupt_rejected = True
+            print(f"Corrupted table rejected: {e.args[0].split(': ')[-1]}")
+
+        # A table built for other parameters is rejected by its curve digest
+        write_table_file(path, window_size, optimizer)
+        curve_offset = TABLE_HEADER.size - 64  # curve digest precedes the payload digest
+        with open(path, 'r+b') as f:
+            f.seek(curve_offset)
+            f.write(hashlib.sha256(b'other curve').digest())
+        try:
+            MappedFixedBaseTable(path)
+            curve_rejected = False
+        except ValueError as e:
+            curve_rejected = 'different curve parameters' in e.args[0]
+            print(f"Foreign-curve table rejected: {e.args[0].split(': ')[-1]}")
+
+        mapped.close()
+
+    assert same and mult_ok and corrupt_rejected and curve_rejected
+    print("\n✅ On-disk table operations successful!")
+
+if __name__ == "__main__":
+    demonstration()
@@ -6,7 +6,11 @@ including window-based scalar multiplication, precomputed tables, and
 Montgomery ladder algorithms for enhanced performance.
 """
 
-from typing import Tuple, List, Optional
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Tuple, List, Optional
+import json
+import os
+import platform
 import time
 
 # --- Standard SM2 Elliptic Curve Parameters ---
@@ -19,13 +23,207 @@ GY = 0x0680512BCBB42C07D47349D2153B70C4E5D7FDFCBFA36EA1A85841B9E46E09A2
 G = (GX, GY)
 
 Point = Tuple[int, int]
+JacobianPoint = Tuple[int, int, int]  # (X, Y, Z) with x = X/Z^2, y = Y/Z^3
+
+def batch_invert(values: List[int], modulus: int = P) -> List[int]:
+    """
+    Invert many non-zero values with a single modular inversion.
+    
+    Montgomery's trick: accumulate prefix products, invert the total once,
+    then unwind the prefix products to recover each individual inverse.
+    """
+    if not values:
+        return []
+    
+    prefix = [0] * len(values)
+    acc = 1
+    for i, v in enumerate(values):
+        prefix[i] = acc
+        acc = acc * v % modulus
+        
+    inv = pow(acc, -1, modulus)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = inv * prefix[i] % modulus
+        inv = inv * values[i] % modulus
+        
+    return result
+
+TUNING_PROFILE_ENV = 'SM2_TUNING_PROFILE'
+TUNING_PROFILE_VERSION = 2  # v1 profiles could pick fixed-base methods that were never applied
+_loaded_profiles: Dict[str, Tuple[int, Optional[dict]]] = {}
+
+def default_profile_path() -> str:
+    """Tuning profile location: $SM2_TUNING_PROFILE or ~/.cache/sm2_optimization/tuning.json."""
+    return os.environ.get(TUNING_PROFILE_ENV) or os.path.join(
+        os.path.expanduser('~'), '.cache', 'sm2_optimization', 'tuning.json')
+
+def machine_fingerprint() -> dict:
+    """Identify the arithmetic backend and machine a tuning profile applies to."""
+    return {
+        'backend': 'int',
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+def load_tuning_profile(path: Optional[str] = None) -> Optional[dict]:
+    """
+    Load a profile written by the autotuner, cached per path and mtime.
+    
+    Returns None if the file is missing, unreadable, from another format
+    version or tuned on a different machine/backend.
+    """
+    path = path or default_profile_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _loaded_profiles.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+        
+    profile = None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if (data.get('version') == TUNING_PROFILE_VERSION
+                and data.get('fingerprint') == machine_fingerprint()):
+            profile = data
+    except (OSError, ValueError):
+        pass
+        
+    _loaded_profiles[path] = (mtime, profile)
+    return profile
+
+def wnaf_digits(k: int, window_size: int) -> List[int]:
+    """Width-w non-adjacent form of k, least significant digit first."""
+    digits = []
+    width = 1 << window_size
+    half = width >> 1
+    while k:
+        if k & 1:
+            d = k & (width - 1)
+            if d >= half:
+                d -= width
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+class OperationStats:
+    """
+    Opt-in operation counters and per-stage timers.
+    
+    Field multiplication counts are the per-formula totals of the point
+    arithmetic (squarings included), not a trace of every `*` executed.
+    """
+    
+    COUNTERS = ('field_inversions', 'field_mults', 'point_doubles', 'point_adds',
+                'table_builds', 'table_cache_hits', 'kdf_cache_hits')
+    
+    def __init__(self):
+        self.counters: Dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+        self.stage_calls: Dict[str, int] = {}
+        self.stage_times: Dict[str, float] = {}
+        
+    def record(self, inversions: int = 0, mults: int = 0, doubles: int = 0, adds: int = 0) -> None:
+        """Account for one arithmetic operation."""
+        counters = self.counters
+        counters['field_inversions'] += inversions
+        counters['field_mults'] += mults
+        counters['point_doubles'] += doubles
+        counters['point_adds'] += adds
+        
+    def count(self, name: str, n: int = 1) -> None:
+        """Increment a named counter."""
+        self.counters[name] = self.counters.get(name, 0) + n
+        
+    @contextmanager
+    def stage(self, name: str):
+        """Time one stage of an operation (hash, nonce, scalar_mult, kdf...)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+            self.stage_times[name] = self.stage_times.get(name, 0.0) + elapsed
+            
+    def snapshot(self) -> dict:
+        """Return a copy of all counters and stage timings."""
+        return {
+            'counters': dict(self.counters),
+            'stages': {
+                name: {'calls': self.stage_calls[name], 'time': self.stage_times[name]}
+                for name in self.stage_calls
+            }
+        }
+
+_NO_STAGE = nullcontext()
 
 class SM2Optimizer:
     """Optimized SM2 implementation with various performance enhancements."""
     
-    def __init__(self):
+    def __init__(self, profile_path: Optional[str] = None):
         self.precomputed_table = {}
         self.window_size = 4  # Window size for sliding window method
+        self.variable_base_method = 'windowed'  # Algorithm used by scalar_mult()
+        self.fixed_base_window = 4  # Window size of the fixed-base comb table for G
+        self.fixed_base_table = None  # Lazily built comb table for G
+        self._stats: Optional[OperationStats] = None  # Instrumentation, off by default
+        
+        # Pick up the autotuner's choices for this machine, if any
+        self.tuning_profile = load_tuning_profile(profile_path)
+        if self.tuning_profile is not None:
+            self.apply_tuning_profile(self.tuning_profile)
+    
+    def apply_tuning_profile(self, profile: dict) -> None:
+        """Adopt the methods and window sizes chosen by the autotuner."""
+        variable = profile['choices']['variable_base']
+        self.variable_base_method = variable['method']
+        self.window_size = variable['window']
+        
+        fixed = profile['choices']['fixed_base']
+        if fixed['window'] != self.fixed_base_window:
+            self.fixed_base_window = fixed['window']
+            self.fixed_base_table = None
+    
+    def enable_stats(self) -> OperationStats:
+        """Start collecting operation counters and stage timings."""
+        self._stats = OperationStats()
+        return self._stats
+    
+    def disable_stats(self) -> None:
+        """Stop collecting; instrumented paths fall back to a single None check."""
+        self._stats = None
+    
+    def stats(self) -> Optional[dict]:
+        """Snapshot of the current counters, or None when instrumentation is off."""
+        return self._stats.snapshot() if self._stats is not None else None
+    
+    @contextmanager
+    def collect_stats(self):
+        """Collect statistics for the enclosed block only, restoring the previous collector after."""
+        previous = self._stats
+        self._stats = OperationStats()
+        try:
+            yield self._stats
+        finally:
+            self._stats = previous
+    
+    def count(self, name: str, n: int = 1) -> None:
+        """Increment a named counter when instrumentation is on."""
+        if self._stats is not None:
+            self._stats.count(name, n)
+    
+    def stage(self, name: str):
+        """Context manager timing a named stage when instrumentation is on."""
+        if self._stats is None:
+            return _NO_STAGE
+        return self._stats.stage(name)
         
     def point_add(self, p1: Optional[Point], p2: Optional[Point]) -> Optional[Point]:
         """Optimized elliptic curve point addition with early returns."""
@@ -36,14 +234,19 @@ class SM2Optimizer:
             
         x1, y1 = p1
         x2, y2 = p2
+        stats = self._stats
         
         # Early check for point at infinity
         if x1 == x2:
             if y1 == P - y2:
                 return None  # Point at infinity
             # Point doubling - optimized with fewer modular operations
+            if stats is not None:
+                stats.record(inversions=1, mults=4, doubles=1)
             s = (3 * x1 * x1 + A) * pow(2 * y1, -1, P) % P
         else:
+            if stats is not None:
+                stats.record(inversions=1, mults=3, adds=1)
             # Point addition
             dx = (x2 - x1) % P
             dy = (y2 - y1) % P
@@ -62,6 +265,9 @@ class SM2Optimizer:
         if y == 0:
             return None
             
+        if self._stats is not None:
+            self._stats.record(inversions=1, mults=4, doubles=1)
+            
         # Optimized doubling formula
         s = (3 * x * x + A) * pow(2 * y, -1, P) % P
         x3 = (s * s - 2 * x) % P
@@ -86,6 +292,9 @@ class SM2Optimizer:
     
     def precompute_table(self, point: Point, window_size: int = 4) -> List[Optional[Point]]:
         """Precompute table for windowed scalar multiplication."""
+        if self._stats is not None:
+            self._stats.count('table_builds')
+            
         table_size = 1 << window_size  # 2^window_size
         table = [None] * table_size
         
@@ -104,13 +313,17 @@ class SM2Optimizer:
                 
         return table
     
-    def scalar_mult_windowed(self, k: int, point: Point, window_size: int = 4) -> Optional[Point]:
+    def scalar_mult_windowed(self, k: int, point: Point, window_size: Optional[int] = None,
+                             table: Optional[List[Optional[Point]]] = None) -> Optional[Point]:
         """Windowed scalar multiplication for better performance."""
         if k == 0 or point is None:
             return None
             
-        # Precompute table
-        table = self.precompute_table(point, window_size)
+        window_size = window_size or self.window_size
+        
+        # Precompute table unless the caller reuses one
+        if table is None:
+            table = self.precompute_table(point, window_size)
         
         result = None
         bit_length = k.bit_length()
@@ -134,6 +347,46 @@ class SM2Optimizer:
             
         return result
     
+    def precompute_wnaf_table(self, point: Point, window_size: int) -> List[Point]:
+        """Affine odd multiples P, 3P, ..., (2^(w-1) - 1)P for wNAF."""
+        if self._stats is not None:
+            self._stats.count('table_builds')
+            
+        double_p = self.point_double(point)
+        odd = [(point[0], point[1], 1)]
+        for _ in range((1 << (window_size - 2)) - 1):
+            odd.append(self.jacobian_add_affine(odd[-1], double_p))
+        return self.batch_to_affine(odd)
+    
+    def scalar_mult_wnaf(self, k: int, point: Point, window_size: Optional[int] = None,
+                         table: Optional[List[Point]] = None) -> Optional[Point]:
+        """wNAF scalar multiplication in Jacobian coordinates (one final inversion)."""
+        if k == 0 or point is None:
+            return None
+            
+        window_size = window_size or self.window_size
+        if table is None:
+            table = self.precompute_wnaf_table(point, window_size)
+        negated = [(x, P - y) for x, y in table]
+        
+        double = self.jacobian_double
+        add = self.jacobian_add_affine
+        result = None
+        for d in reversed(wnaf_digits(k, window_size)):
+            result = double(result)
+            if d > 0:
+                result = add(result, table[d >> 1])
+            elif d < 0:
+                result = add(result, negated[(-d) >> 1])
+                
+        return self.jacobian_to_affine(result)
+    
+    def scalar_mult(self, k: int, point: Point) -> Optional[Point]:
+        """Variable-base k*P using the tuned algorithm and window size."""
+        if self.variable_base_method == 'wnaf':
+            return self.scalar_mult_wnaf(k, point, self.window_size)
+        return self.scalar_mult_windowed(k, point, self.window_size)
+    
     def scalar_mult_montgomery_ladder(self, k: int, point: Point) -> Optional[Point]:
         """Montgomery ladder scalar multiplication - resistant to side-channel attacks."""
         if k == 0 or point is None:
@@ -152,11 +405,165 @@ class SM2Optimizer:
                 
         return r0
     
+    def jacobian_double(self, point: Optional[JacobianPoint]) -> Optional[JacobianPoint]:
+        """Point doubling in Jacobian coordinates (no modular inversion)."""
+        if point is None:
+            return None
+            
+        x, y, z = point
+        if y == 0:
+            return None
+            
+        if self._stats is not None:
+            self._stats.record(mults=10, doubles=1)
+            
+        xx = x * x % P
+        yy = y * y % P
+        yyyy = yy * yy % P
+        zz = z * z % P
+        s = 4 * x * yy % P
+        m = (3 * xx + A * zz * zz) % P
+        x3 = (m * m - 2 * s) % P
+        y3 = (m * (s - x3) - 8 * yyyy) % P
+        z3 = 2 * y * z % P
+        return (x3, y3, z3)
+    
+    def jacobian_add_affine(self, p1: Optional[JacobianPoint], p2: Optional[Point]) -> Optional[JacobianPoint]:
+        """Mixed addition of a Jacobian point and an affine point (no inversion)."""
+        if p2 is None:
+            return p1
+        if p1 is None:
+            return (p2[0], p2[1], 1)
+            
+        x1, y1, z1 = p1
+        x2, y2 = p2
+        
+        z1z1 = z1 * z1 % P
+        u2 = x2 * z1z1 % P
+        s2 = y2 * z1 * z1z1 % P
+        h = (u2 - x1) % P
+        r = (s2 - y1) % P
+        
+        if h == 0:
+            if r == 0:
+                return self.jacobian_double(p1)
+            return None  # Point at infinity
+            
+        if self._stats is not None:
+            self._stats.record(mults=11, adds=1)
+            
+        hh = h * h % P
+        hhh = h * hh % P
+        v = x1 * hh % P
+        x3 = (r * r - hhh - 2 * v) % P
+        y3 = (r * (v - x3) - y1 * hhh) % P
+        z3 = z1 * h % P
+        return (x3, y3, z3)
+    
+    def jacobian_to_affine(self, point: Optional[JacobianPoint]) -> Optional[Point]:
+        """Convert a single Jacobian point to affine coordinates."""
+        if point is None:
+            return None
+            
+        if self._stats is not None:
+            self._stats.record(inversions=1, mults=4)
+            
+        x, y, z = point
+        z_inv = pow(z, -1, P)
+        z_inv2 = z_inv * z_inv % P
+        return (x * z_inv2 % P, y * z_inv2 * z_inv % P)
+    
+    def batch_to_affine(self, points: List[Optional[JacobianPoint]]) -> List[Optional[Point]]:
+        """Normalize a batch of Jacobian points with one shared inversion."""
+        finite = [i for i, pt in enumerate(points) if pt is not None]
+        if self._stats is not None and finite:
+            # Montgomery's trick costs 3 mults per element, then 4 per conversion
+            self._stats.record(inversions=1, mults=7 * len(finite))
+        z_invs = batch_invert([points[i][2] for i in finite])
+        
+        result: List[Optional[Point]] = [None] * len(points)
+        for i, z_inv in zip(finite, z_invs):
+            x, y, _ = points[i]
+            z_inv2 = z_inv * z_inv % P
+            result[i] = (x * z_inv2 % P, y * z_inv2 * z_inv % P)
+            
+        return result
+    
+    def build_fixed_base_table(self, point: Point = G, window_size: int = 4) -> List[List[Optional[Point]]]:
+        """
+        Build a fixed-base comb table: table[i][j] = j * 2^(window_size*i) * point.
+        
+        With this table k*point needs only one mixed addition per window and
+        no doublings. The whole table is normalized with two inversions.
+        """
+        if self._stats is not None:
+            self._stats.count('table_builds')
+            
+        rows = (N.bit_length() + window_size - 1) // window_size
+        width = 1 << window_size
+        
+        # Row bases 2^(w*i) * point, computed by Jacobian doubling
+        bases = [(point[0], point[1], 1)]
+        for _ in range(1, rows):
+            base = bases[-1]
+            for _ in range(window_size):
+                base = self.jacobian_double(base)
+            bases.append(base)
+        affine_bases = self.batch_to_affine(bases)
+        
+        # Row entries j * base via mixed additions, then one shared normalization
+        flat = []
+        for base in affine_bases:
+            acc = None
+            for _ in range(1, width):
+                acc = self.jacobian_add_affine(acc, base)
+                flat.append(acc)
+        flat_affine = self.batch_to_affine(flat)
+        
+        table = []
+        for i in range(rows):
+            table.append([None] + flat_affine[i * (width - 1):(i + 1) * (width - 1)])
+        return table
+    
+    def set_fixed_base_table(self, table, window_size: int) -> None:
+        """Use an existing comb table for G (e.g. one mapped from disk)."""
+        self.fixed_base_table = table
+        self.fixed_base_window = window_size
+    
+    def fixed_base_mult_jacobian(self, k: int) -> Optional[JacobianPoint]:
+        """Compute k*G in Jacobian coordinates using the fixed-base comb table."""
+        if self.fixed_base_table is None:
+            self.fixed_base_table = self.build_fixed_base_table(G, self.fixed_base_window)
+        elif self._stats is not None:
+            self._stats.count('table_cache_hits')
+            
+        table = self.fixed_base_table
+        window_size = self.fixed_base_window
+        mask = (1 << window_size) - 1
+        add = self.jacobian_add_affine
+        
+        k %= N
+        result = None
+        i = 0
+        while k:
+            digit = k & mask
+            if digit:
+                result = add(result, table[i][digit])
+            k >>= window_size
+            i += 1
+            
+        return result
+    
+    def fixed_base_mult(self, k: int) -> Optional[Point]:
+        """Compute k*G in affine coordinates using the fixed-base comb table."""
+        return self.jacobian_to_affine(self.fixed_base_mult_jacobian(k))
+    
     def benchmark_scalar_mult(self, k: int, point: Point) -> dict:
         """Benchmark different scalar multiplication methods."""
         methods = {
             'binary': self.scalar_mult_binary,
             'windowed': self.scalar_mult_windowed,
+            'wnaf': self.scalar_mult_wnaf,
             'montgomery': self.scalar_mult_montgomery_ladder
         }
         
@@ -210,6 +617,25 @@ def performance_test():
     # Find fastest method
     fastest = min(results.items(), key=lambda x: x[1]['time'])
     print(f"🏆 Fastest method: {fastest[0]} ({fastest[1]['time']:.6f}s)")
+    
+    # Operation counts per method (instrumentation is opt-in)
+    print()
+    print("Operation Counts:")
+    print("-" * 40)
+    optimizer.fixed_base_mult(1)  # Build the G table outside the measured block
+    methods = {
+        'binary': lambda: optimizer.scalar_mult_binary(k, point),
+        'windowed': lambda: optimizer.scalar_mult_windowed(k, point),
+        'wnaf': lambda: optimizer.scalar_mult_wnaf(k, point),
+        'fixed_base': lambda: optimizer.fixed_base_mult(k),
+    }
+    for method, func in methods.items():
+        with optimizer.collect_stats() as stats:
+            assert func() == first_result
+        c = stats.snapshot()['counters']
+        print(f"{method.capitalize():12}: {c['field_inversions']:4d} inv, {c['field_mults']:5d} mul, "
+              f"{c['point_doubles']:4d} dbl, {c['point_adds']:4d} add, {c['table_builds']} tables")
+    assert optimizer.stats() is None
 
 if __name__ == "__main__":
     performance_test()
@@ -6,7 +6,7 @@ communication channel between two parties (A and B).
 
 import os
 from gmssl import sm2, sm3, func
-from gmssl.sm4 import CryptSM4, SM4_ENCRYPT, SM4_DECRYPT
+from sm4_provider import get_provider, pkcs7_pad, pkcs7_unpad
 
 # --- Constants for Cryptographic Keys ---
 
@@ -52,10 +52,8 @@ def pgp_encrypt(data: str, sm4_key: bytes):
     # 3. Concatenate signature and data
     signed_data = signature.encode('utf-8') + data_bytes
 
-    # 4. Encrypt with SM4
-    crypt_sm4 = CryptSM4()
-    crypt_sm4.set_key(sm4_key, SM4_ENCRYPT)
-    encrypted_content = crypt_sm4.crypt_ecb(signed_data)
+    # 4. Encrypt with SM4 (native backend when available, same output as gmssl)
+    encrypted_content = bytes(get_provider().ecb_encrypt(sm4_key, pkcs7_pad(signed_data)))
 
     # 5. Encrypt SM4 key with User B's public key
     sm2_encryptor = sm2.CryptSM2(public_key=PUBLIC_KEY_B, private_key=None)
@@ -100,9 +98,11 @@ def pgp_decrypt(encrypted_message: bytes, encrypted_key_len: int):
         return None, None
 
     # 3. Decrypt content with SM4
-    crypt_sm4 = CryptSM4()
-    crypt_sm4.set_key(sm4_key, SM4_DECRYPT)
-    decrypted_content = crypt_sm4.crypt_ecb(encrypted_content)
+    try:
+        decrypted_content = pkcs7_unpad(bytes(get_provider().ecb_decrypt(sm4_key, encrypted_content)))
+    except ValueError as e:
+        print(f"Error decrypting content: {e}")
+        return None, None
 
     # 4. Split signature and original data (signature is a 128-char hex string)
     signature_len = 128
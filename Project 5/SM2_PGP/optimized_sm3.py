@@ -0,0 +1,134 @@
+"""
+Incremental SM3 Hashing for Streaming Workloads.
+
+This module wraps gmssl's SM3 compression function in an incremental
+hasher, so that large inputs (files, sockets, Z_A || M for SM2 signatures)
+can be hashed chunk by chunk with memory use independent of input size.
+"""
+
+from typing import BinaryIO
+from gmssl import sm3
+
+BLOCK_SIZE = 64  # SM3 block size in bytes
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB read buffer for file hashing
+
+class SM3Stream:
+    """Incremental SM3 hasher with an update()/hexdigest() interface."""
+
+    def __init__(self, data: bytes = b''):
+        self._state = list(sm3.IV)
+        self._buffer = bytearray()
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data) -> None:
+        """Absorb bytes-like data, compressing every complete 64-byte block."""
+        view = memoryview(data).cast('B')
+        self._length += len(view)
+        offset = 0
+
+        # Top up a partial block left over from the previous call
+        if self._buffer:
+            need = BLOCK_SIZE - len(self._buffer)
+            self._buffer += view[:need]
+            offset = need
+            if len(self._buffer) < BLOCK_SIZE:
+                return
+            self._state = sm3.sm3_cf(self._state, self._buffer)
+            self._buffer = bytearray()
+
+        # Compress full blocks straight from the caller's buffer
+        end = offset + (len(view) - offset) // BLOCK_SIZE * BLOCK_SIZE
+        for i in range(offset, end, BLOCK_SIZE):
+            self._state = sm3.sm3_cf(self._state, view[i:i + BLOCK_SIZE])
+
+        self._buffer += view[end:]
+
+    def copy(self) -> 'SM3Stream':
+        """Return an independent copy of the current hashing state."""
+        clone = SM3Stream()
+        clone._state = list(self._state)
+        clone._buffer = bytearray(self._buffer)
+        clone._length = self._length
+        return clone
+
+    def hexdigest(self) -> str:
+        """Finalize a copy of the state and return the digest as hex."""
+        tail = bytearray(self._buffer)
+        tail.append(0x80)
+        tail += b'\x00' * ((56 - len(tail)) % BLOCK_SIZE)
+        tail += (self._length * 8).to_bytes(8, 'big')
+
+        state = self._state
+        for i in range(0, len(tail), BLOCK_SIZE):
+            state = sm3.sm3_cf(state, tail[i:i + BLOCK_SIZE])
+        return ''.join(f'{word:08x}' for word in state)
+
+    def digest(self) -> bytes:
+        """Finalize a copy of the state and return the raw digest."""
+        return bytes.fromhex(self.hexdigest())
+
+def sm3_hash_fileobj(fileobj: BinaryIO, prefix: bytes = b'',
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> SM3Stream:
+    """
+    Hash `prefix || fileobj` incrementally using one reusable read buffer.
+
+    Args:
+        fileobj: Binary file-like object opened for reading
+        prefix: Bytes absorbed before the stream (e.g. Z_A)
+        chunk_size: Read buffer size in bytes (rounded to whole SM3 blocks)
+
+    Returns:
+        The SM3Stream after absorbing all input
+    """
+    hasher = SM3Stream(prefix)
+    chunk_size = max(BLOCK_SIZE, chunk_size // BLOCK_SIZE * BLOCK_SIZE)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    readinto = getattr(fileobj, 'readinto', None)
+    while True:
+        if readinto is not None:
+            n = readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+        else:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+    return hasher
+
+def self_test():
+    """Check the incremental hasher against gmssl's one-shot sm3_hash."""
+    import io
+    import time
+    from gmssl import func
+
+    for size in (0, 1, 55, 56, 63, 64, 65, 1000):
+        data = bytes(range(256)) * 4
+        data = data[:size]
+        expected = sm3.sm3_hash(func.bytes_to_list(data))
+
+        # Feed in uneven pieces to exercise the partial-block path
+        hasher = SM3Stream()
+        for i in range(0, size, 7):
+            hasher.update(data[i:i + 7])
+        assert hasher.hexdigest() == expected, f"mismatch at size {size}"
+
+    payload = b'streaming sm3 ' * 5000
+    start_time = time.time()
+    streamed = sm3_hash_fileobj(io.BytesIO(payload), chunk_size=4096).hexdigest()
+    elapsed = time.time() - start_time
+    assert streamed == sm3.sm3_hash(func.bytes_to_list(payload))
+
+    print("=== Incremental SM3 Self-Test ===")
+    print(f"Hashed {len(payload)} bytes in {elapsed:.4f}s "
+          f"({len(payload) / elapsed / 1e6:.2f} MB/s)")
+    print("✅ Incremental SM3 matches one-shot SM3")
+
+if __name__ == "__main__":
+    self_test()
@@ -0,0 +1,284 @@
+"""
+Multi-core SM4-CTR and SM4-GCM over Shared Memory.
+
+Counter mode has no chaining, so a payload can be split into segments
+whose first counter block is known in advance (initial counter + segment
+offset / 16). This module copies the payload once into a
+multiprocessing.shared_memory block; pool workers attach to it by name,
+encrypt their segment in place with the fastest SM4 provider and return
+only a 16-byte GHASH value, so no payload bytes are pickled.
+
+GHASH is linear, which lets the segment hashes be combined afterwards:
+absorbing b blocks into a state S gives S·H^b ⊕ GHASH_0(blocks), so
+
+    Y = (...((Y_aad·H^b1 ⊕ Y_1)·H^b2 ⊕ Y_2)...)·H^bk ⊕ Y_k
+
+and the GCM tag is the standard (Y ⊕ lengths)·H ⊕ E(K, J0). Output is
+identical to single-threaded SM4-CTR / SM4-GCM. For SM4-GCM only 96-bit
+IVs are accepted, so the 32-bit GCM counter never wraps inside a segment.
+"""
+
+import hmac
+import os
+from multiprocessing import Pool, resource_tracker, shared_memory
+from typing import Optional, Tuple
+from sm4_provider import SM4_BLOCK, counter_add, get_provider, gf128_mul
+
+DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+GCM_MAX_BLOCKS = (1 << 32) - 2
+ZERO_BLOCK = bytes(SM4_BLOCK)
+
+# What a worker hashes besides encrypting: nothing, or the ciphertext
+# before (decryption) or after (encryption) its segment is transformed
+HASH_NONE, HASH_INPUT, HASH_OUTPUT = 0, 1, 2
+
+# --- Worker side ---
+
+def _init_worker():
+    get_provider()  # select and self-test the SM4 backend once per worker
+
+def _crypt_segment(task) -> Tuple[int, Optional[bytes]]:
+    """Transform one segment in place; returns (offset, segment GHASH or None)."""
+    name, key, counter, start, end, h, hash_mode = task
+    provider = get_provider()
+    # Attached per task and closed before returning, so an idle worker never
+    # keeps a segment mapped after the parent has unlinked it
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[start:end]
+        try:
+            digest = provider.ghash(h, ZERO_BLOCK, view) if hash_mode == HASH_INPUT else None
+            provider.ctr(key, counter, view, view)
+            if hash_mode == HASH_OUTPUT:
+                digest = provider.ghash(h, ZERO_BLOCK, view)
+        finally:
+            view.release()
+    finally:
+        shm.close()
+    return start, digest
+
+# --- Parent side ---
+
+def gf128_pow(h: int, exponent: int) -> int:
+    """H^exponent in GF(2^128) (GCM bit order)."""
+    result, base = 1 << 127, h  # 1 << 127 is the field's multiplicative identity
+    while exponent:
+        if exponent & 1:
+            result = gf128_mul(result, base)
+        base = gf128_mul(base, base)
+        exponent >>= 1
+    return result
+
+class ParallelSM4:
+    """
+    SM4-CTR / SM4-GCM engine that spreads counter-aligned segments over a
+    process pool.
+
+    Args:
+        processes: Worker processes (defaults to the CPU count)
+        segment_size: Bytes per task, rounded down to whole SM4 blocks
+    """
+
+    def __init__(self, processes: Optional[int] = None, segment_size: int = DEFAULT_SEGMENT_SIZE):
+        self.processes = processes or os.cpu_count() or 1
+        self.segment_size = max(SM4_BLOCK, segment_size // SM4_BLOCK * SM4_BLOCK)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _get_pool(self) -> Pool:
+        if self._pool is None:
+            # Workers inherit the parent's tracker, which the segments are registered with
+            resource_tracker.ensure_running()
+            self._pool = Pool(processes=self.processes, initializer=_init_worker)
+        return self._pool
+
+    def _segments(self, length: int):
+        return [(start, min(start + self.segment_size, length)) for start in range(0, length, self.segment_size)]
+
+    def _run(self, shm, length: int, key: bytes, counter_at, h: bytes = ZERO_BLOCK,
+             hash_mode: int = HASH_NONE) -> list:
+        """Process every segment of shm; returns segment GHASH values in order."""
+        tasks = [(shm.name, bytes(key), counter_at(start // SM4_BLOCK), start, end, h, hash_mode)
+                 for start, end in self._segments(length)]
+        results = dict(self._get_pool().imap_unordered(_crypt_segment, tasks))
+        return [results[start] for start, _ in self._segments(length)]
+
+    def _combine(self, h: bytes, state: bytes, digests: list, length: int) -> int:
+        """Fold per-segment GHASH values into `state` (see module docstring)."""
+        h_int = int.from_bytes(h, 'big')
+        y = int.from_bytes(state, 'big')
+        full_power = gf128_pow(h_int, self.segment_size // SM4_BLOCK)
+        for (start, end), digest in zip(self._segments(length), digests):
+            blocks = (end - start + SM4_BLOCK - 1) // SM4_BLOCK
+            power = full_power if end - start == self.segment_size else gf128_pow(h_int, blocks)
+            y = gf128_mul(y, power) ^ int.from_bytes(digest, 'big')
+        return y
+
+    def _create_shared(self, size: int) -> shared_memory.SharedMemory:
+        # Fork the workers first: a pool forked afterwards would inherit the
+        # mapping and keep it alive for the workers' lifetime
+        self._get_pool()
+        return shared_memory.SharedMemory(create=True, size=max(1, size))
+
+    def _shared(self, data) -> Tuple[shared_memory.SharedMemory, int]:
+        length = len(memoryview(data).cast('B'))
+        shm = self._create_shared(length)
+        shm.buf[:length] = data
+        return shm, length
+
+    @staticmethod
+    def _release(shm) -> None:
+        shm.close()
+        shm.unlink()
+
+    @staticmethod
+    def _copy_out(shm, length: int, out):
+        out = bytearray(length) if out is None else out
+        memoryview(out).cast('B')[:length] = shm.buf[:length]
+        return out
+
+    def ctr(self, key: bytes, counter: bytes, data, out=None):
+        """SM4-CTR with a 128-bit big-endian counter starting at `counter`."""
+        if len(memoryview(data).cast('B')) <= self.segment_size:
+            return get_provider().ctr(key, counter, data, out)
+        shm, length = self._shared(data)
+        try:
+            self._run(shm, length, key, lambda block: counter_add(counter, block))
+            return self._copy_out(shm, length, out)
+        finally:
+            self._release(shm)
+
+    def ctr_file(self, key: bytes, counter: bytes, src_path: str, dst_path: str) -> int:
+        """SM4-CTR a whole file, reading it straight into shared memory."""
+        length = os.path.getsize(src_path)
+        shm = self._create_shared(length)
+        try:
+            with open(src_path, 'rb') as src:
+                src.readinto(shm.buf[:length])
+            self._run(shm, length, key, lambda block: counter_add(counter, block))
+            with open(dst_path, 'wb') as dst:
+                dst.write(shm.buf[:length])
+        finally:
+            self._release(shm)
+        return length
+
+    def _gcm_setup(self, key: bytes, iv: bytes, length: int):
+        if len(iv) != 12:
+            raise ValueError("Parallel SM4-GCM requires a 96-bit IV")
+        if (length + SM4_BLOCK - 1) // SM4_BLOCK > GCM_MAX_BLOCKS:
+            raise ValueError("Plaintext exceeds the GCM length limit")
+        provider = get_provider()
+        h = bytes(provider.ecb_encrypt(key, ZERO_BLOCK))
+        j0 = bytes(iv) + b'\x00\x00\x00\x01'
+        mask = int.from_bytes(provider.ecb_encrypt(key, j0), 'big')
+        # inc32(J0) + block never carries out of the low 32 bits (length limit above)
+        counter_at = lambda block: bytes(iv) + (2 + block).to_bytes(4, 'big')
+        return h, mask, counter_at
+
+    def _gcm_tag(self, h: bytes, mask: int, aad: bytes, digests: list, length: int) -> bytes:
+        provider = get_provider()
+        y = self._combine(h, provider.ghash(h, ZERO_BLOCK, aad), digests, length)
+        lengths = ((len(aad) * 8) << 64) | (length * 8)
+        return (gf128_mul(y ^ lengths, int.from_bytes(h, 'big')) ^ mask).to_bytes(SM4_BLOCK, 'big')
+
+    def gcm_encrypt(self, key: bytes, iv: bytes, data, aad: bytes = b'', out=None,
+                    tag_len: int = 16) -> Tuple[bytearray, bytes]:
+        """Return (ciphertext buffer, tag), identical to the provider's gcm_encrypt."""
+        if len(memoryview(data).cast('B')) <= self.segment_size:
+            return get_provider().gcm_encrypt(key, iv, data, aad, out, tag_len)
+        shm, length = self._shared(data)
+        try:
+            h, mask, counter_at = self._gcm_setup(key, iv, length)
+            digests = self._run(shm, length, key, counter_at, h, HASH_OUTPUT)
+            tag = self._gcm_tag(h, mask, bytes(aad), digests, length)[:tag_len]
+            return self._copy_out(shm, length, out), tag
+        finally:
+            self._release(shm)
+
+    def gcm_decrypt(self, key: bytes, iv: bytes, data, tag: bytes, aad: bytes = b'', out=None):
+        """
+        Decrypt and authenticate; `out` is only written once the tag verifies.
+
+        Raises:
+            ValueError: On a tag mismatch
+        """
+        if len(memoryview(data).cast('B')) <= self.segment_size:
+            return get_provider().gcm_decrypt(key, iv, data, tag, aad, out)
+        shm, length = self._shared(data)
+        try:
+            h, mask, counter_at = self._gcm_setup(key, iv, length)
+            digests = self._run(shm, length, key, counter_at, h, HASH_INPUT)
+            expected = self._gcm_tag(h, mask, bytes(aad), digests, length)[:len(tag)]
+            if not hmac.compare_digest(expected, bytes(tag)):
+                raise ValueError("SM4-GCM authentication failed")
+            return self._copy_out(shm, length, out)
+        finally:
+            self._release(shm)
+
+def main():
+    """Compare parallel and single-process SM4-CTR / SM4-GCM."""
+    import tempfile
+    import time
+
+    print("--- Parallel SM4-CTR / SM4-GCM (shared memory) ---")
+    provider = get_provider()
+    print(f"SM4 provider: {provider.name}, CPUs: {os.cpu_count()}")
+    size = 32 * 1024 * 1024 if provider.name != 'gmssl' else 256 * 1024
+    payload = os.urandom(size + 5)
+    key, iv = os.urandom(16), os.urandom(12)
+    counter = b'\xff' * 12 + os.urandom(4)  # exercises carries across segments
+    aad = b'SM2-PGP parallel demo'
+
+    start_time = time.perf_counter()
+    expected_ctr = bytes(provider.ctr(key, counter, payload))
+    expected_ct, expected_tag = provider.gcm_encrypt(key, iv, payload, aad)
+    single_time = time.perf_counter() - start_time
+    print(f"  single process: {2 * len(payload) / single_time / 1e6:8.2f} MB/s")
+
+    with ParallelSM4(processes=2, segment_size=size // 8) as engine:
+        start_time = time.perf_counter()
+        ctr_out = engine.ctr(key, counter, payload)
+        ciphertext, tag = engine.gcm_encrypt(key, iv, payload, aad)
+        parallel_time = time.perf_counter() - start_time
+        print(f"  2 processes:    {2 * len(payload) / parallel_time / 1e6:8.2f} MB/s")
+
+        ctr_ok = bytes(ctr_out) == expected_ctr
+        gcm_ok = bytes(ciphertext) == bytes(expected_ct) and tag == expected_tag
+        roundtrip = bytes(engine.gcm_decrypt(key, iv, ciphertext, tag, aad)) == payload
+        print(f"CTR matches single-process output: {ctr_ok}")
+        print(f"GCM ciphertext and combined tag match: {gcm_ok}")
+        print(f"GCM round trip: {roundtrip}")
+
+        ciphertext[len(ciphertext) // 2] ^= 0x01
+        try:
+            engine.gcm_decrypt(key, iv, ciphertext, tag, aad)
+            tamper_detected = False
+        except ValueError:
+            tamper_detected = True
+        print(f"Tampered ciphertext rejected: {tamper_detected}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            src_path, dst_path = os.path.join(tmp, 'in.bin'), os.path.join(tmp, 'out.bin')
+            with open(src_path, 'wb') as f:
+                f.write(payload)
+            engine.ctr_file(key, counter, src_path, dst_path)
+            with open(dst_path, 'rb') as f:
+                file_ok = f.read() == expected_ctr
+        print(f"File CTR matches: {file_ok}")
+
+    assert ctr_ok and gcm_ok and roundtrip and tamper_detected and file_ok
+    print("\n✅ Parallel SM4 checks successful!")
+
+if __name__ == "__main__":
+    main()
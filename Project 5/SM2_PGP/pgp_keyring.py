@@ -0,0 +1,385 @@
+"""
+Keyring with Cached, Precomputed SM2 Contexts for the PGP Module.
+
+pgp_encrypt / pgp_decrypt construct fresh gmssl CryptSM2 objects from
+hardcoded hex constants on every call, and gmssl's scalar multiplication
+works on hex strings with a plain double-and-add loop. For many small
+messages that setup and arithmetic dominate. This module provides:
+
+  * Keyring: keys loaded from a JSON file and indexed by name, key ID
+    (8 bytes, see pgp_multi.key_id) and fingerprint (full SM3 digest)
+  * PrecomputedSM2: a CryptSM2 whose kP operation uses integer Jacobian
+    arithmetic, a fixed-base comb table for G shared by all contexts and a
+    per-key comb table for the public key (used by verify and encrypt)
+  * an LRU cache of ready-to-use contexts per key, bounded by `capacity`
+
+Keyring file format:
+    {"version": 1, "keys": [{"name": "...", "public_key": "<hex x||y>",
+                             "private_key": "<hex d>" (optional)}, ...]}
+"""
+
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from gmssl import sm2, func
+from optimized_sm3 import SM3Stream
+from pgp_multi import key_id
+from sm4_provider import get_provider, pkcs7_pad, pkcs7_unpad
+from SM2_PGP import PRIVATE_KEY_A, PUBLIC_KEY_A, PRIVATE_KEY_B, PUBLIC_KEY_B
+
+KEYRING_VERSION = 1
+DEFAULT_CAPACITY = 64
+COMB_WINDOW = 4
+SIGNATURE_LEN = 128  # hex r || s, as in pgp_decrypt
+
+Point = Tuple[int, int]
+JacobianPoint = Tuple[int, int, int]
+
+class CurveArithmetic:
+    """Integer Jacobian arithmetic for a gmssl ecc_table curve."""
+
+    def __init__(self, ecc_table: dict):
+        self.p = int(ecc_table['p'], 16)
+        self.a = int(ecc_table['a'], 16)
+        self.n = int(ecc_table['n'], 16)
+        self.bits = 4 * len(ecc_table['n'])
+
+    def double(self, point: Optional[JacobianPoint]) -> Optional[JacobianPoint]:
+        if point is None or point[1] == 0:
+            return None
+        x, y, z = point
+        p = self.p
+        yy = y * y % p
+        s = 4 * x * yy % p
+        zz = z * z % p
+        m = (3 * x * x + self.a * zz * zz) % p
+        x3 = (m * m - 2 * s) % p
+        return x3, (m * (s - x3) - 8 * yy * yy) % p, 2 * y * z % p
+
+    def add_affine(self, p1: Optional[JacobianPoint], p2: Optional[Point]) -> Optional[JacobianPoint]:
+        """Mixed addition: Jacobian p1 + affine p2."""
+        if p2 is None:
+            return p1
+        if p1 is None:
+            return p2[0], p2[1], 1
+        x1, y1, z1 = p1
+        p = self.p
+        z1z1 = z1 * z1 % p
+        h = (p2[0] * z1z1 - x1) % p
+        r = (p2[1] * z1 * z1z1 - y1) % p
+        if h == 0:
+            return self.double(p1) if r == 0 else None
+        hh = h * h % p
+        hhh = h * hh % p
+        v = x1 * hh % p
+        x3 = (r * r - hhh - 2 * v) % p
+        return x3, (r * (v - x3) - y1 * hhh) % p, z1 * h % p
+
+    def batch_to_affine(self, points: List[Optional[JacobianPoint]]) -> List[Optional[Point]]:
+        """Normalize many points with one inversion (Montgomery's trick)."""
+        p = self.p
+        finite = [pt for pt in points if pt is not None]
+        prefix, acc = [], 1
+        for pt in finite:
+            prefix.append(acc)
+            acc = acc * pt[2] % p
+        inv = pow(acc, -1, p) if finite else 1
+        inverses = [0] * len(finite)
+        for i in range(len(finite) - 1, -1, -1):
+            inverses[i] = inv * prefix[i] % p
+            inv = inv * finite[i][2] % p
+
+        result, it = [], iter(zip(finite, inverses))
+        for pt in points:
+            if pt is None:
+                result.append(None)
+                continue
+            (x, y, _), z_inv = next(it)
+            z2 = z_inv * z_inv % p
+            result.append((x * z2 % p, y * z2 * z_inv % p))
+        return result
+
+    def to_affine(self, point: Optional[JacobianPoint]) -> Optional[Point]:
+        return self.batch_to_affine([point])[0]
+
+    def mult(self, k: int, point: Point, window_size: int = COMB_WINDOW) -> Optional[JacobianPoint]:
+        """Variable-base k*point with a fixed window."""
+        multiples, acc = [], None
+        for _ in range((1 << window_size) - 1):
+            acc = self.add_affine(acc, point)
+            multiples.append(acc)
+        table = [None] + self.batch_to_affine(multiples)
+
+        k %= self.n
+        result = None
+        mask = (1 << window_size) - 1
+        top = -(-self.bits // window_size) * window_size  # cover every bit when w does not divide bits
+        for shift in range(top - window_size, -1, -window_size):
+            for _ in range(window_size):
+                result = self.double(result)
+            result = self.add_affine(result, table[(k >> shift) & mask])
+        return result
+
+class CombTable:
+    """
+    Fixed-base table: row i holds j * 2^(w*i) * P for j = 1 .. 2^w - 1, so
+    k*P is one mixed addition per w-bit digit of k and no doublings.
+    """
+
+    def __init__(self, curve: CurveArithmetic, point: Point, window_size: int = COMB_WINDOW):
+        self.curve = curve
+        self.window_size = window_size
+        self.rows = []
+        base = point
+        for _ in range((curve.bits + window_size - 1) // window_size):
+            multiples, acc = [], None
+            for _ in range((1 << window_size) - 1):
+                acc = curve.add_affine(acc, base)
+                multiples.append(acc)
+            multiples.append(curve.add_affine(acc, base))  # 2^w * base, next row's base
+            row = curve.batch_to_affine(multiples)
+            base = row.pop()
+            self.rows.append([None] + row)
+
+    def mult(self, k: int) -> Optional[JacobianPoint]:
+        k %= self.curve.n
+        mask = (1 << self.window_size) - 1
+        result = None
+        for row in self.rows:
+            if not k:
+                break
+            result = self.curve.add_affine(result, row[k & mask])
+            k >>= self.window_size
+        return result
+
+_g_tables: Dict[str, CombTable] = {}
+
+def _parse_point(point_hex: str, para_len: int) -> Point:
+    return int(point_hex[:para_len], 16), int(point_hex[para_len:2 * para_len], 16)
+
+class PrecomputedSM2(sm2.CryptSM2):
+    """
+    gmssl CryptSM2 with integer arithmetic and comb tables for G and for
+    the public key; sign/verify/encrypt/decrypt are inherited unchanged.
+    """
+
+    def __init__(self, private_key: Optional[str], public_key: str, ecc_table=sm2.default_ecc_table):
+        super().__init__(private_key=private_key, public_key=public_key, ecc_table=ecc_table)
+        self.curve = CurveArithmetic(ecc_table)
+        g = ecc_table['g']
+        if g not in _g_tables:
+            _g_tables[g] = CombTable(self.curve, _parse_point(g, self.para_len))
+        self._g_table = _g_tables[g]
+        self._public_table = CombTable(self.curve, _parse_point(self.public_key, self.para_len))
+
+    def _kg(self, k, Point):
+        if k % self.curve.n == 0:
+            return super()._kg(k, Point)
+        if Point == self.ecc_table['g']:
+            result = self._g_table.mult(k)
+        elif Point == self.public_key:
+            result = self._public_table.mult(k)
+        else:
+            result = self.curve.mult(k, _parse_point(Point, self.para_len))
+        affine = self.curve.to_affine(result)
+        if affine is None:
+            return None
+        form = ('%%0%dx' % self.para_len) * 2
+        return form % affine
+
+class KeyEntry:
+    """One keyring entry; `private_key` is None for public-only keys."""
+
+    def __init__(self, public_key: str, private_key: Optional[str] = None, name: Optional[str] = None):
+        self.public_key = public_key[2:] if len(public_key) == 130 and public_key.startswith('04') else public_key
+        self.private_key = private_key
+        self.key_id = key_id(self.public_key)
+        self.fingerprint = SM3Stream(bytes.fromhex(self.public_key)).hexdigest()
+        self.name = name or self.key_id.hex()
+
+class Keyring:
+    """
+    Keys indexed by name, key ID and fingerprint, with an LRU cache of
+    PrecomputedSM2 contexts.
+
+    Args:
+        path: Keyring file to load (optional)
+        capacity: Maximum number of cached contexts
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._entries: Dict[str, KeyEntry] = {}
+        self._contexts: 'OrderedDict[str, PrecomputedSM2]' = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        if path:
+            self.load(path)
+
+    def add(self, public_key: str, private_key: Optional[str] = None, name: Optional[str] = None) -> KeyEntry:
+        entry = KeyEntry(public_key, private_key, name)
+        for ref in (entry.name, entry.key_id.hex(), entry.fingerprint):
+            self._entries[ref] = entry
+        self._contexts.pop(entry.fingerprint, None)  # a replaced key must not reuse a stale context
+        return entry
+
+    def load(self, path: str) -> int:
+        """Add every key in a keyring file; returns the number of keys."""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != KEYRING_VERSION:
+            raise ValueError(f"Unsupported keyring version: {data.get('version')}")
+        for item in data['keys']:
+            self.add(item['public_key'], item.get('private_key'), item.get('name'))
+        return len(data['keys'])
+
+    def save(self, path: str, include_private: bool = True) -> None:
+        keys = []
+        for entry in {id(e): e for e in self._entries.values()}.values():
+            item = {'name': entry.name, 'public_key': entry.public_key}
+            if include_private and entry.private_key:
+                item['private_key'] = entry.private_key
+            keys.append(item)
+        with open(path, 'w') as f:
+            json.dump({'version': KEYRING_VERSION, 'keys': keys}, f, indent=2)
+
+    def get(self, ref) -> KeyEntry:
+        """Look up a key by name, key ID (bytes or hex) or fingerprint."""
+        if isinstance(ref, bytes):
+            ref = ref.hex()
+        entry = self._entries.get(ref) or self._entries.get(str(ref).lower())
+        if entry is None:
+            raise KeyError(f"Unknown key: {ref}")
+        return entry
+
+    def __contains__(self, ref) -> bool:
+        try:
+            self.get(ref)
+            return True
+        except KeyError:
+            return False
+
+    def _context(self, entry: KeyEntry) -> PrecomputedSM2:
+        context = self._contexts.get(entry.fingerprint)
+        if context is not None:
+            self.hits += 1
+            self._contexts.move_to_end(entry.fingerprint)
+            return context
+        self.misses += 1
+        context = PrecomputedSM2(private_key=entry.private_key, public_key=entry.public_key)
+        self._contexts[entry.fingerprint] = context
+        if len(self._contexts) > self.capacity:
+            self._contexts.popitem(last=False)
+            self.evictions += 1
+        return context
+
+    def _private_context(self, ref) -> PrecomputedSM2:
+        entry = self.get(ref)
+        if not entry.private_key:
+            raise KeyError(f"No private key for {entry.name}")
+        return self._context(entry)
+
+    def signer(self, ref) -> PrecomputedSM2:
+        return self._private_context(ref)
+
+    def decryptor(self, ref) -> PrecomputedSM2:
+        return self._private_context(ref)
+
+    def verifier(self, ref) -> PrecomputedSM2:
+        return self._context(self.get(ref))
+
+    def encryptor(self, ref) -> PrecomputedSM2:
+        return self._context(self.get(ref))
+
+def pgp_encrypt_keyring(keyring: Keyring, data: str, sender, recipient, sm4_key: Optional[bytes] = None):
+    """
+    pgp_encrypt with keyring contexts; the output format is unchanged.
+
+    Returns:
+        tuple[bytes, int]: The encrypted message and the encrypted key length
+    """
+    sm4_key = sm4_key or os.urandom(16)
+    data_bytes = data.encode('utf-8')
+    signer = keyring.signer(sender)
+    signature = signer.sign(SM3Stream(data_bytes).hexdigest().encode('utf-8'), func.random_hex(signer.para_len))
+    content = bytes(get_provider().ecb_encrypt(sm4_key, pkcs7_pad(signature.encode('utf-8') + data_bytes)))
+    encrypted_key = keyring.encryptor(recipient).encrypt(sm4_key)
+    return encrypted_key + content, len(encrypted_key)
+
+def pgp_decrypt_keyring(keyring: Keyring, encrypted_message: bytes, encrypted_key_len: int, recipient, sender):
+    """
+    pgp_decrypt with keyring contexts.
+
+    Returns:
+        tuple[str, bool] | tuple[None, None]: The decrypted data and the
+        verification result, or (None, None) if decryption fails
+    """
+    sm4_key = keyring.decryptor(recipient).decrypt(encrypted_message[:encrypted_key_len])
+    if not sm4_key or len(sm4_key) != 16:
+        return None, None
+    try:
+        content = pkcs7_unpad(bytes(get_provider().ecb_decrypt(sm4_key, encrypted_message[encrypted_key_len:])))
+    except ValueError:
+        return None, None
+    signature = content[:SIGNATURE_LEN].decode('utf-8')
+    data_bytes = content[SIGNATURE_LEN:]
+    verified = keyring.verifier(sender).verify(signature, SM3Stream(data_bytes).hexdigest().encode('utf-8'))
+    return data_bytes.decode('utf-8'), verified
+
+def main():
+    """Compare per-call setup with keyring contexts over many small messages."""
+    import tempfile
+    import time
+    from SM2_PGP import pgp_encrypt, pgp_decrypt
+    from pgp_multi import generate_recipient
+
+    print("--- PGP Keyring with Precomputed Contexts ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'keyring.json')
+        keyring = Keyring(capacity=4)
+        keyring.add(PUBLIC_KEY_A, PRIVATE_KEY_A, name='alice')
+        keyring.add(PUBLIC_KEY_B, PRIVATE_KEY_B, name='bob')
+        for i in range(6):
+            private_key, public_key = generate_recipient()
+            keyring.add(public_key, private_key, name=f'user{i}')
+        keyring.save(path)
+        keyring = Keyring(path, capacity=4)
+
+    bob = keyring.get('bob')
+    print(f"bob: key ID {bob.key_id.hex()}, fingerprint {bob.fingerprint[:16]}...")
+    print(f"Lookup by key ID and fingerprint: {keyring.get(bob.key_id) is keyring.get(bob.fingerprint) is bob}")
+
+    messages = [f"Small message #{i}" for i in range(20)]
+    start_time = time.time()
+    baseline = [pgp_decrypt(*pgp_encrypt(m, os.urandom(16))) for m in messages]
+    baseline_time = time.time() - start_time
+
+    keyring.verifier('alice')  # warm the shared G table once
+    start_time = time.time()
+    cached = [pgp_decrypt_keyring(keyring, *pgp_encrypt_keyring(keyring, m, 'alice', 'bob'), 'bob', 'alice')
+              for m in messages]
+    cached_time = time.time() - start_time
+    print(f"{len(messages)} messages: per-call setup {baseline_time:.2f}s, "
+          f"keyring {cached_time:.2f}s ({baseline_time / cached_time:.1f}x)")
+
+    interop = pgp_decrypt(*pgp_encrypt_keyring(keyring, messages[0], 'alice', 'bob'))
+    all_ok = all(r == (m, True) for r, m in zip(baseline + cached, messages * 2)) and interop == (messages[0], True)
+    print(f"All messages decrypt and verify (including pgp_decrypt interop): {all_ok}")
+
+    for i in range(6):
+        keyring.encryptor(f'user{i}')
+    print(f"Context cache: {len(keyring._contexts)}/{keyring.capacity} cached, "
+          f"{keyring.hits} hits, {keyring.misses} misses, {keyring.evictions} evictions")
+
+    curve = CurveArithmetic(sm2.default_ecc_table)
+    point = _parse_point(PUBLIC_KEY_B, len(PUBLIC_KEY_B) // 2)
+    k = int.from_bytes(os.urandom(32), 'big')
+    expected = curve.to_affine(CombTable(curve, point).mult(k % curve.n))
+    windows_ok = all(curve.to_affine(curve.mult(k, point, w)) == expected for w in (3, 4, 5, 7))
+    print(f"Variable-base windows 3/4/5/7 agree with the comb table: {windows_ok}")
+
+    assert all_ok and windows_ok and keyring.evictions > 0
+    print("\n✅ Keyring contexts verified!")
+
+if __name__ == "__main__":
+    main()
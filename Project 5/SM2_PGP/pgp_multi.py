@@ -0,0 +1,218 @@
+"""
+Multi-recipient PGP-like Encryption with a Single Payload Pass.
+
+pgp_encrypt wraps the session key for one hardcoded recipient, so sending
+a document to N people meant N complete runs (N hashes, N signatures,
+N SM4 passes). Here the payload is hashed, signed by A and SM4-encrypted
+exactly once; only the 16-byte session key is SM2-encrypted per
+recipient, and those wraps run in parallel.
+
+Wrapped keys are indexed by key ID (the first 8 bytes of SM3 over the
+recipient's public key) in an open-addressing hash table stored in the
+header, so a recipient locates their entry by probing a slot or two
+instead of scanning all N entries.
+
+Message layout (big-endian):
+    header   magic 'SM2M' | version u8 | slot count u32 | key area size u32
+    slots    slot count x (key ID 8 | offset in key area u32 | length u16);
+             empty slots are all zero, slot count is a power of two
+    keys     SM2-wrapped session keys
+    payload  SM4-ECB(PKCS#7)(signature || data), as in pgp_encrypt
+"""
+
+import os
+import struct
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+from gmssl import sm2, func
+from optimized_sm3 import SM3Stream
+from sm4_provider import get_provider, pkcs7_pad, pkcs7_unpad
+from SM2_PGP import PRIVATE_KEY_A, PUBLIC_KEY_A, PRIVATE_KEY_B, PUBLIC_KEY_B
+
+MULTI_MAGIC = b'SM2M'
+MULTI_VERSION = 1
+MULTI_HEADER = struct.Struct('>4sBII')
+KEY_SLOT = struct.Struct('>8sIH')
+KEY_ID_SIZE = 8
+SIGNATURE_LEN = 128  # hex r || s, as in pgp_decrypt
+
+def key_id(public_key: str) -> bytes:
+    """8-byte key ID: the leading bytes of SM3 over the raw public key."""
+    return SM3Stream(bytes.fromhex(public_key)).digest()[:KEY_ID_SIZE]
+
+def _slot_count(recipients: int) -> int:
+    """Power of two keeping the table at most half full."""
+    slots = 1
+    while slots < 2 * recipients:
+        slots <<= 1
+    return slots
+
+def _home_slot(kid: bytes, slots: int) -> int:
+    return int.from_bytes(kid[:4], 'big') & (slots - 1)
+
+def _wrap_key(task: Tuple[bytes, str]) -> bytes:
+    sm4_key, public_key = task
+    return sm2.CryptSM2(public_key=public_key, private_key=None).encrypt(sm4_key)
+
+def wrap_session_key(sm4_key: bytes, public_keys: List[str], processes: Optional[int] = None) -> List[bytes]:
+    """SM2-encrypt the session key for every recipient, in parallel when worthwhile."""
+    tasks = [(sm4_key, public_key) for public_key in public_keys]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(tasks) < 2:
+        return [_wrap_key(task) for task in tasks]
+    with Pool(processes=min(processes, len(tasks))) as pool:
+        return pool.map(_wrap_key, tasks)
+
+def _build_header(entries: Dict[bytes, bytes]) -> bytes:
+    slots = _slot_count(len(entries))
+    table = [None] * slots
+    key_area = bytearray()
+    for kid, wrapped in entries.items():
+        slot = _home_slot(kid, slots)
+        while table[slot] is not None:
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = KEY_SLOT.pack(kid, len(key_area), len(wrapped))
+        key_area += wrapped
+
+    empty = bytes(KEY_SLOT.size)
+    return (MULTI_HEADER.pack(MULTI_MAGIC, MULTI_VERSION, slots, len(key_area))
+            + b''.join(entry or empty for entry in table) + bytes(key_area))
+
+def pgp_encrypt_multi(data: str, public_keys: List[str], sm4_key: Optional[bytes] = None,
+                      processes: Optional[int] = None) -> bytes:
+    """
+    Sign (A) and encrypt `data` once for any number of recipients.
+
+    Args:
+        data: The plaintext data to encrypt
+        public_keys: Recipients' SM2 public keys (hex x || y)
+        sm4_key: 16-byte session key (random if omitted)
+        processes: Worker processes for the per-recipient key wraps
+
+    Returns:
+        The self-contained multi-recipient message
+    """
+    sm4_key = sm4_key or os.urandom(16)
+    data_bytes = data.encode('utf-8')
+
+    # One hash, one signature and one SM4 pass regardless of the recipient count
+    signer = sm2.CryptSM2(public_key=PUBLIC_KEY_A, private_key=PRIVATE_KEY_A)
+    data_hash = SM3Stream(data_bytes).hexdigest().encode('utf-8')
+    signature = signer.sign(data_hash, func.random_hex(signer.para_len))
+    payload = bytes(get_provider().ecb_encrypt(sm4_key, pkcs7_pad(signature.encode('utf-8') + data_bytes)))
+
+    unique = list(dict.fromkeys(public_keys))
+    wrapped = wrap_session_key(sm4_key, unique, processes)
+    return _build_header({key_id(pk): w for pk, w in zip(unique, wrapped)}) + payload
+
+def find_wrapped_key(message: bytes, kid: bytes) -> Tuple[Optional[bytes], int]:
+    """
+    Probe the header's key table for `kid`.
+
+    Returns:
+        (wrapped session key or None, offset of the encrypted payload)
+
+    Raises:
+        ValueError: If the header is malformed or truncated
+    """
+    try:
+        magic, version, slots, area_size = MULTI_HEADER.unpack_from(message, 0)
+    except struct.error:
+        raise ValueError("Truncated multi-recipient message")
+    if magic != MULTI_MAGIC or version != MULTI_VERSION or not slots or slots & (slots - 1):
+        raise ValueError("Not a supported multi-recipient message")
+    table_offset = MULTI_HEADER.size
+    area_offset = table_offset + slots * KEY_SLOT.size
+    payload_offset = area_offset + area_size
+    if len(message) < payload_offset:
+        raise ValueError("Truncated multi-recipient message")
+
+    slot = _home_slot(kid, slots)
+    for _ in range(slots):
+        entry_id, offset, length = KEY_SLOT.unpack_from(message, table_offset + slot * KEY_SLOT.size)
+        if length == 0:
+            break
+        if entry_id == kid:
+            start = area_offset + offset
+            return message[start:start + length], payload_offset
+        slot = (slot + 1) & (slots - 1)
+    return None, payload_offset
+
+def pgp_decrypt_multi(message: bytes, private_key: str, public_key: str):
+    """
+    Decrypt a pgp_encrypt_multi message as one recipient and verify A's signature.
+
+    Returns:
+        tuple[str, bool] | tuple[None, None]: The decrypted data and the
+        verification result, or (None, None) if this key is not a recipient
+        or decryption fails.
+    """
+    wrapped, payload_offset = find_wrapped_key(message, key_id(public_key))
+    if wrapped is None:
+        return None, None
+
+    sm4_key = sm2.CryptSM2(public_key=public_key, private_key=private_key).decrypt(wrapped)
+    if not sm4_key or len(sm4_key) != 16:
+        return None, None
+    try:
+        content = pkcs7_unpad(bytes(get_provider().ecb_decrypt(sm4_key, message[payload_offset:])))
+    except ValueError:
+        return None, None
+
+    signature = content[:SIGNATURE_LEN].decode('utf-8')
+    data_bytes = content[SIGNATURE_LEN:]
+    verifier = sm2.CryptSM2(public_key=PUBLIC_KEY_A, private_key=None)
+    is_verified = verifier.verify(signature, SM3Stream(data_bytes).hexdigest().encode('utf-8'))
+    return data_bytes.decode('utf-8'), is_verified
+
+def generate_recipient(rng=os.urandom) -> Tuple[str, str]:
+    """A fresh SM2 key pair (private hex, public hex) on gmssl's default curve."""
+    curve = sm2.default_ecc_table
+    d = int.from_bytes(rng(32), 'big') % (int(curve['n'], 16) - 1) + 1
+    private_key = '%064x' % d
+    public_key = sm2.CryptSM2(public_key='', private_key=private_key)._kg(d, curve['g'])
+    return private_key, public_key
+
+def main():
+    """Encrypt one document for several recipients and compare with N single runs."""
+    import time
+    from SM2_PGP import pgp_encrypt
+
+    print("--- Multi-recipient PGP Encryption ---")
+    recipients = [(PRIVATE_KEY_B, PUBLIC_KEY_B)] + [generate_recipient() for _ in range(7)]
+    data = "Quarterly report. " * 1000
+
+    start_time = time.time()
+    for _ in recipients:
+        pgp_encrypt(data, os.urandom(16))  # pgp_encrypt only supports B; cost is what matters
+    naive_time = time.time() - start_time
+
+    start_time = time.time()
+    message = pgp_encrypt_multi(data, [pk for _, pk in recipients], processes=2)
+    multi_time = time.time() - start_time
+    print(f"{len(recipients)} recipients, {len(data)} bytes: {len(recipients)} x pgp_encrypt "
+          f"{naive_time:.2f}s, single pass {multi_time:.2f}s ({naive_time / multi_time:.1f}x)")
+    print(f"Message size: {len(message)} bytes")
+
+    results = [pgp_decrypt_multi(message, sk, pk) for sk, pk in recipients]
+    all_ok = all(text == data and verified for text, verified in results)
+    print(f"All recipients decrypt and verify: {all_ok}")
+
+    outsider = generate_recipient()
+    rejected = pgp_decrypt_multi(message, *outsider) == (None, None)
+    print(f"Non-recipient finds no key slot: {rejected}")
+
+    truncated = []
+    for length in (0, 5, len(message) // 50):
+        try:
+            find_wrapped_key(message[:length], key_id(PUBLIC_KEY_B))
+            truncated.append(False)
+        except ValueError:
+            truncated.append(True)
+    print(f"Truncated headers rejected with ValueError: {all(truncated)}")
+
+    assert all_ok and rejected and all(truncated)
+    print("\n✅ Multi-recipient encryption successful!")
+
+if __name__ == "__main__":
+    main()
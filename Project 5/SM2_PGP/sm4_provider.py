@@ -0,0 +1,404 @@
+"""
+SM4 Provider: Native Project 1 Kernels with a gmssl Fallback.
+
+gmssl's CryptSM4 is pure Python and encrypts roughly 0.1 MB/s. Project 1
+contains C++ SM4 implementations (reference, T-table and AES-NI); its
+`make libsm4.so` target links them into a shared library with a C API
+(sm4_capi.h) that also provides CTR and GCM. This module loads the library
+with ctypes and selects the fastest backend that:
+
+  * the CPU supports (AES-NI needs the aes and sse4_1 flags), and
+  * passes the GB/T 32907 known-answer test at load time
+
+If the library is missing or no backend passes, the gmssl implementation
+is used. All providers share one interface: ECB, CTR and GCM over
+bytes-like inputs, optionally writing into a caller-supplied writable
+buffer (e.g. a preallocated bytearray) instead of allocating.
+
+Set SM4_NATIVE_LIB to the library path, or to an empty string to force
+the gmssl fallback.
+"""
+
+import ctypes
+import hmac
+import os
+import platform
+from typing import List, Optional, Tuple
+from gmssl.sm4 import CryptSM4, SM4_ENCRYPT, SM4_DECRYPT
+
+SM4_BLOCK = 16
+NATIVE_LIB_ENV = 'SM4_NATIVE_LIB'
+DEFAULT_NATIVE_LIB = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  '..', '..', 'Project 1', 'libsm4.so')
+
+BACKEND_REFERENCE, BACKEND_TTABLE, BACKEND_AESNI = 0, 1, 2
+BACKEND_NAMES = {BACKEND_REFERENCE: 'reference', BACKEND_TTABLE: 'ttable', BACKEND_AESNI: 'aesni'}
+BACKEND_PREFERENCE = (BACKEND_AESNI, BACKEND_TTABLE, BACKEND_REFERENCE)
+
+# GB/T 32907-2016 Appendix A example 1
+KAT_KEY = bytes.fromhex('0123456789abcdeffedcba9876543210')
+KAT_CIPHERTEXT = bytes.fromhex('681edf34d206965e86b3e94f536e4246')
+
+def pkcs7_pad(data: bytes) -> bytes:
+    """PKCS#7 padding to the SM4 block size (as gmssl's CryptSM4 applies)."""
+    pad = SM4_BLOCK - len(data) % SM4_BLOCK
+    return bytes(data) + bytes([pad]) * pad
+
+def pkcs7_unpad(data: bytes) -> bytes:
+    """Remove PKCS#7 padding; raises ValueError if it is malformed."""
+    pad = data[-1] if data else 0
+    if not 1 <= pad <= SM4_BLOCK or data[-pad:] != bytes([pad]) * pad:
+        raise ValueError("Invalid PKCS#7 padding")
+    return data[:-pad]
+
+def counter_add(counter: bytes, blocks: int) -> bytes:
+    """128-bit big-endian counter + blocks."""
+    return ((int.from_bytes(counter, 'big') + blocks) % (1 << 128)).to_bytes(SM4_BLOCK, 'big')
+
+def _output(out, length: int):
+    """Validate a caller-supplied output buffer or allocate one."""
+    if out is None:
+        return bytearray(length)
+    if len(memoryview(out).cast('B')) < length:
+        raise ValueError("Output buffer is too small")
+    return out
+
+class GmsslSM4:
+    """Pure-Python provider on top of gmssl's CryptSM4 (always available)."""
+
+    name = 'gmssl'
+
+    def _cipher(self, key: bytes, mode: int) -> CryptSM4:
+        cipher = CryptSM4(mode, padding_mode=None)
+        cipher.set_key(key, mode)
+        return cipher
+
+    def ecb_encrypt(self, key: bytes, data, out=None):
+        """Encrypt whole blocks (no padding)."""
+        return self._ecb(key, data, out, SM4_ENCRYPT)
+
+    def ecb_decrypt(self, key: bytes, data, out=None):
+        """Decrypt whole blocks (no padding)."""
+        return self._ecb(key, data, out, SM4_DECRYPT)
+
+    def _ecb(self, key: bytes, data, out, mode: int):
+        if len(data) % SM4_BLOCK:
+            raise ValueError("ECB input must be a multiple of 16 bytes")
+        result = self._cipher(key, mode).crypt_ecb(bytes(data))
+        out = _output(out, len(result))
+        memoryview(out).cast('B')[:len(result)] = result
+        return out
+
+    def ctr(self, key: bytes, counter: bytes, data, out=None):
+        """XOR data with the keystream starting at the 16-byte counter block."""
+        length = len(data)
+        blocks = (length + SM4_BLOCK - 1) // SM4_BLOCK
+        start = int.from_bytes(counter, 'big')
+        counters = b''.join(((start + i) % (1 << 128)).to_bytes(SM4_BLOCK, 'big') for i in range(blocks))
+        stream = self._cipher(key, SM4_ENCRYPT).crypt_ecb(counters)[:length]
+        result = (int.from_bytes(data, 'big') ^ int.from_bytes(stream, 'big')).to_bytes(length, 'big')
+        out = _output(out, length)
+        memoryview(out).cast('B')[:length] = result
+        return out
+
+    def ghash(self, h: bytes, y: bytes, data) -> bytes:
+        """GHASH state `y` after absorbing `data` under hash key `h`."""
+        return ghash_update(int.from_bytes(h, 'big'), int.from_bytes(y, 'big'), data).to_bytes(SM4_BLOCK, 'big')
+
+    def _gcm_keys(self, key: bytes, iv: bytes) -> Tuple[CryptSM4, int, bytes]:
+        cipher = self._cipher(key, SM4_ENCRYPT)
+        h = int.from_bytes(cipher.crypt_ecb(bytes(SM4_BLOCK)), 'big')
+        if len(iv) == 12:
+            j0 = bytes(iv) + b'\x00\x00\x00\x01'
+        else:
+            j0 = _ghash(h, b'', bytes(iv)).to_bytes(SM4_BLOCK, 'big')
+        return cipher, h, j0
+
+    def _gcm_ctr(self, cipher: CryptSM4, j0: bytes, data) -> bytes:
+        length = len(data)
+        blocks = (length + SM4_BLOCK - 1) // SM4_BLOCK
+        prefix, low = j0[:12], int.from_bytes(j0[12:], 'big')
+        counters = b''.join(prefix + ((low + 1 + i) % (1 << 32)).to_bytes(4, 'big') for i in range(blocks))
+        stream = cipher.crypt_ecb(counters)[:length]
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(stream, 'big')).to_bytes(length, 'big')
+
+    def gcm_encrypt(self, key: bytes, iv: bytes, data, aad: bytes = b'', out=None,
+                    tag_len: int = 16) -> Tuple[bytearray, bytes]:
+        """Return (ciphertext buffer, tag)."""
+        cipher, h, j0 = self._gcm_keys(key, iv)
+        ciphertext = self._gcm_ctr(cipher, j0, data)
+        mask = int.from_bytes(cipher.crypt_ecb(j0), 'big')
+        tag = (_ghash(h, bytes(aad), ciphertext) ^ mask).to_bytes(SM4_BLOCK, 'big')[:tag_len]
+        out = _output(out, len(ciphertext))
+        memoryview(out).cast('B')[:len(ciphertext)] = ciphertext
+        return out, tag
+
+    def gcm_decrypt(self, key: bytes, iv: bytes, data, tag: bytes, aad: bytes = b'', out=None):
+        """Authenticate then decrypt; raises ValueError on a tag mismatch."""
+        cipher, h, j0 = self._gcm_keys(key, iv)
+        mask = int.from_bytes(cipher.crypt_ecb(j0), 'big')
+        expected = (_ghash(h, bytes(aad), bytes(data)) ^ mask).to_bytes(SM4_BLOCK, 'big')[:len(tag)]
+        if not hmac.compare_digest(expected, bytes(tag)):
+            raise ValueError("SM4-GCM authentication failed")
+        plaintext = self._gcm_ctr(cipher, j0, data)
+        out = _output(out, len(plaintext))
+        memoryview(out).cast('B')[:len(plaintext)] = plaintext
+        return out
+
+def gf128_mul(x: int, y: int) -> int:
+    """Multiplication in GF(2^128) with GCM's bit order."""
+    z = 0
+    for i in range(127, -1, -1):
+        if (x >> i) & 1:
+            z ^= y
+        y = (y >> 1) ^ (0xE1 << 120) if y & 1 else y >> 1
+    return z
+
+def ghash_update(h: int, y: int, data) -> int:
+    """Absorb `data` (last block zero-padded) into the GHASH state `y`."""
+    data = bytes(data)
+    for i in range(0, len(data), SM4_BLOCK):
+        y = gf128_mul(y ^ int.from_bytes(data[i:i + SM4_BLOCK].ljust(SM4_BLOCK, b'\x00'), 'big'), h)
+    return y
+
+def _ghash(h: int, aad: bytes, ciphertext: bytes) -> int:
+    y = ghash_update(h, ghash_update(h, 0, aad), ciphertext)
+    lengths = ((len(aad) * 8) << 64) | (len(ciphertext) * 8)
+    return gf128_mul(y ^ lengths, h)
+
+class _PyBuffer(ctypes.Structure):
+    """CPython's Py_buffer (Include/pybuffer.h)."""
+    _fields_ = [('buf', ctypes.c_void_p), ('obj', ctypes.c_void_p), ('len', ctypes.c_ssize_t),
+                ('itemsize', ctypes.c_ssize_t), ('readonly', ctypes.c_int), ('ndim', ctypes.c_int),
+                ('format', ctypes.c_char_p), ('shape', ctypes.c_void_p), ('strides', ctypes.c_void_p),
+                ('suboffsets', ctypes.c_void_p), ('internal', ctypes.c_void_p)]
+
+PyBUF_SIMPLE = 0
+_get_buffer = ctypes.pythonapi.PyObject_GetBuffer
+_get_buffer.argtypes = [ctypes.py_object, ctypes.POINTER(_PyBuffer), ctypes.c_int]
+_get_buffer.restype = ctypes.c_int
+_release_buffer = ctypes.pythonapi.PyBuffer_Release
+_release_buffer.argtypes = [ctypes.POINTER(_PyBuffer)]
+_release_buffer.restype = None
+
+class _ReadOnlyBuffer:
+    """
+    Address of a read-only buffer (a memoryview slice of bytes, an
+    ACCESS_READ mmap), which ctypes' from_buffer refuses. The buffer stays
+    exported until this object is dropped.
+    """
+
+    def __init__(self, data):
+        self._view = _PyBuffer()
+        _get_buffer(data, ctypes.byref(self._view), PyBUF_SIMPLE)  # raises BufferError if not contiguous
+        self.length = self._view.len
+        self._as_parameter_ = ctypes.c_void_p(self._view.buf)
+
+    def __del__(self):
+        if self._view.obj:
+            _release_buffer(ctypes.byref(self._view))
+            self._view.obj = None
+
+def _in_pointer(data) -> Tuple[object, int]:
+    """A pointer to a bytes-like input, without copying it."""
+    if isinstance(data, bytes):
+        return data, len(data)
+    view = memoryview(data).cast('B')
+    if view.readonly:
+        src = _ReadOnlyBuffer(view)
+        return src, src.length
+    return (ctypes.c_char * len(view)).from_buffer(view), len(view)
+
+def _out_pointer(out):
+    view = memoryview(out).cast('B')
+    return (ctypes.c_char * len(view)).from_buffer(view)
+
+class NativeSM4:
+    """Provider backed by Project 1's libsm4.so."""
+
+    def __init__(self, lib: ctypes.CDLL, backend: int):
+        self.lib = lib
+        self.backend = backend
+        self.name = f'native-{BACKEND_NAMES[backend]}'
+
+    def _ecb(self, key: bytes, data, out, decrypt: int):
+        src, length = _in_pointer(data)
+        if length % SM4_BLOCK:
+            raise ValueError("ECB input must be a multiple of 16 bytes")
+        out = _output(out, length)
+        if self.lib.sm4_capi_ecb(self.backend, key, src, _out_pointer(out), length, decrypt):
+            raise ValueError("Native SM4-ECB failed")
+        return out
+
+    def ecb_encrypt(self, key: bytes, data, out=None):
+        """Encrypt whole blocks (no padding)."""
+        return self._ecb(key, data, out, 0)
+
+    def ecb_decrypt(self, key: bytes, data, out=None):
+        """Decrypt whole blocks (no padding)."""
+        return self._ecb(key, data, out, 1)
+
+    def ctr(self, key: bytes, counter: bytes, data, out=None):
+        """XOR data with the keystream starting at the 16-byte counter block."""
+        src, length = _in_pointer(data)
+        out = _output(out, length)
+        if self.lib.sm4_capi_ctr(self.backend, key, bytes(counter), src, _out_pointer(out), length):
+            raise ValueError("Native SM4-CTR failed")
+        return out
+
+    def ghash(self, h: bytes, y: bytes, data) -> bytes:
+        """GHASH state `y` after absorbing `data` under hash key `h`."""
+        src, length = _in_pointer(data)
+        state = ctypes.create_string_buffer(bytes(y), SM4_BLOCK)
+        if self.lib.sm4_capi_ghash(bytes(h), state, src, length):
+            raise ValueError("Native GHASH failed")
+        return state.raw
+
+    def gcm_encrypt(self, key: bytes, iv: bytes, data, aad: bytes = b'', out=None,
+                    tag_len: int = 16) -> Tuple[bytearray, bytes]:
+        """Return (ciphertext buffer, tag)."""
+        src, length = _in_pointer(data)
+        aad = bytes(aad)
+        out = _output(out, length)
+        tag = ctypes.create_string_buffer(tag_len)
+        if self.lib.sm4_capi_gcm_encrypt(self.backend, key, bytes(iv), len(iv), aad, len(aad),
+                                         src, _out_pointer(out), length, tag, tag_len):
+            raise ValueError("Native SM4-GCM failed")
+        return out, tag.raw
+
+    def gcm_decrypt(self, key: bytes, iv: bytes, data, tag: bytes, aad: bytes = b'', out=None):
+        """Authenticate then decrypt; raises ValueError on a tag mismatch."""
+        src, length = _in_pointer(data)
+        aad = bytes(aad)
+        out = _output(out, length)
+        status = self.lib.sm4_capi_gcm_decrypt(self.backend, key, bytes(iv), len(iv), aad, len(aad),
+                                               src, _out_pointer(out), length, bytes(tag), len(tag))
+        if status:
+            raise ValueError("SM4-GCM authentication failed")
+        return out
+
+def _load_library(path: str) -> Optional[ctypes.CDLL]:
+    try:
+        lib = ctypes.CDLL(path)
+        lib.sm4_capi_ghash  # libraries built before the GHASH export lack it
+    except (OSError, AttributeError):
+        return None
+
+    size_t, u8p = ctypes.c_size_t, ctypes.c_void_p
+    lib.sm4_capi_version.restype = ctypes.c_int
+    lib.sm4_capi_backends.restype = ctypes.c_int
+    lib.sm4_capi_ecb.argtypes = [ctypes.c_int, ctypes.c_char_p, u8p, u8p, size_t, ctypes.c_int]
+    lib.sm4_capi_ctr.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p, u8p, u8p, size_t]
+    lib.sm4_capi_gcm_encrypt.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p, size_t,
+                                         ctypes.c_char_p, size_t, u8p, u8p, size_t, u8p, size_t]
+    lib.sm4_capi_gcm_decrypt.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p, size_t,
+                                         ctypes.c_char_p, size_t, u8p, u8p, size_t, ctypes.c_char_p, size_t]
+    lib.sm4_capi_ghash.argtypes = [ctypes.c_char_p, ctypes.c_char_p, u8p, size_t]
+    return lib
+
+def cpu_flags() -> set:
+    """CPU feature flags from /proc/cpuinfo (empty where unavailable)."""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+def _cpu_supports(backend: int, flags: set) -> bool:
+    if backend == BACKEND_AESNI:
+        return platform.machine() in ('x86_64', 'AMD64') and {'aes', 'sse4_1'} <= flags
+    return True
+
+def _passes_kat(provider) -> bool:
+    """Known-answer ECB test plus a CTR/GCM cross-check against the gmssl provider."""
+    try:
+        if bytes(provider.ecb_encrypt(KAT_KEY, KAT_KEY)) != KAT_CIPHERTEXT:
+            return False
+        reference = GmsslSM4()
+        data = bytes(range(37))
+        counter = b'\xff' * 15 + b'\xfe'  # exercises the 128-bit carry
+        if bytes(provider.ctr(KAT_KEY, counter, data)) != bytes(reference.ctr(KAT_KEY, counter, data)):
+            return False
+        iv = bytes(range(12))
+        ct, tag = provider.gcm_encrypt(KAT_KEY, iv, data, b'aad')
+        ref_ct, ref_tag = reference.gcm_encrypt(KAT_KEY, iv, data, b'aad')
+        if provider.ghash(KAT_CIPHERTEXT, iv + bytes(4), data) != reference.ghash(KAT_CIPHERTEXT, iv + bytes(4), data):
+            return False
+        return bytes(ct) == bytes(ref_ct) and tag == ref_tag
+    except (OSError, ValueError):
+        return False
+
+def available_providers(path: Optional[str] = None) -> List[object]:
+    """Every provider usable on this machine, fastest first (gmssl last)."""
+    if path is None:
+        path = os.environ.get(NATIVE_LIB_ENV, DEFAULT_NATIVE_LIB)
+
+    providers = []
+    lib = _load_library(path) if path else None
+    if lib is not None:
+        compiled = lib.sm4_capi_backends()
+        flags = cpu_flags()
+        for backend in BACKEND_PREFERENCE:
+            if compiled & (1 << backend) and _cpu_supports(backend, flags):
+                provider = NativeSM4(lib, backend)
+                if _passes_kat(provider):
+                    providers.append(provider)
+    providers.append(GmsslSM4())
+    return providers
+
+_provider = None
+
+def get_provider():
+    """The fastest working SM4 provider, selected once per process."""
+    global _provider
+    if _provider is None:
+        _provider = available_providers()[0]
+    return _provider
+
+def main():
+    """Report the available backends and compare their throughput."""
+    import time
+
+    print("--- SM4 Providers ---")
+    flags = cpu_flags()
+    print(f"CPU flags: aes={'aes' in flags}, sse4_1={'sse4_1' in flags}")
+    lib = _load_library(os.environ.get(NATIVE_LIB_ENV, DEFAULT_NATIVE_LIB))
+    if lib is None:
+        print("libsm4.so not found (build it with `make libsm4.so` in Project 1); using gmssl")
+    else:
+        for backend in BACKEND_PREFERENCE:
+            if _cpu_supports(backend, flags):
+                status = 'ok' if _passes_kat(NativeSM4(lib, backend)) else 'FAILED known-answer test, skipped'
+            else:
+                status = 'not supported by this CPU'
+            print(f"  native-{BACKEND_NAMES[backend]:9} {status}")
+
+    providers = available_providers()
+    print(f"Selected provider: {get_provider().name}")
+
+    # RFC 8998 Appendix A.1 SM4-GCM example
+    key = bytes.fromhex('0123456789abcdeffedcba9876543210')
+    iv = bytes.fromhex('00001234567800000000abcd')
+    aad = bytes.fromhex('feedfacedeadbeeffeedfacedeadbeefabaddad2')
+    plaintext = bytes.fromhex('aa' * 8 + 'bb' * 8 + 'cc' * 8 + 'dd' * 8 + 'ee' * 8 + 'ff' * 8 + 'ee' * 8 + 'aa' * 8)
+    expected_tag = bytes.fromhex('83de3541e4c2b58177e065a9bf7b62ec')
+    gcm_ok = all(p.gcm_encrypt(key, iv, plaintext, aad)[1] == expected_tag for p in providers)
+    print(f"RFC 8998 SM4-GCM vector matches for all providers: {gcm_ok}")
+
+    payload = os.urandom(1 << 20)
+    out = bytearray(len(payload))
+    for provider in providers:
+        size = len(payload) if provider.name != 'gmssl' else 16 * 1024
+        start_time = time.perf_counter()
+        provider.ctr(key, bytes(16), memoryview(payload)[:size], out)
+        elapsed = time.perf_counter() - start_time
+        print(f"  {provider.name:17} SM4-CTR {size / elapsed / 1e6:8.2f} MB/s")
+
+    assert gcm_ok
+    print("\n✅ SM4 provider checks successful!")
+
+if __name__ == "__main__":
+    main()
@@ -11,24 +11,75 @@ echo ""
 echo "--- 测试 SM2 PGP 协议 ---"
 python SM2_PGP/SM2_PGP.py
 echo ""
+echo "--- 测试 PGP 流式加密 ---"
+python SM2_PGP/pgp_stream.py
+echo ""
+echo "--- 测试 SM4 原生后端 ---"
+python SM2_PGP/sm4_provider.py
+echo ""
+echo "--- 测试多进程 SM4-CTR/GCM ---"
+python SM2_PGP/parallel_ctr.py
+echo ""
+echo "--- 测试多接收者 PGP 加密 ---"
+python SM2_PGP/pgp_multi.py
+echo ""
+echo "--- 测试可随机访问的 PGP 容器 ---"
+python SM2_PGP/pgp_container.py
+echo ""
+echo "--- 测试 PGP 密钥环 ---"
+python SM2_PGP/pgp_keyring.py
+echo ""
+echo "--- 测试 PGP 会话模式 ---"
+python SM2_PGP/pgp_session.py
+echo ""
+echo "--- 测试目录批量加密 ---"
+python SM2_PGP/pgp_batch.py
+echo ""
 
 echo "=== 2. 测试 SM2 性能优化 ==="
 echo "--- 测试优化后的 SM2 工具函数 ---"
 python SM2_OPTIMIZATION/optimized_sm2_utils.py
 echo ""
+echo "--- 标量乘法窗口自动调优 ---"
+python SM2_OPTIMIZATION/optimized_sm2_autotune.py
+echo ""
+echo "--- 测试增量 SM3 哈希 ---"
+python SM2_OPTIMIZATION/optimized_sm3.py
+echo ""
 echo "--- 测试优化后的 SM2 数字签名 ---"
 python SM2_OPTIMIZATION/optimized_sm2_sign.py
 echo ""
 echo "--- 测试优化后的 SM2 公钥加密 ---"
 python SM2_OPTIMIZATION/optimized_sm2_enc.py
 echo ""
+echo "--- 测试磁盘预计算表 ---"
+python SM2_OPTIMIZATION/optimized_sm2_tables.py
+echo ""
+echo "--- 测试批量密钥对生成 ---"
+python SM2_OPTIMIZATION/optimized_sm2_keygen.py
+echo ""
 
 echo "=== 3. 运行安全漏洞演示 ==="
 echo "--- 演示 k-Reuse 攻击 ---"
 python SIGNATURE_MISUSE_POC/k_reuse_attack.py
 echo ""
+echo "--- 演示大规模签名语料 k 重用扫描 ---"
+python SIGNATURE_MISUSE_POC/k_reuse_scanner.py
+echo ""
 echo "--- 演示 ECDSA 签名伪造 ---"
 python SATOSHI_SIGNATURE_FORGE/satoshi_forge.py
 echo ""
+echo "--- 演示 ECDSA 重复 r 批量扫描 ---"
+python SATOSHI_SIGNATURE_FORGE/duplicate_r_scanner.py
+echo ""
+echo "--- 演示 ECDSA 公钥恢复与批量验证 ---"
+python SATOSHI_SIGNATURE_FORGE/ecdsa_bulk_verify.py
+echo ""
+echo "--- 演示 ECDSA 小随机数大步小步扫描 ---"
+python SATOSHI_SIGNATURE_FORGE/bsgs_nonce_scanner.py
+echo ""
+echo "--- 演示区间私钥并行袋鼠算法 ---"
+python SATOSHI_SIGNATURE_FORGE/kangaroo_solver.py
+echo ""
 
 echo "✅ 所有测试和演示完成！"
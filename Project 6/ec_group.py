@@ -0,0 +1,181 @@
+"""
+Elliptic-curve DDH groups for the PSI protocol.
+
+Elements are affine points (x, y); H maps identifiers onto the curve by
+try-and-increment, and blinding is scalar multiplication. On the wire a
+point is SEC1-compressed: 0x02/0x03 (parity of y) followed by x, 33 bytes
+for the 256-bit curves below. Both curves have prime order (cofactor 1)
+and p = 3 (mod 4), so square roots are one exponentiation.
+"""
+import hashlib
+import random
+from gmpy2 import invert, legendre, mpz, powmod
+
+WINDOW_SIZE = 4
+
+class ECGroup:
+    """
+    Prime-order short Weierstrass curve y^2 = x^3 + ax + b over F_p.
+
+    Args:
+        name: Group name used for negotiation and domain separation of H
+        p, a, b: Curve field prime and coefficients
+        n: Prime group order
+        gx, gy: Base point (used only for self-checks)
+    """
+
+    def __init__(self, name, p, a, b, n, gx, gy):
+        if p % 4 != 3:
+            raise ValueError("Square roots are only implemented for p = 3 (mod 4)")
+        self.name = name
+        self.p, self.a, self.b, self.n = mpz(p), mpz(a), mpz(b), mpz(n)
+        self.generator = (mpz(gx), mpz(gy))
+        self.field_width = (int(p).bit_length() + 7) // 8
+        self.element_width = 1 + self.field_width
+        self._sqrt_exponent = (self.p + 1) // 4
+
+    def __reduce__(self):
+        return ECGroup, (self.name, int(self.p), int(self.a), int(self.b), int(self.n),
+                         int(self.generator[0]), int(self.generator[1]))
+
+    def _rhs(self, x):
+        return (x * x * x + self.a * x + self.b) % self.p
+
+    def is_on_curve(self, point) -> bool:
+        x, y = point
+        return 0 <= x < self.p and 0 <= y < self.p and y * y % self.p == self._rhs(x)
+
+    def random_scalar(self):
+        return mpz(random.randint(1, int(self.n) - 1))
+
+    def hash_to_group(self, identifier):
+        """H: U -> G, try-and-increment over SHA3-512(name || counter || identifier)."""
+        data = str(identifier).encode()
+        tag = self.name.encode()
+        for counter in range(256):
+            digest = hashlib.sha3_512(tag + bytes([counter]) + data).digest()
+            x = mpz(int.from_bytes(digest, 'big')) % self.p
+            rhs = self._rhs(x)
+            if rhs == 0 or legendre(rhs, self.p) != 1:
+                continue
+            y = powmod(rhs, self._sqrt_exponent, self.p)
+            if (y & 1) != (digest[-1] & 1):
+                y = self.p - y
+            return x, y
+        raise ValueError("hash_to_group found no curve point")  # probability 2^-256
+
+    # --- Jacobian arithmetic (same formulas as Project 5's CurveArithmetic) ---
+
+    def _double(self, point):
+        if point is None or point[1] == 0:
+            return None
+        x, y, z = point
+        p = self.p
+        yy = y * y % p
+        s = 4 * x * yy % p
+        zz = z * z % p
+        m = (3 * x * x + self.a * zz * zz) % p
+        x3 = (m * m - 2 * s) % p
+        return x3, (m * (s - x3) - 8 * yy * yy) % p, 2 * y * z % p
+
+    def _add_affine(self, p1, p2):
+        if p2 is None:
+            return p1
+        if p1 is None:
+            return p2[0], p2[1], mpz(1)
+        x1, y1, z1 = p1
+        p = self.p
+        z1z1 = z1 * z1 % p
+        h = (p2[0] * z1z1 - x1) % p
+        r = (p2[1] * z1 * z1z1 - y1) % p
+        if h == 0:
+            return self._double(p1) if r == 0 else None
+        hh = h * h % p
+        hhh = h * hh % p
+        v = x1 * hh % p
+        x3 = (r * r - hhh - 2 * v) % p
+        return x3, (r * (v - x3) - y1 * hhh) % p, z1 * h % p
+
+    def _to_affine(self, point):
+        if point is None:
+            return None
+        x, y, z = point
+        z_inv = invert(z, self.p)
+        z2 = z_inv * z_inv % self.p
+        return x * z2 % self.p, y * z2 * z_inv % self.p
+
+    def exp(self, point, k):
+        """Blinding in additive notation: k * point, by a fixed 4-bit window."""
+        table, acc = [None], None
+        for _ in range((1 << WINDOW_SIZE) - 1):
+            acc = self._add_affine(acc, point)
+            table.append(self._to_affine(acc))
+
+        k = mpz(k) % self.n
+        result = None
+        mask = (1 << WINDOW_SIZE) - 1
+        top = (int(k).bit_length() + WINDOW_SIZE - 1) // WINDOW_SIZE * WINDOW_SIZE
+        for shift in range(top - WINDOW_SIZE, -1, -WINDOW_SIZE):
+            for _ in range(WINDOW_SIZE):
+                result = self._double(result)
+            result = self._add_affine(result, table[(k >> shift) & mask])
+        return self._to_affine(result)
+
+    # --- Encoding ---
+
+    def encode(self, point) -> bytes:
+        """SEC1 compressed point."""
+        if point is None:
+            raise ValueError("Cannot encode the point at infinity")
+        x, y = point
+        return bytes([2 | int(y & 1)]) + int(x).to_bytes(self.field_width, 'big')
+
+    def decode(self, data: bytes):
+        """Inverse of encode; rejects anything that is not a curve point."""
+        if len(data) != self.element_width or data[0] not in (2, 3):
+            raise ValueError("Not a compressed point")
+        x = mpz(int.from_bytes(data[1:], 'big'))
+        if x >= self.p:
+            raise ValueError("Point x-coordinate out of range")
+        rhs = self._rhs(x)
+        y = powmod(rhs, self._sqrt_exponent, self.p)
+        if y * y % self.p != rhs:
+            raise ValueError("Point is not on the curve")
+        if (y & 1) != (data[0] & 1):
+            y = self.p - y
+        return x, y
+
+SECP256K1 = ECGroup(
+    'secp256k1',
+    p=0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F,
+    a=0,
+    b=7,
+    n=0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141,
+    gx=0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+    gy=0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+
+SM2_P256 = ECGroup(
+    'sm2',
+    p=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF,
+    a=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFC,
+    b=0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93,
+    n=0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123,
+    gx=0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7,
+    gy=0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0)
+
+CURVES = {group.name: group for group in (SECP256K1, SM2_P256)}
+
+def main():
+    """Self-check both curves: base point order, commutativity of blinding, encoding."""
+    for group in CURVES.values():
+        assert group.is_on_curve(group.generator) and group.exp(group.generator, group.n) is None
+        k1, k2 = group.random_scalar(), group.random_scalar()
+        h = group.hash_to_group("user1")
+        blinded = group.exp(group.exp(h, k1), k2)
+        commutes = blinded == group.exp(group.exp(h, k2), k1) and group.is_on_curve(blinded)
+        roundtrip = all(group.decode(group.encode(pt)) == pt
+                        for pt in (group.hash_to_group(f"user{i}") for i in range(100)))
+        print(f"{group.name}: H(x)^(k1k2) commutes: {commutes}, encode/decode round trip: {roundtrip}")
+
+if __name__ == "__main__":
+    main()
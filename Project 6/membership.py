@@ -0,0 +1,408 @@
+"""
+Membership indexes for P1's intersection test in Round 3.
+
+Z arrives as encoded group elements. Each element is reduced to a 128-bit
+BLAKE2b digest (a false match needs a 128-bit collision), and the digests
+are indexed in one of two ways:
+
+  * SortedDigestSet: a sorted NumPy array of 16-byte digests; a batch of
+    queries is one vectorized binary search, O((|Z| + |C|) log |Z|), with
+    16 bytes per element instead of ~100 for a Python set of bytes
+  * FilteredDigestSet: for very large Z, a Cuckoo filter (~2-4 bytes per
+    element) stays in memory while the sorted digests are spilled to a
+    memory-mapped file; only filter hits (true matches plus a ~1e-4
+    false-positive rate) touch the file for exact confirmation
+
+For bandwidth-reduced Round 2, P2 can send one of these structures
+instead of Z itself: sorted digests truncated to just enough bytes for a
+false-positive budget, a BloomFilter or a CuckooFilter, each with a
+to_bytes/from_bytes serializer. A false positive makes P1 add a value
+outside the intersection, so the budget is the expected number of false
+matches over all |C| queries of a run.
+"""
+import hashlib
+import math
+import os
+import random
+import struct
+import tempfile
+import weakref
+from typing import Iterable, List, Optional
+import numpy as np
+
+DIGEST_SIZE = 16
+DIGEST_DTYPE = f'S{DIGEST_SIZE}'
+LARGE_SET = 1_000_000
+DEFAULT_FP_BUDGET = 1e-6
+MIN_TRUNCATED_SIZE = 4
+
+BLOOM_HEADER = struct.Struct('>QBQ')
+CUCKOO_HEADER = struct.Struct('>BBQQI')
+STASH_ENTRY = struct.Struct('>QQ')
+
+def element_digests(elements: Iterable[bytes], size: int = DIGEST_SIZE) -> np.ndarray:
+    """Fixed-width digests of encoded group elements, as an S<size> array."""
+    joined = b''.join(hashlib.blake2b(e, digest_size=size).digest() for e in elements)
+    return np.frombuffer(joined, dtype=f'S{size}')
+
+def truncated_digest_size(set_size: int, queries: int, fp_budget: float = DEFAULT_FP_BUDGET) -> int:
+    """Digest bytes for at most `fp_budget` expected false matches: 2^bits >= |Z| * |C| / budget."""
+    bits = math.log2(max(set_size, 1) * max(queries, 1) / fp_budget)
+    return min(DIGEST_SIZE, max(MIN_TRUNCATED_SIZE, math.ceil(bits / 8)))
+
+class SortedDigestSet:
+    """Exact membership by binary search over sorted digests."""
+
+    def __init__(self, digests: np.ndarray):
+        self.digests = np.sort(digests) if len(digests) else np.empty(0, DIGEST_DTYPE)
+
+    @classmethod
+    def from_elements(cls, elements: Iterable[bytes]) -> 'SortedDigestSet':
+        return cls(element_digests(elements))
+
+    def __len__(self):
+        return len(self.digests)
+
+    @property
+    def nbytes(self) -> int:
+        return self.digests.nbytes
+
+    def contains_digests(self, queries: np.ndarray) -> np.ndarray:
+        if not len(self.digests):
+            return np.zeros(len(queries), dtype=bool)
+        positions = np.searchsorted(self.digests, queries)
+        positions[positions == len(self.digests)] = 0
+        return self.digests[positions] == queries
+
+    def contains_many(self, elements: Iterable[bytes]) -> np.ndarray:
+        return self.contains_digests(element_digests(elements, self.digests.dtype.itemsize))
+
+    def save(self, path: str) -> None:
+        np.save(path, self.digests)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'SortedDigestSet':
+        """Load saved digests; with mmap, pages are read only when searched."""
+        index = cls.__new__(cls)
+        index.digests = np.load(path, mmap_mode='r' if mmap else None)
+        return index
+
+class CuckooFilter:
+    """
+    Approximate membership over digests: buckets of `bucket_size`
+    fingerprints, each stored in one of two buckets i1 and
+    i2 = i1 ^ hash(fingerprint) (partial-key cuckoo hashing). The
+    false-positive rate is about 2 * bucket_size / 2^fingerprint_bits.
+
+    Args:
+        capacity: Expected number of elements
+        fingerprint_bits: 8, 16, 32 or 64
+        bucket_size: Fingerprints per bucket
+        max_kicks: Relocations before an insert goes to the overflow stash
+    """
+
+    def __init__(self, capacity: int, fingerprint_bits: int = 16, bucket_size: int = 4, max_kicks: int = 500):
+        if fingerprint_bits not in (8, 16, 32, 64):
+            raise ValueError("fingerprint_bits must be 8, 16, 32 or 64")
+        self.fingerprint_bits = fingerprint_bits
+        self.bucket_size = bucket_size
+        self.max_kicks = max_kicks
+        buckets = 1
+        while buckets * bucket_size * 0.9 < max(capacity, 1):
+            buckets <<= 1
+        self.mask = buckets - 1
+        self.table = np.zeros((buckets, bucket_size), dtype=f'uint{fingerprint_bits}')
+        self._fill = np.zeros(buckets, dtype=np.uint8)
+        self._stash = set()
+        self.count = 0
+
+    @classmethod
+    def for_budget(cls, capacity: int, queries: int, fp_budget: float = DEFAULT_FP_BUDGET,
+                   bucket_size: int = 4) -> 'CuckooFilter':
+        """Smallest fingerprint size with 2 * bucket_size / 2^f <= fp_budget / queries."""
+        needed = math.log2(2 * bucket_size * max(queries, 1) / fp_budget)
+        bits = next((b for b in (8, 16, 32) if b >= needed), 64)
+        return cls(capacity, bits, bucket_size)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes + self._fill.nbytes
+
+    def to_bytes(self) -> bytes:
+        """fingerprint bits | bucket size | buckets | count | stash size, table, stash entries."""
+        table = self.table.astype(self.table.dtype.newbyteorder('>'))
+        return (CUCKOO_HEADER.pack(self.fingerprint_bits, self.bucket_size, self.mask + 1, self.count,
+                                   len(self._stash))
+                + table.tobytes() + b''.join(STASH_ENTRY.pack(*entry) for entry in sorted(self._stash)))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CuckooFilter':
+        try:
+            bits, bucket_size, buckets, count, stash_size = CUCKOO_HEADER.unpack_from(data, 0)
+            if bits not in (8, 16, 32, 64) or not bucket_size or buckets & (buckets - 1):
+                raise ValueError("Malformed Cuckoo filter header")
+            table_size = buckets * bucket_size * bits // 8
+            offset = CUCKOO_HEADER.size + table_size
+            if len(data) != offset + stash_size * STASH_ENTRY.size:
+                raise ValueError("Cuckoo filter length does not match its header")
+        except struct.error:
+            raise ValueError("Truncated Cuckoo filter")
+        cuckoo = cls.__new__(cls)
+        cuckoo.fingerprint_bits, cuckoo.bucket_size, cuckoo.max_kicks = bits, bucket_size, 500
+        cuckoo.mask, cuckoo.count = buckets - 1, count
+        cuckoo.table = np.frombuffer(data, dtype=f'>u{bits // 8}', count=buckets * bucket_size,
+                                     offset=CUCKOO_HEADER.size).astype(f'uint{bits}').reshape(buckets, bucket_size)
+        cuckoo._fill = (cuckoo.table != 0).sum(axis=1).astype(np.uint8)
+        cuckoo._stash = {STASH_ENTRY.unpack_from(data, offset + i * STASH_ENTRY.size) for i in range(stash_size)}
+        return cuckoo
+
+    def _hash(self, digests: np.ndarray):
+        words = digests.view('>u8').astype(np.uint64).reshape(-1, 2)
+        index = words[:, 0] & np.uint64(self.mask)
+        fingerprint = words[:, 1] & np.uint64((1 << self.fingerprint_bits) - 1)
+        fingerprint[fingerprint == 0] = 1  # 0 marks an empty slot
+        return index.astype(np.int64), fingerprint.astype(self.table.dtype)
+
+    def _alt(self, index, fingerprint):
+        mixed = fingerprint.astype(np.uint64) * np.uint64(0x5BD1E995)
+        return index ^ (mixed & np.uint64(self.mask)).astype(np.int64)
+
+    def add_digests(self, digests: np.ndarray) -> None:
+        i1, fingerprint = self._hash(digests)
+        pending = np.arange(len(fingerprint))
+        # Vectorized placement into free slots, one item per bucket per pass
+        for index in (i1, self._alt(i1, fingerprint)):
+            while len(pending):
+                buckets = index[pending]
+                free = self._fill[buckets] < self.bucket_size
+                _, first = np.unique(buckets[free], return_index=True)
+                if not len(first):
+                    break
+                placed = pending[free][first]
+                rows = index[placed]
+                self.table[rows, self._fill[rows]] = fingerprint[placed]
+                self._fill[rows] += 1
+                pending = np.setdiff1d(pending, placed, assume_unique=True)
+        for item in pending:
+            self._insert_kicking(int(i1[item]), fingerprint[item])
+        self.count += len(fingerprint)
+
+    def _insert_kicking(self, index: int, fingerprint) -> None:
+        for _ in range(self.max_kicks):
+            slot = random.randrange(self.bucket_size)
+            fingerprint, self.table[index, slot] = self.table[index, slot], fingerprint
+            index = int(self._alt(np.array([index]), np.array([fingerprint]))[0])
+            if self._fill[index] < self.bucket_size:
+                self.table[index, self._fill[index]] = fingerprint
+                self._fill[index] += 1
+                return
+        self._stash.add((min(index, int(self._alt(np.array([index]), np.array([fingerprint]))[0])),
+                         int(fingerprint)))
+
+    def contains_digests(self, queries: np.ndarray) -> np.ndarray:
+        i1, fingerprint = self._hash(queries)
+        i2 = self._alt(i1, fingerprint)
+        column = fingerprint[:, None]
+        hits = (self.table[i1] == column).any(axis=1) | (self.table[i2] == column).any(axis=1)
+        if self._stash:
+            for k in np.flatnonzero(~hits):
+                hits[k] = (min(int(i1[k]), int(i2[k])), int(fingerprint[k])) in self._stash
+        return hits
+
+    def contains_many(self, elements: Iterable[bytes]) -> np.ndarray:
+        return self.contains_digests(element_digests(elements))
+
+class BloomFilter:
+    """
+    Bloom filter over digests with k probes h1 + i * h2 (mod m), where h1
+    and h2 are the two halves of the 128-bit digest.
+
+    Args:
+        bits: Filter size m in bits
+        hashes: Number of probes k
+    """
+
+    def __init__(self, bits: int, hashes: int):
+        if bits < 8 or not 0 < hashes < 256:
+            raise ValueError("Bloom filter needs at least 8 bits and 1-255 hashes")
+        self.bits = bits
+        self.hashes = hashes
+        self.array = np.zeros((bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    @classmethod
+    def for_budget(cls, capacity: int, queries: int, fp_budget: float = DEFAULT_FP_BUDGET) -> 'BloomFilter':
+        """Optimal m and k for a per-query false-positive rate of fp_budget / queries."""
+        rate = fp_budget / max(queries, 1)
+        bits = max(8, math.ceil(-max(capacity, 1) * math.log(rate) / math.log(2) ** 2))
+        return cls(bits, max(1, round(bits / max(capacity, 1) * math.log(2))))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes
+
+    @property
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def _positions(self, digests: np.ndarray) -> np.ndarray:
+        words = digests.view('>u8').astype(np.uint64).reshape(-1, 2)
+        probes = np.arange(self.hashes, dtype=np.uint64)
+        return (words[:, :1] + probes * (words[:, 1:] | np.uint64(1))) % np.uint64(self.bits)
+
+    def add_digests(self, digests: np.ndarray) -> None:
+        positions = self._positions(digests).ravel()
+        np.bitwise_or.at(self.array, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(digests)
+
+    def contains_digests(self, queries: np.ndarray) -> np.ndarray:
+        positions = self._positions(queries)
+        return ((self.array[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1).all(axis=1)
+
+    def contains_many(self, elements: Iterable[bytes]) -> np.ndarray:
+        return self.contains_digests(element_digests(elements))
+
+    def to_bytes(self) -> bytes:
+        """bits | hashes | count, bit array."""
+        return BLOOM_HEADER.pack(self.bits, self.hashes, self.count) + self.array.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BloomFilter':
+        try:
+            bits, hashes, count = BLOOM_HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise ValueError("Truncated Bloom filter")
+        bloom = cls(bits, hashes)
+        if len(data) != BLOOM_HEADER.size + bloom.array.nbytes:
+            raise ValueError("Bloom filter length does not match its header")
+        bloom.array = np.frombuffer(data, dtype=np.uint8, offset=BLOOM_HEADER.size).copy()
+        bloom.count = count
+        return bloom
+
+class FilteredDigestSet:
+    """
+    Exact membership for very large sets: Cuckoo filter in memory, sorted
+    digests in a memory-mapped file consulted only for filter hits.
+
+    Args:
+        digests: Digests of the set
+        spill_dir: Directory for the digest file (default: system temp dir)
+    """
+
+    def __init__(self, digests: np.ndarray, spill_dir: Optional[str] = None, fingerprint_bits: int = 16):
+        self.filter = CuckooFilter(len(digests), fingerprint_bits)
+        self.filter.add_digests(digests)
+        fd, self.path = tempfile.mkstemp(suffix='.npy', dir=spill_dir)
+        os.close(fd)
+        SortedDigestSet(digests).save(self.path)
+        self.exact = SortedDigestSet.load(self.path)
+        self._remove = weakref.finalize(self, os.remove, self.path)  # also on garbage collection or exit
+        self.confirmations = 0
+
+    def __len__(self):
+        return len(self.exact)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size; the digest file is paged in on demand."""
+        return self.filter.nbytes
+
+    def contains_digests(self, queries: np.ndarray) -> np.ndarray:
+        hits = self.filter.contains_digests(queries)
+        candidates = np.flatnonzero(hits)
+        self.confirmations += len(candidates)
+        if len(candidates):
+            hits[candidates] = self.exact.contains_digests(queries[candidates])
+        return hits
+
+    def contains_many(self, elements: Iterable[bytes]) -> np.ndarray:
+        return self.contains_digests(element_digests(elements))
+
+    def close(self) -> None:
+        self.exact = SortedDigestSet(np.empty(0, DIGEST_DTYPE))
+        self._remove()
+
+def build_index(element_batches: Iterable[List[bytes]], large_set: int = LARGE_SET,
+                spill_dir: Optional[str] = None):
+    """
+    Index a stream of encoded elements: SortedDigestSet, or a
+    FilteredDigestSet once the set reaches `large_set` elements.
+    """
+    digests = [element_digests(batch) for batch in element_batches]
+    digests = np.concatenate(digests) if digests else np.empty(0, DIGEST_DTYPE)
+    if len(digests) >= large_set:
+        return FilteredDigestSet(digests, spill_dir)
+    return SortedDigestSet(digests)
+
+def benchmark_bandwidth(size: int = 100_000, fp_budget: float = DEFAULT_FP_BUDGET, element_width: int = 33):
+    """Round-2 bytes for Z in each representation, for |Z| = |C| = size."""
+    elements = [os.urandom(element_width) for _ in range(size)]
+    non_members = [os.urandom(element_width) for _ in range(size)]
+    truncated = SortedDigestSet(element_digests(elements, truncated_digest_size(size, size, fp_budget)))
+    bloom = BloomFilter.for_budget(size, size, fp_budget)
+    bloom.add_digests(element_digests(elements))
+    cuckoo = CuckooFilter.for_budget(size, size, fp_budget)
+    cuckoo.add_digests(element_digests(elements))
+
+    print(f"Round 2 Z for |Z| = |C| = {size}, false-positive budget {fp_budget:g} per run:")
+    full = size * element_width
+    for name, sent, index in (('full', full, None),
+                              (f'truncated {truncated.digests.dtype.itemsize}B', truncated.nbytes, truncated),
+                              (f'bloom k={bloom.hashes}', len(bloom.to_bytes()), bloom),
+                              (f'cuckoo {cuckoo.fingerprint_bits}-bit', len(cuckoo.to_bytes()), cuckoo)):
+        false_matches = int(index.contains_many(non_members).sum()) if index else 0
+        members = bool(index.contains_many(elements).all()) if index else True
+        print(f"  {name:<16} {sent / 1e6:7.2f} MB ({full / sent:4.1f}x smaller)  "
+              f"members found: {members}, false matches among {size} non-members: {false_matches}")
+
+def main():
+    """Compare list, set, sorted digests and Cuckoo filter + confirmation."""
+    import sys
+    import time
+
+    size = 100_000
+    elements = [os.urandom(33) for _ in range(size)]
+    queries = random.sample(elements, size // 2) + [os.urandom(33) for _ in range(size // 2)]
+    expected = np.array([True] * (size // 2) + [False] * (size // 2))
+    print(f"|Z| = |C| = {size}")
+
+    start = time.time()
+    sample = 200
+    sum(q in elements for q in queries[size // 2 - sample // 2:size // 2 + sample // 2])
+    per_query = (time.time() - start) / sample
+    print(f"{'list':<16} query {per_query * size:8.2f}s (extrapolated from {sample} queries)")
+
+    start = time.time()
+    as_set = set(elements)
+    build = time.time() - start
+    start = time.time()
+    set_hits = np.array([q in as_set for q in queries])
+    set_bytes = sys.getsizeof(as_set) + sum(sys.getsizeof(e) for e in elements)
+    print(f"{'set':<16} build {build:6.3f}s  query {time.time() - start:6.3f}s  "
+          f"{set_bytes / size:6.1f} B/element  correct: {bool((set_hits == expected).all())}")
+
+    for name, make in (('sorted digests', lambda: build_index([elements])),
+                       ('cuckoo + mmap', lambda: build_index([elements], large_set=1))):
+        start = time.time()
+        index = make()
+        build = time.time() - start
+        start = time.time()
+        found = index.contains_many(queries)
+        print(f"{name:<16} build {build:6.3f}s  query {time.time() - start:6.3f}s  "
+              f"{index.nbytes / size:6.1f} B/element  correct: {bool((found == expected).all())}")
+        if isinstance(index, FilteredDigestSet):
+            print(f"{'':<16} exact confirmations: {index.confirmations} "
+                  f"({index.confirmations - size // 2} filter false positives)")
+            index.close()
+    print()
+    benchmark_bandwidth(size)
+
+if __name__ == "__main__":
+    main()
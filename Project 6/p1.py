@@ -2,55 +2,67 @@
 P1 (Client) implementation of DDH-based Private Intersection-Sum protocol.
 """
 import socket
-import pickle
 import random
-from gmpy2 import powmod
-from shared_logic import FIXED_PRIME, PORT, hash_to_group, generate_private_key
+import sys
+from phe import paillier
+from paillier_pool import RandomnessPool
+from shared_logic import DEFAULT_GROUP, PORT, ParallelExponentiator, get_group, synthetic_v
+from wire_protocol import (FRAME_CIPHERTEXT, ciphertext_width, decode_ciphertexts, encode_ciphertext,
+                           recv_layout, recv_membership, recv_public_key, recv_records, send_frame, send_group, send_records)
 
-# P1's private data
+# P1's private data (pass a size on the command line for a synthetic set,
+# and optionally a group: modp, secp256k1 or sm2)
 V = ["user1", "user2", "user3"]
-k1 = generate_private_key()
 
 def main():
+    data = synthetic_v(int(sys.argv[1])) if len(sys.argv) > 1 else V
+    group = get_group(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_GROUP)
+    width = group.element_width
+    k1 = group.random_scalar()
     client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    exp = ParallelExponentiator(k1, group)
     try:
         client.connect(('localhost', PORT))
-        print("P1: Connected to P2")
-
-        # Round 1: Send H(vi)^k1
-        A = [powmod(hash_to_group(v), k1, FIXED_PRIME) for v in V]
-        random.shuffle(A)
-        client.sendall(pickle.dumps(A))
-        print(f"P1: Sent {len(A)} elements")
-
-        # Round 2: Receive Z, C, pk
-        Z, C, pk = pickle.loads(client.recv(40960))
-        print(f"P1: Received Z({len(Z)}), C({len(C)}), pk")
-
-        # Round 3: Compute intersection sum
-        encrypted_values = []
-        for h_w_k2, enc_t in C:
-            h_w_k1k2 = powmod(h_w_k2, k1, FIXED_PRIME)
-            if h_w_k1k2 in Z:
-                encrypted_values.append(enc_t)
-
-        # Homomorphic sum
-        if encrypted_values:
-            result = encrypted_values[0]
-            for enc_val in encrypted_values[1:]:
-                result = result + enc_val
-        else:
-            result = pk.encrypt(0)
+        print(f"P1: Connected to P2 (group: {group.name})")
+        send_group(client, group.name)
+
+        # Round 1: Send H(vi)^k1, shuffled up front and streamed in batches
+        A = (group.encode(a) for a in exp.hash_pow_iter(random.sample(data, len(data))))
+        sent = send_records(client, A, width)
+        print(f"P1: Sent {sent} elements")
+
+        # Round 2: Receive pk and Z (as a digest index or compact filter), then process C batch by batch
+        pk = recv_public_key(client)
+        Z = recv_membership(client, width)
+        ciphertexts = recv_layout(client)
+        refresh = RandomnessPool(pk, processes=1)
+        refresh.start(ciphertexts, refill=False)  # the refresh obfuscators are computed while C streams in
+
+        # Round 3: Compute the intersection sum of each (packed) ciphertext position,
+        # starting from the trivial encryption of 0
+        results = [paillier.EncryptedNumber(pk, 1) for _ in range(ciphertexts)]
+        intersection = received = 0
+        for batch in recv_records(client, width + ciphertexts * ciphertext_width(pk)):
+            received += len(batch)
+            h_w_k1k2s = exp.pow_all(group.decode(record[:width]) for record in batch)
+            matches = Z.contains_many(group.encode(h) for h in h_w_k1k2s)
+            for record, match in zip(batch, matches):
+                if match:
+                    results = [r + c for r, c in zip(results, decode_ciphertexts(pk, record[width:]))]
+                    intersection += 1
+        print(f"P1: Received Z({len(Z)}), C({received}), pk")
 
         # Randomize and send
-        result = result + pk.encrypt(0)
-        client.sendall(pickle.dumps(result))
-        print(f"P1: Sent encrypted sum (intersection size: {len(encrypted_values)})")
+        results = [refresh.rerandomize(r) for r in results]
+        refresh.close()
+        send_frame(client, FRAME_CIPHERTEXT, b''.join(encode_ciphertext(r) for r in results))
+        print(f"P1: Sent encrypted sum (intersection size: {intersection})")
 
     except Exception as e:
         print(f"P1 Error: {e}")
     finally:
+        exp.close()
         client.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,20 +2,43 @@
 P2 (Server) implementation of DDH-based Private Intersection-Sum protocol.
 """
 import socket
-import pickle
 import random
-from gmpy2 import powmod
+import sys
 from phe import paillier
-from shared_logic import FIXED_PRIME, PORT, hash_to_group, generate_private_key
+from packing import SlotPacker
+from paillier_pool import RandomnessPool
+from shared_logic import DEFAULT_GROUP, PORT, ParallelExponentiator, get_group, synthetic_w
+from wire_protocol import (FRAME_CIPHERTEXT, ciphertext_width, decode_ciphertexts, encode_ciphertext,
+                           expect_frame, expect_group, recv_records, send_layout, send_membership,
+                           send_public_key, send_records)
 
-# P2's private data
+# P2's private data (pass a size on the command line for a synthetic set,
+# optionally a group: modp, secp256k1 or sm2, a Z format: full,
+# truncated, bloom or cuckoo, and a number of groups for per-group sums)
 W = [("user1", 100), ("user3", 300), ("user4", 400)]
-k2 = generate_private_key()
 pk, sk = paillier.generate_paillier_keypair()
 
 def main():
+    groups = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    data = synthetic_w(int(sys.argv[1]), groups) if len(sys.argv) > 1 else W
+    group = get_group(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_GROUP)
+    z_format = sys.argv[3] if len(sys.argv) > 3 else 'full'
+    width = group.element_width
+    k2 = group.random_scalar()
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    exp = ParallelExponentiator(k2, group)
+    # Values are packed into as few Paillier plaintexts as the slot headroom allows; a single
+    # column gains nothing from packing and negative values cannot be packed, so those rows
+    # are encrypted one value per ciphertext (phe encodes negatives itself)
+    rows = [(w, t if isinstance(t, (list, tuple)) else [t]) for w, t in data]
+    packer = SlotPacker.for_rows(pk, [t for _, t in rows])
+    packed = packer.columns > 1 and all(v >= 0 for _, t in rows for v in t)
+    per_row = packer.ciphertexts if packed else packer.columns
+    plaintexts = packer.pack if packed else lambda t: list(t) + [0] * (packer.columns - len(t))
+    # Offline: precompute the Paillier obfuscators while waiting for P1
+    randomness = RandomnessPool(pk)
+    randomness.start(len(rows) * per_row, refill=False)
     
     try:
         server.bind(('localhost', PORT))
@@ -24,32 +47,46 @@ def main():
 
         conn, addr = server.accept()
         print(f"P2: Connected with P1 from {addr}")
+        expect_group(conn, group.name)
 
-        # Round 1: Receive A from P1
-        A = pickle.loads(conn.recv(40960))
-        print(f"P2: Received {len(A)} elements")
-
-        # Round 2: Compute Z and C, send to P1
-        Z = [powmod(a, k2, FIXED_PRIME) for a in A]
+        # Round 1 + 2: Blind A from P1 batch by batch; Z is kept encoded until it is shuffled
+        Z = []
+        for batch in recv_records(conn, width):
+            Z.extend(group.encode(z) for z in exp.pow_all(group.decode(a) for a in batch))
+        print(f"P2: Received {len(Z)} elements")
         random.shuffle(Z)
 
-        C = [(powmod(hash_to_group(w), k2, FIXED_PRIME), pk.encrypt(t)) for w, t in W]
-        random.shuffle(C)
-
-        conn.sendall(pickle.dumps((Z, C, pk)))
-        print(f"P2: Sent Z({len(Z)}), C({len(C)}), pk")
+        # Round 2: Send pk, Z and C; C is shuffled up front and produced lazily
+        send_public_key(conn, pk)
+        z_bytes = send_membership(conn, Z, width, z_format, queries=len(rows))
+        send_layout(conn, per_row)
+        rows = random.sample(rows, len(rows))
+        C = (group.encode(h_w_k2) + b''.join(encode_ciphertext(randomness.encrypt(p)) for p in plaintexts(t))
+             for h_w_k2, (_, t) in zip(exp.hash_pow_iter([w for w, _ in rows]), rows))
+        sent = send_records(conn, C, width + per_row * ciphertext_width(pk), batch_size=256)
+        print(f"P2: Sent Z({len(Z)}, {z_format}, {z_bytes} bytes), C({sent}), pk")
 
-        # Round 3: Receive and decrypt result
-        encrypted_sum = pickle.loads(conn.recv(40960))
-        result = sk.decrypt(encrypted_sum)
-        print(f"P2: Intersection sum = {result}")
+        # Round 3: Receive, decrypt and (if packed) unpack the result
+        encrypted_sums = decode_ciphertexts(pk, expect_frame(conn, FRAME_CIPHERTEXT))
+        sums = [sk.decrypt(c) for c in encrypted_sums]
+        if packed:
+            sums = packer.unpack(sums)
+        if packer.columns == 1:
+            print(f"P2: Intersection sum = {sums[0]}")
+        elif packed:
+            print(f"P2: Intersection sums per group ({packer.slots} slots per ciphertext, "
+                  f"{packer.ciphertexts} ciphertexts per row) = {sums}")
+        else:
+            print(f"P2: Intersection sums per group (unpacked, {per_row} ciphertexts per row) = {sums}")
 
         conn.close()
         
     except Exception as e:
         print(f"P2 Error: {e}")
     finally:
+        randomness.close()
+        exp.close()
         server.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
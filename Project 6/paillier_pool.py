@@ -0,0 +1,279 @@
+"""
+Precomputed Paillier randomness for P2's encryptions and P1's refresh.
+
+A Paillier encryption of m is (1 + n*m) * r^n mod n^2 (g = n + 1). The
+obfuscator r^n costs a full exponentiation modulo n^2 (~57 ms with phe's
+default 3072-bit key) but does not depend on m, so RandomnessPool computes
+obfuscators ahead of time on a process pool, optionally from a background
+thread (topping the pool up, or generating a fixed count once), and online
+encryption is one modular multiplication.
+
+Every obfuscator is used once: take() removes it from the pool, save()
+hands the unused ones over to a file (bound to the public key by a SHA-256
+fingerprint of n) and load() deletes the file before using its contents,
+so a crash cannot replay them.
+"""
+import hashlib
+import os
+import random
+import struct
+import threading
+from collections import deque
+from multiprocessing import Pool
+from typing import Iterable, List, Optional
+from gmpy2 import mpz, powmod
+from phe import paillier
+from phe.encoding import EncodedNumber
+
+POOL_MAGIC = b'PRND'
+POOL_VERSION = 1
+POOL_HEADER = struct.Struct('>4sB32sQ')
+DEFAULT_CHUNK_SIZE = 16
+
+_worker_n = None
+_worker_nsquare = None
+
+def _init_obfuscator_worker(n):
+    global _worker_n, _worker_nsquare
+    _worker_n = mpz(n)
+    _worker_nsquare = _worker_n * _worker_n
+
+def _obfuscator_chunk(count):
+    rng = random.SystemRandom()
+    return [powmod(rng.randrange(1, _worker_n), _worker_n, _worker_nsquare) for _ in range(count)]
+
+def key_fingerprint(public_key: paillier.PaillierPublicKey) -> bytes:
+    n = public_key.n
+    return hashlib.sha256(n.to_bytes((n.bit_length() + 7) // 8, 'big')).digest()
+
+class RandomnessPool:
+    """
+    Obfuscators r^n mod n^2 for one Paillier public key.
+
+    Args:
+        public_key: Paillier public key the obfuscators belong to
+        processes: Worker processes for precomputation (defaults to the CPU count)
+        chunk_size: Obfuscators per worker task
+    """
+
+    def __init__(self, public_key: paillier.PaillierPublicKey, processes: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.public_key = public_key
+        self.n = mpz(public_key.n)
+        self.nsquare = mpz(public_key.nsquare)
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._values = deque()
+        self._cond = threading.Condition()
+        self._pool = None
+        self._thread = None
+        self._running = False
+        self._target = 0
+        self._remaining = None
+        self._closed = False
+        self.generated = 0
+        self.inline = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    # --- Precomputation ---
+
+    def _compute(self, count: int) -> List[mpz]:
+        if self.processes == 1 or count <= self.chunk_size:
+            rng = random.SystemRandom()
+            return [powmod(rng.randrange(1, self.n), self.n, self.nsquare) for _ in range(count)]
+        if self._pool is None:
+            self._pool = Pool(self.processes, initializer=_init_obfuscator_worker, initargs=(self.n,))
+        chunks = [self.chunk_size] * (count // self.chunk_size)
+        if count % self.chunk_size:
+            chunks.append(count % self.chunk_size)
+        return [value for chunk in self._pool.imap_unordered(_obfuscator_chunk, chunks) for value in chunk]
+
+    def _add(self, values: List[mpz]) -> None:
+        with self._cond:
+            self._values.extend(values)
+            self.generated += len(values)
+            self._cond.notify_all()
+
+    def fill(self, count: int) -> None:
+        """Compute `count` obfuscators now, in parallel."""
+        self._add(self._compute(count))
+
+    def start(self, target: int, refill: bool = True) -> None:
+        """
+        Generate obfuscators from a background thread.
+
+        With refill the thread keeps at least `target` ready, topping the pool
+        up as values are taken; without it the thread generates exactly
+        `target` more and stops (for a caller that knows how many it needs).
+        """
+        with self._cond:
+            self._target = target
+            self._remaining = None if refill else target
+            spawn = not self._running
+            self._running = True
+            self._cond.notify_all()
+        if spawn:
+            if self._thread is not None:
+                self._thread.join()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and self._remaining is None and len(self._values) >= self._target:
+                    self._cond.wait()
+                if self._closed or self._remaining == 0:
+                    self._running = False
+                    self._cond.notify_all()
+                    return
+                if self._remaining is None:
+                    need = min(self._target - len(self._values), self.chunk_size * self.processes)
+                else:
+                    need = min(self._remaining, self.chunk_size * self.processes)
+                    self._remaining -= need
+            self._add(self._compute(need))
+
+    def wait_ready(self, count: int) -> None:
+        """Block until `count` obfuscators are ready (requires start())."""
+        with self._cond:
+            while len(self._values) < count and self._running and not self._closed:
+                self._cond.wait()
+
+    def take(self) -> mpz:
+        """One unused obfuscator; waits for the background thread, else computes inline."""
+        with self._cond:
+            while not self._values and self._running and not self._closed:
+                self._cond.wait()
+            if self._values:
+                value = self._values.popleft()
+                self._cond.notify_all()
+                return value
+        self.inline += 1
+        return self._compute(1)[0]
+
+    # --- Online encryption ---
+
+    def encrypt(self, value) -> paillier.EncryptedNumber:
+        """Same result as public_key.encrypt(value), with one multiplication mod n^2."""
+        encoding = EncodedNumber.encode(self.public_key, value)
+        nude = (self.n * encoding.encoding + 1) % self.nsquare
+        return paillier.EncryptedNumber(self.public_key, int(nude * self.take() % self.nsquare), encoding.exponent)
+
+    def encrypt_many(self, values: Iterable) -> List[paillier.EncryptedNumber]:
+        """Encrypt a batch, first computing any missing obfuscators in parallel."""
+        values = list(values)
+        if not self._running and len(values) > len(self._values):
+            self.fill(len(values) - len(self._values))
+        return [self.encrypt(v) for v in values]
+
+    def rerandomize(self, encrypted: paillier.EncryptedNumber) -> paillier.EncryptedNumber:
+        """Re-randomize a ciphertext (the protocol's ARefresh step) by multiplying in a fresh encryption of zero."""
+        return paillier.EncryptedNumber(self.public_key,
+                                        int(encrypted.ciphertext(be_secure=False) * self.take() % self.nsquare),
+                                        encrypted.exponent)
+
+    # --- Persistence ---
+
+    def save(self, path: str) -> int:
+        """Move all unused obfuscators to `path`; returns how many were written."""
+        width = (int(self.nsquare - 1).bit_length() + 7) // 8
+        with self._cond:
+            values, self._values = list(self._values), deque()
+        tmp_path = path + '.partial'
+        with open(tmp_path, 'wb') as f:
+            f.write(POOL_HEADER.pack(POOL_MAGIC, POOL_VERSION, key_fingerprint(self.public_key), len(values)))
+            for value in values:
+                f.write(int(value).to_bytes(width, 'big'))
+        os.replace(tmp_path, path)
+        return len(values)
+
+    def load(self, path: str) -> int:
+        """Take over the obfuscators saved in `path` (the file is deleted)."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            magic, version, fingerprint, count = POOL_HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise ValueError("Truncated randomness pool file")
+        if magic != POOL_MAGIC or version != POOL_VERSION:
+            raise ValueError("Not a randomness pool file")
+        if fingerprint != key_fingerprint(self.public_key):
+            raise ValueError("Randomness pool belongs to a different public key")
+        width = (int(self.nsquare - 1).bit_length() + 7) // 8
+        body = data[POOL_HEADER.size:]
+        if len(body) != count * width:
+            raise ValueError("Randomness pool length does not match its header")
+        os.remove(path)
+        self._add([mpz(int.from_bytes(body[i:i + width], 'big')) for i in range(0, len(body), width)])
+        return count
+
+def main():
+    """Compare phe encryption with pooled encryption and persist a pool."""
+    import tempfile
+    import time
+
+    pk, sk = paillier.generate_paillier_keypair()
+    values = list(range(40))
+
+    start = time.time()
+    reference = [pk.encrypt(v) for v in values]
+    phe_time = (time.time() - start) / len(values)
+
+    with RandomnessPool(pk, processes=2) as pool:
+        start = time.time()
+        pool.fill(len(values))
+        offline = (time.time() - start) / len(values)
+        start = time.time()
+        encrypted = [pool.encrypt(v) for v in values]
+        online = (time.time() - start) / len(values)
+        print(f"{pk.n.bit_length()}-bit key: pk.encrypt {phe_time * 1e3:.1f} ms, pooled offline "
+              f"{offline * 1e3:.1f} ms + online {online * 1e6:.1f} us per value ({pool.processes} processes)")
+        correct = [sk.decrypt(e) for e in encrypted] == values == [sk.decrypt(e) for e in reference]
+        refreshed = pool.rerandomize(encrypted[7])
+        refresh_ok = (sk.decrypt(refreshed) == 7
+                      and refreshed.ciphertext(be_secure=False) != encrypted[7].ciphertext(be_secure=False))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'p2.pool')
+            pool.fill(10)
+            saved = pool.save(path)
+            restored = RandomnessPool(pk, processes=1)
+            loaded = restored.load(path)
+            persisted = saved == loaded == len(restored) and not os.path.exists(path)
+            restored.start(20)
+            restored.wait_ready(20)
+            background = len(restored) >= 20
+            restored.close()
+
+            once = RandomnessPool(pk, processes=1)
+            once.start(5, refill=False)
+            once.encrypt_many(range(5))
+            one_shot = once.generated == 5 and once.inline == 0
+            once.close()
+
+    print(f"Decrypts correctly: {correct}, refresh: {refresh_ok}, save/load ({saved} values): {persisted}, "
+          f"background fill: {background}, one-shot: {one_shot}")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,13 @@
 DDH-based Private Intersection-Sum Protocol - Shared Components
 """
 import hashlib
+import os
 import random
+import time
+from multiprocessing import Pool
 from gmpy2 import mpz, next_prime, powmod
+from ec_group import CURVES
+from packing import one_hot
 
 # Protocol parameters
 PRIME_BITS = 256
@@ -18,3 +23,165 @@ def hash_to_group(identifier, prime=FIXED_PRIME):
 def generate_private_key(prime=FIXED_PRIME):
     """Generate a random private key for the protocol."""
     return random.randint(1, prime - 1)
+
+# --- DDH groups ---
+
+class ModPGroup:
+    """The original group: Z_p* with H from hash_to_group and blinding by powmod."""
+
+    def __init__(self, prime=FIXED_PRIME, name='modp'):
+        self.name = name
+        self.p = mpz(prime)
+        self.element_width = (int(self.p - 1).bit_length() + 7) // 8
+
+    def random_scalar(self):
+        return mpz(generate_private_key(self.p))
+
+    def hash_to_group(self, identifier):
+        return hash_to_group(identifier, self.p)
+
+    def exp(self, element, k):
+        return powmod(element, k, self.p)
+
+    def encode(self, element) -> bytes:
+        return int(element).to_bytes(self.element_width, 'big')
+
+    def decode(self, data: bytes):
+        element = mpz(int.from_bytes(data, 'big'))
+        if len(data) != self.element_width or not 0 < element < self.p:
+            raise ValueError("Not an element of the group")
+        return element
+
+GROUPS = {'modp': ModPGroup(), **CURVES}
+DEFAULT_GROUP = 'modp'
+
+def get_group(name=DEFAULT_GROUP):
+    """Group backend by name: 'modp' (default), 'secp256k1' or 'sm2'."""
+    try:
+        return GROUPS[name]
+    except KeyError:
+        raise ValueError(f"Unknown group {name!r}, choose from {', '.join(GROUPS)}")
+
+# --- Parallel exponentiation ---
+
+_worker_exponent = None
+_worker_group = None
+
+def _init_pow_worker(exponent, group):
+    global _worker_exponent, _worker_group
+    _worker_exponent, _worker_group = mpz(exponent), group
+
+def _pow_chunk(values):
+    return [_worker_group.exp(v, _worker_exponent) for v in values]
+
+def _hash_pow_chunk(identifiers):
+    return [_worker_group.exp(_worker_group.hash_to_group(v), _worker_exponent) for v in identifiers]
+
+class ParallelExponentiator:
+    """
+    Raises group elements (or hashed identifiers) to one fixed exponent on a
+    process pool. Workers receive the exponent and group once, at startup;
+    each call shards its input into chunks and preserves the input order.
+    Inputs smaller than `min_parallel` are handled in-process.
+    """
+
+    def __init__(self, exponent, group=None, processes=None, chunk_size=512, min_parallel=256):
+        self.exponent = mpz(exponent)
+        self.group = group or get_group()
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.min_parallel = min_parallel
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _map(self, func, serial, items):
+        items = list(items)
+        if self.processes == 1 or len(items) < self.min_parallel:
+            return serial(items)
+        if self._pool is None:
+            self._pool = Pool(self.processes, initializer=_init_pow_worker, initargs=(self.exponent, self.group))
+        # At least a few chunks per worker, so uneven chunks still balance
+        size = max(1, min(self.chunk_size, -(-len(items) // (4 * self.processes))))
+        chunks = [items[i:i + size] for i in range(0, len(items), size)]
+        return [value for chunk in self._pool.imap(func, chunks) for value in chunk]
+
+    def pow_all(self, values):
+        """[v^exponent for v in values]"""
+        group = self.group
+        return self._map(_pow_chunk, lambda vs: [group.exp(v, self.exponent) for v in vs], values)
+
+    def hash_pow_all(self, identifiers):
+        """[H(v)^exponent for v in identifiers]"""
+        group = self.group
+        return self._map(_hash_pow_chunk, lambda ids: [group.exp(group.hash_to_group(v), self.exponent)
+                                                       for v in ids], identifiers)
+
+    def hash_pow_iter(self, identifiers, batch_size=65536):
+        """hash_pow_all over a sequence, yielding results slice by slice."""
+        for i in range(0, len(identifiers), batch_size):
+            yield from self.hash_pow_all(identifiers[i:i + batch_size])
+
+def synthetic_v(size):
+    """P1 test set: user0 .. user{size-1}."""
+    return [f"user{i}" for i in range(size)]
+
+def synthetic_w(size, groups=1):
+    """
+    P2 test set overlapping synthetic_v(size) in its upper half, with values
+    i % 1000. With several groups, row i is in group i % groups and its value
+    is a one-hot row (see packing.one_hot) for per-group sums.
+    """
+    rows = [(f"user{i}", i % 1000) for i in range(size // 2, size + size // 2)]
+    if groups == 1:
+        return rows
+    return [(w, one_hot(i % groups, t, groups)) for i, (w, t) in enumerate(rows)]
+
+def benchmark_groups(count=500):
+    """Per-element compute and bandwidth of each group, plus Z_p* at 3072 bits for equal security."""
+    groups = [get_group('modp'), ModPGroup(next_prime(2**3072), 'modp-3072'), *CURVES.values()]
+    print(f"{'group':<10} {'H+blind':>9} {'blind':>9} {'element':>8} {'A+Z+C id bytes':>15}")
+    for group in groups:
+        identifiers = synthetic_v(count)
+        key = group.random_scalar()
+        start = time.time()
+        blinded = [group.exp(group.hash_to_group(v), key) for v in identifiers]
+        hash_time = (time.time() - start) / count
+        start = time.time()
+        for element in blinded:
+            group.exp(element, key)
+        blind_time = (time.time() - start) / count
+        # Per identifier: one element in A, one in Z and one in C's first column
+        print(f"{group.name:<10} {hash_time * 1e3:>7.3f}ms {blind_time * 1e3:>7.3f}ms {group.element_width:>7}B "
+              f"{3 * group.element_width:>14}B")
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ['groups']:
+        benchmark_groups()
+        sys.exit()
+
+    identifiers = synthetic_v(20000)
+    key = generate_private_key()
+    start = time.time()
+    serial = [powmod(hash_to_group(v), key, FIXED_PRIME) for v in identifiers]
+    serial_time = time.time() - start
+
+    with ParallelExponentiator(key) as exp:
+        exp.hash_pow_all(identifiers[:exp.min_parallel])  # start the pool outside the timing
+        start = time.time()
+        parallel = exp.hash_pow_all(identifiers)
+        parallel_time = time.time() - start
+        print(f"{len(identifiers)} exponentiations: serial {serial_time:.2f}s, "
+              f"{exp.processes} processes {parallel_time:.2f}s, results match: {parallel == serial}")
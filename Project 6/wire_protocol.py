@@ -0,0 +1,289 @@
+"""
+Length-prefixed wire protocol for the PSI parties.
+
+Every message is a frame: type (1 byte) | payload length (4 bytes, big-endian)
+| payload. Sets travel as record streams, so neither side has to buffer a
+whole set or trust pickle data from the peer:
+
+    STREAM_START  record width (u32)
+    RECORDS       up to `batch_size` fixed-width records, concatenated
+    STREAM_END    total record count (u64), checked by the receiver
+
+Z is preceded by a Z_FORMAT frame (format u8, digest size u8): either the
+record stream of encoded elements, a record stream of sorted truncated
+digests, or a serialized Bloom/Cuckoo filter sent as a BLOB (total length
+u64, then RECORDS chunks).
+
+Before C, a LAYOUT frame gives the number of (packed) Paillier ciphertexts
+per C record; P1 answers with a CIPHERTEXT frame holding that many sums.
+
+P1 opens with a GROUP frame naming the DDH group; group elements use the
+group's fixed-width encoding and Paillier ciphertexts are big-endian
+integers of a width derived from the public key.
+"""
+import socket
+import struct
+from typing import Iterable, Iterator, List, Tuple
+import numpy as np
+from gmpy2 import mpz
+from phe import paillier
+from membership import (DEFAULT_FP_BUDGET, DIGEST_SIZE, BloomFilter, CuckooFilter, SortedDigestSet, build_index,
+                        element_digests, truncated_digest_size)
+from shared_logic import FIXED_PRIME
+
+FRAME_HEADER = struct.Struct('>BI')
+STREAM_WIDTH = struct.Struct('>I')
+STREAM_COUNT = struct.Struct('>Q')
+Z_HEADER = struct.Struct('>BB')
+LAYOUT = struct.Struct('>H')
+
+FRAME_STREAM_START = 1
+FRAME_RECORDS = 2
+FRAME_STREAM_END = 3
+FRAME_PUBLIC_KEY = 4
+FRAME_CIPHERTEXT = 5
+FRAME_GROUP = 6
+FRAME_Z_FORMAT = 7
+FRAME_BLOB = 8
+FRAME_LAYOUT = 9
+
+Z_FULL = 0
+Z_TRUNCATED = 1
+Z_BLOOM = 2
+Z_CUCKOO = 3
+Z_FORMATS = {'full': Z_FULL, 'truncated': Z_TRUNCATED, 'bloom': Z_BLOOM, 'cuckoo': Z_CUCKOO}
+
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 4096
+
+def int_width(bound) -> int:
+    """Bytes needed for integers in [0, bound)."""
+    return (int(bound - 1).bit_length() + 7) // 8
+
+ELEMENT_WIDTH = int_width(FIXED_PRIME)
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    """Read exactly `size` bytes or raise ConnectionError."""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("Connection closed mid-frame")
+        received += n
+    return bytes(buf)
+
+def send_frame(sock: socket.socket, frame_type: int, payload: bytes = b'') -> None:
+    sock.sendall(FRAME_HEADER.pack(frame_type, len(payload)) + payload)
+
+def recv_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    frame_type, length = FRAME_HEADER.unpack(recv_exact(sock, FRAME_HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {length} bytes exceeds the limit")
+    return frame_type, recv_exact(sock, length)
+
+def expect_frame(sock: socket.socket, frame_type: int) -> bytes:
+    received_type, payload = recv_frame(sock)
+    if received_type != frame_type:
+        raise ValueError(f"Expected frame type {frame_type}, got {received_type}")
+    return payload
+
+def encode_int(value, width: int) -> bytes:
+    return int(value).to_bytes(width, 'big')
+
+def decode_int(data: bytes) -> mpz:
+    return mpz(int.from_bytes(data, 'big'))
+
+def send_records(sock: socket.socket, records: Iterable[bytes], width: int,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Stream fixed-width records in batches; returns the number sent."""
+    batch_size = max(1, min(batch_size, MAX_FRAME_SIZE // max(width, 1)))
+    send_frame(sock, FRAME_STREAM_START, STREAM_WIDTH.pack(width))
+    count = 0
+    batch = []
+    for record in records:
+        if len(record) != width:
+            raise ValueError(f"Record of {len(record)} bytes in a stream of width {width}")
+        batch.append(record)
+        if len(batch) == batch_size:
+            send_frame(sock, FRAME_RECORDS, b''.join(batch))
+            count += len(batch)
+            batch = []
+    if batch:
+        send_frame(sock, FRAME_RECORDS, b''.join(batch))
+        count += len(batch)
+    send_frame(sock, FRAME_STREAM_END, STREAM_COUNT.pack(count))
+    return count
+
+def recv_records(sock: socket.socket, width: int) -> Iterator[List[bytes]]:
+    """Yield batches of records from a stream of the expected width."""
+    (stream_width,) = STREAM_WIDTH.unpack(expect_frame(sock, FRAME_STREAM_START))
+    if stream_width != width:
+        raise ValueError(f"Expected records of {width} bytes, peer sends {stream_width}")
+    count = 0
+    while True:
+        frame_type, payload = recv_frame(sock)
+        if frame_type == FRAME_STREAM_END:
+            (expected,) = STREAM_COUNT.unpack(payload)
+            if expected != count:
+                raise ValueError(f"Stream announced {expected} records, received {count}")
+            return
+        if frame_type != FRAME_RECORDS or len(payload) % width:
+            raise ValueError("Malformed record frame")
+        count += len(payload) // width
+        yield [payload[i:i + width] for i in range(0, len(payload), width)]
+
+def send_ints(sock: socket.socket, values: Iterable, width: int, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    return send_records(sock, (encode_int(v, width) for v in values), width, batch_size)
+
+def recv_int_batches(sock: socket.socket, width: int) -> Iterator[List[mpz]]:
+    for batch in recv_records(sock, width):
+        yield [decode_int(record) for record in batch]
+
+def send_blob(sock: socket.socket, data: bytes) -> None:
+    """Send a byte string of any size as a BLOB header plus RECORDS chunks."""
+    send_frame(sock, FRAME_BLOB, STREAM_COUNT.pack(len(data)))
+    view = memoryview(data)
+    for i in range(0, len(data), MAX_FRAME_SIZE):
+        send_frame(sock, FRAME_RECORDS, view[i:i + MAX_FRAME_SIZE])
+
+def recv_blob(sock: socket.socket) -> bytes:
+    (size,) = STREAM_COUNT.unpack(expect_frame(sock, FRAME_BLOB))
+    chunks, received = [], 0
+    while received < size:
+        chunk = expect_frame(sock, FRAME_RECORDS)
+        if not chunk or received + len(chunk) > size:
+            raise ValueError("Blob chunks do not match the announced size")
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+def send_membership(sock: socket.socket, elements: List[bytes], width: int, z_format: str = 'full',
+                    queries: int = 0, fp_budget: float = DEFAULT_FP_BUDGET) -> int:
+    """
+    Send Z for P1's membership tests; returns the payload bytes sent.
+
+    Args:
+        elements: Encoded group elements of Z (already shuffled)
+        width: Encoded element width
+        z_format: 'full', 'truncated', 'bloom' or 'cuckoo'
+        queries: |C|, the number of membership tests P1 will make
+        fp_budget: Expected false matches per run for the compact formats
+    """
+    if z_format not in Z_FORMATS:
+        raise ValueError(f"Unknown Z format {z_format!r}, choose from {', '.join(Z_FORMATS)}")
+    if z_format == 'full':
+        send_frame(sock, FRAME_Z_FORMAT, Z_HEADER.pack(Z_FULL, 0))
+        return send_records(sock, elements, width) * width
+    if z_format == 'truncated':
+        size = truncated_digest_size(len(elements), queries, fp_budget)
+        send_frame(sock, FRAME_Z_FORMAT, Z_HEADER.pack(Z_TRUNCATED, size))
+        digests = SortedDigestSet(element_digests(elements, size)).digests.tobytes()
+        return send_records(sock, (digests[i:i + size] for i in range(0, len(digests), size)), size) * size
+    structure = (BloomFilter if z_format == 'bloom' else CuckooFilter).for_budget(len(elements), queries, fp_budget)
+    structure.add_digests(element_digests(elements))
+    data = structure.to_bytes()
+    send_frame(sock, FRAME_Z_FORMAT, Z_HEADER.pack(Z_FORMATS[z_format], 0))
+    send_blob(sock, data)
+    return len(data)
+
+def recv_membership(sock: socket.socket, width: int):
+    """Receive Z in whichever format P2 chose, as an index with contains_many()."""
+    z_format, size = Z_HEADER.unpack(expect_frame(sock, FRAME_Z_FORMAT))
+    if z_format == Z_FULL:
+        return build_index(recv_records(sock, width))
+    if z_format == Z_TRUNCATED:
+        if not 0 < size <= DIGEST_SIZE:
+            raise ValueError(f"Invalid truncated digest size {size}")
+        batches = [np.frombuffer(b''.join(batch), dtype=f'S{size}') for batch in recv_records(sock, size)]
+        return SortedDigestSet(np.concatenate(batches) if batches else np.empty(0, f'S{size}'))
+    if z_format == Z_BLOOM:
+        return BloomFilter.from_bytes(recv_blob(sock))
+    if z_format == Z_CUCKOO:
+        return CuckooFilter.from_bytes(recv_blob(sock))
+    raise ValueError(f"Unknown Z format {z_format}")
+
+def send_group(sock: socket.socket, name: str) -> None:
+    send_frame(sock, FRAME_GROUP, name.encode())
+
+def expect_group(sock: socket.socket, name: str) -> None:
+    """Fail early if the peer blinds in a different DDH group."""
+    peer = expect_frame(sock, FRAME_GROUP).decode(errors='replace')
+    if peer != name:
+        raise ValueError(f"Peer uses group {peer!r}, expected {name!r}")
+
+def send_public_key(sock: socket.socket, pk: paillier.PaillierPublicKey) -> None:
+    send_frame(sock, FRAME_PUBLIC_KEY, encode_int(pk.n, int_width(pk.n + 1)))
+
+def recv_public_key(sock: socket.socket) -> paillier.PaillierPublicKey:
+    return paillier.PaillierPublicKey(int.from_bytes(expect_frame(sock, FRAME_PUBLIC_KEY), 'big'))
+
+def ciphertext_width(pk: paillier.PaillierPublicKey) -> int:
+    return int_width(pk.nsquare)
+
+def encode_ciphertext(enc: paillier.EncryptedNumber) -> bytes:
+    """Raw ciphertext; integer encryptions (exponent 0) only."""
+    if enc.exponent != 0:
+        raise ValueError("Only integer-valued ciphertexts can be sent")
+    return encode_int(enc.ciphertext(be_secure=False), ciphertext_width(enc.public_key))
+
+def decode_ciphertext(pk: paillier.PaillierPublicKey, data: bytes) -> paillier.EncryptedNumber:
+    return paillier.EncryptedNumber(pk, int.from_bytes(data, 'big'), 0)
+
+def decode_ciphertexts(pk: paillier.PaillierPublicKey, data: bytes) -> List[paillier.EncryptedNumber]:
+    """Split concatenated ciphertexts."""
+    width = ciphertext_width(pk)
+    if not data or len(data) % width:
+        raise ValueError("Ciphertext payload is not a whole number of ciphertexts")
+    return [decode_ciphertext(pk, data[i:i + width]) for i in range(0, len(data), width)]
+
+def send_layout(sock: socket.socket, ciphertexts: int) -> None:
+    send_frame(sock, FRAME_LAYOUT, LAYOUT.pack(ciphertexts))
+
+def recv_layout(sock: socket.socket) -> int:
+    (ciphertexts,) = LAYOUT.unpack(expect_frame(sock, FRAME_LAYOUT))
+    if not ciphertexts:
+        raise ValueError("C records must carry at least one ciphertext")
+    return ciphertexts
+
+def main():
+    """Stream a million fixed-width elements over a loopback socket."""
+    import random
+    import threading
+    import time
+    count = 1_000_000
+    width = ELEMENT_WIDTH
+    rng = random.Random(1)
+    values = [rng.getrandbits(256) for _ in range(count)]
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('localhost', 0))
+    server.listen(1)
+    received = {}
+
+    def receiver():
+        conn, _ = server.accept()
+        total, checksum = 0, 0
+        for batch in recv_int_batches(conn, width):
+            total += len(batch)
+            checksum = (checksum + sum(batch)) & 0xFFFFFFFF
+        received.update(total=total, checksum=checksum)
+        conn.close()
+
+    thread = threading.Thread(target=receiver)
+    thread.start()
+    client = socket.create_connection(server.getsockname())
+    start = time.time()
+    send_ints(client, values, width)
+    client.close()
+    thread.join()
+    server.close()
+    elapsed = time.time() - start
+
+    expected = sum(values) & 0xFFFFFFFF
+    print(f"Streamed {received['total']} elements ({count * width / 1e6:.1f} MB) in {elapsed:.2f}s, "
+          f"checksum ok: {received['checksum'] == expected}")
+
+if __name__ == "__main__":
+    main()